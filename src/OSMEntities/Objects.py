@@ -46,6 +46,13 @@ class RoutingNode(object):
     def use(self, way):
         self.ways.add(way)    
    
+def _touches_node(way, node_id):
+    for segment in way.get_segments():
+        if segment.get_head() == node_id or segment.get_tail() == node_id:
+            return True
+    return False
+
+
 class RoutingRestriction(object):
     '''
     classdocs
@@ -85,6 +92,31 @@ class RoutingRestriction(object):
             idx+=1
         
         return self.seems_valid()
+    
+    def discard_ways(self, ways):
+        self._from = [x for x in self._from if x not in ways]
+        self._to = [x for x in self._to if x not in ways]
+        return self.seems_valid()
+
+    def discard_segments(self, segments):
+        '''
+        Forgets the from and to ways that lost their segment on the via node
+        with the dropped segments; False when an end is left without ways or
+        a via way lost segments
+        '''
+        self._source_edges.difference_update(segments)
+        parents = set(segment.parent for segment in segments)
+        parent_ids = set(way.get_id() for way in parents)
+        for way_id in self._via_ways:
+            if way_id in parent_ids:
+                return False
+        if len(self._via_nodes) > 0:
+            via_node = self.get_first_via_node()
+            self._from = [x for x in self._from
+                          if x not in parents or _touches_node(x, via_node)]
+            self._to = [x for x in self._to
+                        if x not in parents or _touches_node(x, via_node)]
+        return self.seems_valid()
         
     def get_properties(self):
         return self._properties
@@ -94,6 +126,9 @@ class RoutingRestriction(object):
         
     def get_first_via_node(self):
         return self._via_nodes[0]
+    
+    def get_via_nodes(self):
+        return self._via_nodes
         
     def get_all_common_segments(self, node_map):
         local_commons = {}
@@ -105,21 +140,29 @@ class RoutingRestriction(object):
                     local_commons[common.via_node].append(common)
         return local_commons
     
-    def get_as_proper_restrictions(self, node_map):
+    def get_as_proper_restrictions(self, node_map, diagnostics=None):
         proper_restrictions = {}
         if not self._is_point:
             local_commons = self.get_all_common_segments(node_map)
             if len(self._via_nodes)>0:
                 first_via_node = self.get_first_via_node()
                 if not local_commons.has_key(first_via_node):
-                    logging.warn("restriction %s has via node %s; should be %s"%(self._osm_id,
-                                                                          first_via_node,
-                                                                          local_commons.keys()))
+                    if diagnostics is not None:
+                        diagnostics.record("restriction via node not shared by its ways",
+                                           self._osm_id, first_via_node, local_commons.keys())
+                    else:
+                        logging.warn("restriction %s has via node %s; should be %s"%(self._osm_id,
+                                                                              first_via_node,
+                                                                              local_commons.keys()))
                 else:
                     proper_restrictions[first_via_node] = local_commons[first_via_node]
             else:
-                logging.warn('restriction %s has no via node ; found %s'%(self._osm_id,
-                                                                  local_commons.keys()))
+                if diagnostics is not None:
+                    diagnostics.record("restriction without via node", self._osm_id,
+                                       local_commons.keys())
+                else:
+                    logging.warn('restriction %s has no via node ; found %s'%(self._osm_id,
+                                                                      local_commons.keys()))
                 for keye,valz in local_commons.iteritems():
                         proper_restrictions[keye] =valz
         else:
@@ -132,7 +175,10 @@ class RoutingRestriction(object):
                     for common in self.get_common_segments_on_node(ff,tt,self.get_first_via_node()):
                         local_commons.append(common)
             if len(local_commons)>2:
-                logging.warn("barrier %s affects more than two segments"%common.via_node)
+                if diagnostics is not None:
+                    diagnostics.record("barrier on more than two segments", common.via_node)
+                else:
+                    logging.warn("barrier %s affects more than two segments"%common.via_node)
                 #for comm in local_commons:
                 #    print comm
                 #print "-----"
@@ -314,10 +360,15 @@ class RoutingWay(object):
         self.f_speed = -1
         self.b_speed = -1
         self.max_speed = -1
+        # profile name -> (forward, backward) speed for the extra profiles
+        self.profile_speeds = {}
 
         
     def get_node_ph_count(self):
         return len(self._nodes_placeholders)
+    
+    def get_node_placeholders(self):
+        return self._nodes_placeholders
         
     def get_id(self):
         return self._osm_id
@@ -342,6 +393,12 @@ class RoutingWay(object):
                 
         for idx in range(1, nodez_len):
             node_guid = self._nodes_placeholders[idx]
+            if node_guid is None:
+                # gap left by clipping; the next run starts a new segment
+                last_stop = idx + 1
+                continue
+            if idx == last_stop:
+                continue
             if nodes.has_key(node_guid):
                 new_segment = WaySegment(self,
                                          self._nodes_placeholders[last_stop:idx + 1],
@@ -392,6 +449,9 @@ class WaySegment(object):
         self.parent = way
         self.idx=idx
         self._db_id = next(db_id_generator)
+        # strongly connected component rank (0 is the largest) when flagged
+        self.component_id = None
+        self.island = False
         
     def get_segment_index(self):
         return self.idx
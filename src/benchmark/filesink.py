@@ -0,0 +1,128 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import codecs
+import json
+import logging
+import os
+import re
+
+from psycopg2.extras import Json
+
+from util.dbwriter import DbWriter
+from util.geom import TextGeometry
+
+'''
+DbWriter that writes to local files instead of PostgreSQL, so the Python
+side of the load (row building, batching) can be timed without a database.
+Inserted rows go to one tab separated file per table, in COPY text format;
+every other statement is appended to statements.sql.
+'''
+
+INSERT_MATCHER = re.compile(u'\\s*INSERT INTO (\\S+)', re.IGNORECASE)
+
+
+def _copy_value(value):
+    if value is None:
+        return u'\\N'
+    if isinstance(value, TextGeometry):
+        return u'SRID=%s;%s' % (value.epsg, value.string_rep)
+    if isinstance(value, Json):
+        value = value.adapted
+    if isinstance(value, dict):
+        value = json.dumps(value)
+    if not isinstance(value, unicode):
+        value = unicode(value)
+    return (value.replace(u'\\', u'\\\\').replace(u'\t', u'\\t')
+            .replace(u'\n', u'\\n'))
+
+
+class FileSinkCursor(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def execute(self, statement, rows=None):
+        match = INSERT_MATCHER.match(statement)
+        if match is None or rows is None:
+            self.connection.write_statement(statement)
+            self.rowcount = 0
+            return
+        stream = self.connection.get_table_stream(match.group(1))
+        for row in rows:
+            stream.write(u'\t'.join(_copy_value(value) for value in row))
+            stream.write(u'\n')
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return (0,)
+
+    def close(self):
+        pass
+
+
+class FileSinkConnection(object):
+    def __init__(self, directory):
+        self.directory = directory
+        self.closed = False
+        self.autocommit = True
+        self.table_streams = {}
+        self.statements = codecs.open(os.path.join(directory, 'statements.sql'),
+                                      'w', 'utf-8')
+
+    def cursor(self):
+        return FileSinkCursor(self)
+
+    def write_statement(self, statement):
+        self.statements.write(statement)
+        self.statements.write(u'\n')
+
+    def get_table_stream(self, table):
+        stream = self.table_streams.get(table)
+        if stream is None:
+            stream = codecs.open(os.path.join(self.directory, table + '.tsv'),
+                                 'w', 'utf-8')
+            self.table_streams[table] = stream
+        return stream
+
+    def commit(self):
+        for stream in self.table_streams.values():
+            stream.flush()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        for stream in self.table_streams.values():
+            stream.close()
+        self.statements.close()
+        self.closed = True
+
+
+class FileSinkWriter(DbWriter):
+    def __init__(self, directory, **kwargs):
+        DbWriter.__init__(self, {}, **kwargs)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+
+    def _get_connection(self):
+        if self.connection is None:
+            self.connection = FileSinkConnection(self.directory)
+        return self.connection
+
+    def export_graph(self, path):
+        logging.warn("graph export needs a database; skipped for the file sink")
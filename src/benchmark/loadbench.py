@@ -0,0 +1,227 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import pgroutingloader
+from benchmark.filesink import FileSinkWriter
+from benchmark.synthetic import TOPOLOGIES, TOPOLOGY_GRID, generate_network, \
+    write_osm_xml
+from util import dbwriter
+from util.config import load_connection_info_from_gdal_string
+
+'''
+Loader benchmark: generates a synthetic network, loads it a few times through
+pgroutingloader.run() and summarizes the per-phase report of every run.
+Run from the src directory:
+
+    python -m benchmark.loadbench --topology grid --size 300 --repeat 3 --output grid300.json
+
+Results carry the commit they were measured on and can be compared with an
+earlier result file using --compare.
+'''
+
+SINK_FILE = 'file'
+SINK_DB = 'db'
+SUMMARY_KEYS = ('wall_time', 'cpu_time', 'elements_per_sec', 'rows_per_sec')
+
+
+def _median(values):
+    values = sorted(value for value in values if value is not None)
+    if len(values) == 0:
+        return None
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__))
+                                       ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(runs):
+    '''
+    Median of every phase metric over the runs, keeping the phase order
+    '''
+    names = []
+    by_name = {}
+    for run in runs:
+        for phase in run['phases']:
+            if not by_name.has_key(phase['name']):
+                names.append(phase['name'])
+                by_name[phase['name']] = []
+            by_name[phase['name']].append(phase)
+    summary = []
+    for name in names:
+        phases = by_name[name]
+        entry = {'name': name,
+                 'cumulative_peak_rss_kb': max(phase['cumulative_peak_rss_kb']
+                                               for phase in phases),
+                 'peak_rss_growth_kb': max(phase['peak_rss_growth_kb']
+                                           for phase in phases)}
+        for key in SUMMARY_KEYS:
+            entry[key] = _median(phase[key] for phase in phases)
+        summary.append(entry)
+    return summary
+
+
+def print_summary(summary, baseline=None):
+    baseline_times = {}
+    if baseline is not None:
+        baseline_times = dict((phase['name'], phase['wall_time'])
+                              for phase in baseline['summary'])
+    print "%-32s %10s %10s %14s %14s %8s" % ('phase', 'wall s', 'cpu s',
+                                              'elements/s', 'rows/s',
+                                              'vs base' if baseline else '')
+    for phase in summary:
+        ratio = ''
+        base = baseline_times.get(phase['name'])
+        if base:
+            ratio = '%.2fx' % (phase['wall_time'] / base,)
+        print "%-32s %10.3f %10.3f %14s %14s %8s" % (
+                    phase['name'], phase['wall_time'], phase['cpu_time'],
+                    '%.0f' % phase['elements_per_sec'] if phase['elements_per_sec'] else '-',
+                    '%.0f' % phase['rows_per_sec'] if phase['rows_per_sec'] else '-',
+                    ratio)
+
+
+def benchmark(topology, size, seed=0, repeat=3, sink=SINK_FILE,
+              connection_info=None, length_projection='3844',
+              use_imposm=False, properties_mode=dbwriter.PROPERTIES_EAV,
+              work_dir=None):
+    cleanup = work_dir is None
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix='loadbench')
+    elif not os.path.isdir(work_dir):
+        os.makedirs(work_dir)
+    try:
+        start = time.time()
+        network = generate_network(topology, size, seed)
+        osm_path = write_osm_xml(network, os.path.join(work_dir, '%s_%s_%s.osm'
+                                                       % (topology, size, seed)))
+        logging.info("generated %s in %.2fs" % (osm_path, time.time() - start))
+
+        runs = []
+        for idx in range(repeat):
+            if sink == SINK_FILE:
+                target, writer_class = os.path.join(work_dir, 'sink'), FileSinkWriter
+            else:
+                target, writer_class = dict(connection_info), dbwriter.DbWriter
+            report = pgroutingloader.run(target, osm_path, length_projection,
+                                         use_imposm=use_imposm, clean_db=False,
+                                         table_prefix='bench_',
+                                         properties_mode=properties_mode,
+                                         writer_class=writer_class)
+            runs.append(report.as_dict())
+            logging.info("run %s of %s done in %.2fs" % (idx + 1, repeat,
+                                                         runs[-1]['wall_time']))
+        return {'commit': get_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'topology': topology, 'size': size, 'seed': seed, 'sink': sink,
+                'use_imposm': use_imposm, 'properties_mode': properties_mode,
+                'network': {'nodes': len(network.nodes),
+                            'ways': len(network.ways),
+                            'barriers': len(network.node_tags),
+                            'restrictions': len(network.restrictions),
+                            'file_bytes': os.path.getsize(osm_path)},
+                'runs': runs,
+                'summary': summarize(runs)}
+    finally:
+        if cleanup:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the loader on a '
+                                                 + 'synthetic OSM network.')
+    parser.add_argument('--topology', type=str, default=TOPOLOGY_GRID,
+                        choices=TOPOLOGIES, help='Shape of the generated network')
+    parser.add_argument('--size', type=int, default=200,
+                        help=('Nodes per side of the grid or number of rings ' + 
+                              'of the radial network'))
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the tag, barrier and restriction mix')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help=('Number of loads; the summary holds the median. ' + 
+                              'Peak RSS is process wide, so only the first ' + 
+                              'run measures it faithfully'))
+    parser.add_argument('--sink', type=str, default=SINK_FILE,
+                        choices=(SINK_FILE, SINK_DB),
+                        help=('Write to local files or to a throwaway ' + 
+                              'PostgreSQL database (tables prefixed bench_)'))
+    parser.add_argument('--connection-string', '-c', type=str,
+                        dest='gdal_string', default=None,
+                        help='GDAL connection string of the database for --sink db')
+    parser.add_argument('--length-projection', '-e', type=str,
+                        dest='epsg_code', default='3844',
+                        help='EPSG of projection to use to compute way length')
+    parser.add_argument('--use-imposm', '-b', action='store_true',
+                        dest='use_imposm', help='Parse with imposm.parser')
+    parser.add_argument('--properties-mode', '-m', type=str,
+                        dest='properties_mode', default=dbwriter.PROPERTIES_EAV,
+                        choices=dbwriter.PROPERTIES_MODES)
+    parser.add_argument('--work-dir', type=str, default=None,
+                        help='Keep the generated file and sink output here')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='Write the results as JSON')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Earlier results file to compare wall times with')
+    parser.add_argument('--verbose', '-v', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR,
+                        format='%(asctime)s %(levelname)-8s %(message)s')
+    connection_info = None
+    if args.sink == SINK_DB:
+        if args.gdal_string is None:
+            parser.error('--sink db needs --connection-string')
+        connection_info = load_connection_info_from_gdal_string(args.gdal_string)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key in ('topology', 'size', 'seed', 'sink', 'properties_mode'):
+            if baseline.get(key) != getattr(args, key):
+                print "warning: baseline %s is %s" % (key, baseline.get(key))
+
+    results = benchmark(args.topology, args.size, seed=args.seed,
+                        repeat=args.repeat, sink=args.sink,
+                        connection_info=connection_info,
+                        length_projection=args.epsg_code,
+                        use_imposm=args.use_imposm,
+                        properties_mode=args.properties_mode,
+                        work_dir=args.work_dir)
+    print "%(nodes)s nodes, %(ways)s ways, %(barriers)s barriers, %(restrictions)s restrictions" % results['network']
+    print_summary(results['summary'], baseline)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
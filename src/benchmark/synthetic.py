@@ -0,0 +1,226 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import math
+import random
+
+from xml.sax.saxutils import quoteattr
+
+'''
+Synthetic OSM networks for benchmarking the loader. The generated files are
+plain OSM XML (nodes, then ways, then relations, as in a real extract) and
+depend only on the topology, size and seed, so timings of different commits
+can be compared on identical inputs.
+'''
+
+TOPOLOGY_GRID = 'grid'
+TOPOLOGY_RADIAL = 'radial'
+TOPOLOGIES = (TOPOLOGY_GRID, TOPOLOGY_RADIAL)
+
+ORIGIN = (26.0, 44.4)
+SPACING = 0.001
+
+# (weight, tags) of the generated ways; values are drawn per way
+HIGHWAY_MIX = ((2, 'primary'), (4, 'secondary'), (6, 'tertiary'),
+               (30, 'residential'), (8, 'unclassified'), (6, 'service'),
+               (4, 'track'), (2, 'living_street'), (2, 'footway'))
+SURFACES = ('asphalt', 'asphalt', 'asphalt', 'paved', 'concrete', 'gravel',
+            'unpaved', 'cobblestone')
+TRACKTYPES = ('grade1', 'grade2', 'grade3', 'grade4', 'grade5')
+MAXSPEEDS = ('30', '50', '50', '70', '90', 'RO:urban', '30 mph')
+ACCESS_VALUES = ('yes', 'destination', 'private', 'no')
+BARRIERS = ('gate', 'lift_gate', 'bollard', 'cattle_grid', 'block', 'entrance')
+RESTRICTIONS = ('no_left_turn', 'no_right_turn', 'no_straight_on',
+                'no_u_turn', 'only_straight_on', 'only_right_turn')
+
+
+def _weighted_choice(rnd, weighted):
+    total = sum(weight for weight, _ in weighted)
+    pick = rnd.uniform(0, total)
+    for weight, value in weighted:
+        pick -= weight
+        if pick <= 0:
+            return value
+    return weighted[-1][1]
+
+
+def way_tags(rnd, idx):
+    '''
+    Realistic mix of the tags the profile looks at
+    '''
+    highway = _weighted_choice(rnd, HIGHWAY_MIX)
+    tags = {'highway': highway}
+    if rnd.random() < 0.6:
+        tags['name'] = 'Strada %s' % (idx,)
+    if rnd.random() < 0.3:
+        tags['maxspeed'] = rnd.choice(MAXSPEEDS)
+    if rnd.random() < 0.1:
+        tags['oneway'] = rnd.choice(('yes', 'yes', '-1'))
+    if rnd.random() < 0.4:
+        tags['surface'] = rnd.choice(SURFACES)
+    if highway == 'track':
+        tags['tracktype'] = rnd.choice(TRACKTYPES)
+    if rnd.random() < 0.05:
+        tags['access'] = rnd.choice(ACCESS_VALUES)
+    if rnd.random() < 0.03:
+        tags['bridge'] = 'yes'
+        tags['layer'] = '1'
+    if rnd.random() < 0.1:
+        tags['lanes'] = str(rnd.randint(1, 4))
+    if rnd.random() < 0.02:
+        tags['maxspeed:advisory'] = rnd.choice(('20', '40'))
+    return tags
+
+
+class SyntheticNetwork(object):
+    '''
+    In-memory description of a network: node coordinates, ways as node
+    sequences with tags, barrier tags on nodes and turn restrictions as
+    (from way, via node, to way, restriction) tuples
+    '''
+    def __init__(self):
+        self.nodes = []
+        self.node_tags = {}
+        self.ways = []
+        self.restrictions = []
+
+    def add_node(self, lon, lat):
+        self.nodes.append((lon, lat))
+        return len(self.nodes)
+
+    def add_way(self, node_ids, tags):
+        self.ways.append((node_ids, tags))
+        return len(self.ways)
+
+
+def _add_barriers(network, rnd, barrier_ratio):
+    for node_id in range(1, len(network.nodes) + 1):
+        if rnd.random() < barrier_ratio:
+            network.node_tags[node_id] = {'barrier': rnd.choice(BARRIERS)}
+
+
+def _add_restrictions(network, rnd, restriction_ratio):
+    ways_by_node = {}
+    for way_id, (node_ids, _) in enumerate(network.ways, 1):
+        for node_id in set(node_ids):
+            ways_by_node.setdefault(node_id, []).append(way_id)
+    for node_id in sorted(ways_by_node.keys()):
+        way_ids = ways_by_node[node_id]
+        if len(way_ids) > 1 and rnd.random() < restriction_ratio:
+            from_way, to_way = rnd.sample(way_ids, 2)
+            network.restrictions.append((from_way, node_id, to_way,
+                                         rnd.choice(RESTRICTIONS)))
+
+
+def grid_network(size, seed=0, segment_length=4, barrier_ratio=0.002,
+                 restriction_ratio=0.02):
+    '''
+    size x size lattice; every row and column is cut into ways spanning
+    segment_length cells, so junctions both split ways and end them
+    '''
+    rnd = random.Random(seed)
+    network = SyntheticNetwork()
+    ids = [[network.add_node(ORIGIN[0] + col * SPACING + rnd.uniform(-0.1, 0.1) * SPACING,
+                             ORIGIN[1] + row * SPACING + rnd.uniform(-0.1, 0.1) * SPACING)
+            for col in range(size)] for row in range(size)]
+    lines = [ids[row] for row in range(size)]
+    lines.extend([ids[row][col] for row in range(size)] for col in range(size))
+    for line in lines:
+        for start in range(0, size - 1, segment_length):
+            node_ids = line[start:start + segment_length + 1]
+            network.add_way(node_ids, way_tags(rnd, len(network.ways)))
+    _add_barriers(network, rnd, barrier_ratio)
+    _add_restrictions(network, rnd, restriction_ratio)
+    return network
+
+
+def radial_network(size, seed=0, spokes=None, barrier_ratio=0.002,
+                   restriction_ratio=0.02):
+    '''
+    size concentric closed rings crossed by spokes radiating from a
+    single center node, as in a city with ring roads
+    '''
+    rnd = random.Random(seed)
+    if spokes is None:
+        spokes = max(8, size)
+    network = SyntheticNetwork()
+    center = network.add_node(ORIGIN[0], ORIGIN[1])
+    ring_ids = []
+    for ring in range(1, size + 1):
+        ids = []
+        for spoke in range(spokes):
+            angle = 2 * math.pi * spoke / spokes
+            ids.append(network.add_node(ORIGIN[0] + ring * SPACING * math.cos(angle),
+                                        ORIGIN[1] + ring * SPACING * math.sin(angle)))
+        ring_ids.append(ids)
+    for ids in ring_ids:
+        network.add_way(ids + [ids[0]], way_tags(rnd, len(network.ways)))
+    for spoke in range(spokes):
+        node_ids = [center] + [ids[spoke] for ids in ring_ids]
+        network.add_way(node_ids, way_tags(rnd, len(network.ways)))
+    _add_barriers(network, rnd, barrier_ratio)
+    _add_restrictions(network, rnd, restriction_ratio)
+    return network
+
+
+def generate_network(topology, size, seed=0):
+    if topology == TOPOLOGY_GRID:
+        return grid_network(size, seed)
+    if topology == TOPOLOGY_RADIAL:
+        return radial_network(size, seed)
+    raise Exception("unknown topology '%s'" % (topology,))
+
+
+def _write_tags(f, tags):
+    for key in sorted(tags.keys()):
+        f.write('    <tag k=%s v=%s/>\n' % (quoteattr(key), quoteattr(tags[key])))
+
+
+def write_osm_xml(network, path):
+    with open(path, 'w') as f:
+        f.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+        f.write('<osm version="0.6" generator="pypgroutingloader benchmark">\n')
+        lons = [lon for lon, _ in network.nodes]
+        lats = [lat for _, lat in network.nodes]
+        # real extracts start with bounds; the loader skips the first element
+        f.write('  <bounds minlat="%.7f" minlon="%.7f" maxlat="%.7f" maxlon="%.7f"/>\n'
+                % (min(lats), min(lons), max(lats), max(lons)))
+        for node_id, (lon, lat) in enumerate(network.nodes, 1):
+            tags = network.node_tags.get(node_id)
+            if tags is None:
+                f.write('  <node id="%s" version="1" lat="%.7f" lon="%.7f"/>\n'
+                        % (node_id, lat, lon))
+            else:
+                f.write('  <node id="%s" version="1" lat="%.7f" lon="%.7f">\n'
+                        % (node_id, lat, lon))
+                _write_tags(f, tags)
+                f.write('  </node>\n')
+        for way_id, (node_ids, tags) in enumerate(network.ways, 1):
+            f.write('  <way id="%s" version="1">\n' % (way_id,))
+            for node_id in node_ids:
+                f.write('    <nd ref="%s"/>\n' % (node_id,))
+            _write_tags(f, tags)
+            f.write('  </way>\n')
+        for relation_id, (from_way, via_node, to_way, restriction) in enumerate(
+                                                            network.restrictions, 1):
+            f.write('  <relation id="%s" version="1">\n' % (relation_id,))
+            f.write('    <member type="way" ref="%s" role="from"/>\n' % (from_way,))
+            f.write('    <member type="node" ref="%s" role="via"/>\n' % (via_node,))
+            f.write('    <member type="way" ref="%s" role="to"/>\n' % (to_way,))
+            _write_tags(f, {'type': 'restriction', 'restriction': restriction})
+            f.write('  </relation>\n')
+        f.write('</osm>\n')
+    return path
@@ -0,0 +1,155 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+'''
+Batch isochrones for many origins. pgr_densedistance queries run over a
+connection pool in a thread pool, isobands are computed in a process pool,
+and all features are written to a single stream tagged with the origin id.
+
+The origins file is a CSV with the columns id, lat, lon, cost and,
+optionally, blockage.
+'''
+
+import argparse
+import csv
+import json
+import logging
+import sys
+
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from psycopg2.pool import ThreadedConnectionPool
+
+import pgrouting_distance_isobands as pdi
+from output import CollectingWriter, GeoJSONWriter, WKBWriter
+
+WRITERS = {'geojson': GeoJSONWriter, 'wkb': WKBWriter}
+
+
+def read_origins(path):
+    origins = []
+    with open(path, 'rb') as f:
+        for row in csv.DictReader(f):
+            origins.append((row['id'], float(row['lat']), float(row['lon']),
+                            float(row['cost']), row.get('blockage') or ''))
+    return origins
+
+
+class DensedistanceFetcher(object):
+    def __init__(self, connection_pool):
+        self.connection_pool = connection_pool
+
+    def __call__(self, origin):
+        origin_id, lat, lon, cost, blockage = origin
+        connection = self.connection_pool.getconn()
+        try:
+            spatial_ds = pdi.SpatialDataset2((lat, lon, cost, blockage), 'cost',
+                                             connection=connection)
+        except Exception as e:
+            self.connection_pool.putconn(connection, close=connection.closed)
+            logging.warn("unable to compute distances for origin %s: %s"
+                         % (origin_id, e))
+            return origin_id, None
+        self.connection_pool.putconn(connection)
+        return origin_id, (spatial_ds.x, spatial_ds.y, spatial_ds.vals)
+
+
+def compute_isobands(task):
+    origin_id, points, offset, interval, max_level, tolerance = task
+    # aligned grids let origins with overlapping extents reuse the worker's grids
+    spatial_ds = pdi.PointDataset(*points, align=True)
+    writer = CollectingWriter()
+    pdi.isobands(spatial_ds, offset, interval, max_level=max_level,
+                 writer=writer, properties={'origin_id': origin_id},
+                 simplify_tolerance=tolerance)
+    return writer.features
+
+
+def batch_isobands(origins, connection_params, writer, offset=0, interval=60,
+                   max_level=None, pool_size=4, processes=None,
+                   simplify_tolerance=None):
+    connection_pool = ThreadedConnectionPool(1, pool_size, **connection_params)
+    fetch_pool = ThreadPool(pool_size)
+    process_pool = Pool(processes)
+    fetcher = DensedistanceFetcher(connection_pool)
+
+    def tasks():
+        for origin_id, points in fetch_pool.imap_unordered(fetcher, origins):
+            if points is not None:
+                yield (origin_id, points, offset, interval, max_level,
+                       simplify_tolerance)
+
+    try:
+        writer.begin()
+        for features in process_pool.imap_unordered(compute_isobands, tasks()):
+            for properties, rings in features:
+                writer.write_feature(properties, rings)
+        writer.end()
+    finally:
+        process_pool.close()
+        process_pool.join()
+        fetch_pool.close()
+        fetch_pool.join()
+        connection_pool.closeall()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)-8s %(message)s')
+    parser = argparse.ArgumentParser(description='Compute isobands for many origins.')
+    parser.add_argument('origins', type=str,
+                        help='CSV file with the columns id, lat, lon, cost[, blockage]')
+    parser.add_argument('--output', '-o', type=str, dest='output', default=None,
+                        help='Output file; standard output if not present')
+    parser.add_argument('--format', type=str, dest='format', default='geojson',
+                        choices=sorted(WRITERS.keys()))
+    parser.add_argument('--precision', type=float, dest='precision', default=None,
+                        help='Snap output coordinates to this many degrees')
+    parser.add_argument('--offset', type=float, dest='offset', default=0)
+    parser.add_argument('--interval', type=float, dest='interval', default=60)
+    parser.add_argument('--max-level', type=float, dest='max_level', default=None)
+    parser.add_argument('--simplify', type=float, dest='simplify_tolerance',
+                        default=None,
+                        help='Simplify band polygons with this tolerance, in degrees')
+    parser.add_argument('--pool-size', type=int, dest='pool_size', default=4,
+                        help='Number of concurrent pgr_densedistance queries')
+    parser.add_argument('--processes', type=int, dest='processes', default=None,
+                        help='Number of isoband worker processes')
+    parser.add_argument('--connection-params', type=str, dest='connection_params',
+                        help=('JSON object with psycopg2 connection parameters. ' + 
+                              'If not present, will use the module defaults'))
+    args = parser.parse_args()
+    params = pdi.connParams
+    if args.connection_params is not None:
+        params = json.loads(args.connection_params)
+    stream = sys.stdout if args.output is None else open(args.output, 'wb')
+    try:
+        batch_isobands(read_origins(args.origins), params,
+                       WRITERS[args.format](stream, precision=args.precision),
+                       offset=args.offset, interval=args.interval,
+                       max_level=args.max_level, pool_size=args.pool_size,
+                       processes=args.processes,
+                       simplify_tolerance=args.simplify_tolerance)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
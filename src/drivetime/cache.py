@@ -0,0 +1,179 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+'''
+Result cache for isobands. Requests are keyed on the routing vertex nearest
+to the origin together with the cost budget, blockage and band scheme, so
+requests from the same depot share results. Entries live in an in-memory LRU,
+optionally backed by a directory on disk, and are dropped when the routing
+tables are reloaded.
+'''
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+
+from collections import OrderedDict
+
+SNAP_SQL = ("SELECT id FROM {0}ways_vertices_pgr "
+            "ORDER BY the_geom <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326) LIMIT 1")
+# the loader drops and recreates the ways table, so its oid changes on every load
+GENERATION_SQL = "SELECT to_regclass(%s)::oid"
+
+
+def snap_origin(connection, lat, lon, table_prefix=''):
+    cursor = connection.cursor()
+    cursor.execute(SNAP_SQL.format(table_prefix), (lon, lat))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row is not None else None
+
+
+def get_generation(connection, table_prefix=''):
+    cursor = connection.cursor()
+    cursor.execute(GENERATION_SQL, (table_prefix + 'ways',))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row is not None else None
+
+
+def make_key(vertex, cost, blockage, offset, interval, min_level=None,
+             max_level=None):
+    levels = tuple(float(x) if x is not None else None
+                   for x in (min_level, max_level))
+    return (vertex, float(cost), blockage or '', float(offset), float(interval),
+            levels)
+
+
+class IsobandCache(object):
+    def __init__(self, max_entries=256, max_age=3600, store_path=None,
+                 max_disk_entries=10000, generation_check_interval=60):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.store_path = store_path
+        self.max_disk_entries = max_disk_entries
+        self.generation_check_interval = generation_check_interval
+        self.generation = None
+        self.last_generation_check = 0
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, timestamp):
+        return self.max_age is not None and time.time() - timestamp > self.max_age
+
+    def _disk_dir(self):
+        return os.path.join(self.store_path, str(self.generation))
+
+    def _disk_path(self, key):
+        return os.path.join(self._disk_dir(),
+                            hashlib.sha1(repr(key)).hexdigest() + '.json')
+
+    def _read_disk(self, key):
+        '''
+        Returns the stored (timestamp, value), None if missing or expired
+        '''
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        timestamp = os.path.getmtime(path)
+        if self._expired(timestamp):
+            os.remove(path)
+            return None
+        with open(path, 'rb') as f:
+            return timestamp, f.read()
+
+    def _write_disk(self, key, value):
+        directory = self._disk_dir()
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        path = self._disk_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(value)
+        os.rename(tmp_path, path)
+        files = os.listdir(directory)
+        if len(files) > self.max_disk_entries:
+            files = sorted((os.path.join(directory, x) for x in files),
+                           key=os.path.getmtime)
+            for old_path in files[:len(files) - self.max_disk_entries]:
+                os.remove(old_path)
+
+    def check_generation(self, connection, table_prefix=''):
+        '''
+        Drops every entry if the routing tables were reloaded since the
+        last check. The database is asked at most once per check interval.
+        '''
+        now = time.time()
+        if now - self.last_generation_check < self.generation_check_interval:
+            return
+        self.last_generation_check = now
+        generation = get_generation(connection, table_prefix)
+        if generation != self.generation:
+            if self.generation is not None:
+                logging.info("routing tables reloaded, invalidating isoband cache")
+            self.invalidate(generation)
+
+    def invalidate(self, generation=None):
+        with self.lock:
+            self.entries.clear()
+            self.generation = generation
+            if self.store_path is not None and os.path.exists(self.store_path):
+                for name in os.listdir(self.store_path):
+                    if name != str(generation):
+                        shutil.rmtree(os.path.join(self.store_path, name),
+                                      ignore_errors=True)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None and not self._expired(entry[0]):
+                self.entries[key] = entry
+                self.hits += 1
+                return entry[1]
+            entry = None
+            if self.store_path is not None:
+                entry = self._read_disk(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # keeps the age of the disk entry so it still expires on time
+            self._put_memory(key, entry[1], entry[0])
+            return entry[1]
+
+    def _put_memory(self, key, value, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.entries[key] = (timestamp, value)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def put(self, key, value):
+        with self.lock:
+            self._put_memory(key, value)
+            if self.store_path is not None:
+                self._write_disk(key, value)
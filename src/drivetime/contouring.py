@@ -0,0 +1,68 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+'''
+Filled contour extraction working directly on an interpolated grid, without
+going through pyplot and its global figure state, so it can be called from
+several threads at once.
+'''
+
+try:
+    import contourpy
+    CONTOURPY_PRESENT = True
+except ImportError:
+    from matplotlib import _contour
+    CONTOURPY_PRESENT = False
+
+from numpy import asarray
+
+MOVETO = 1
+
+
+def _contour_generator(x_grid, y_grid, z):
+    if CONTOURPY_PRESENT:
+        return contourpy.contour_generator(x_grid, y_grid, z,
+                                           fill_type=contourpy.FillType.OuterCode)
+    return _contour.QuadContourGenerator(x_grid, y_grid, z, None, True, 0)
+
+
+def filled_contours(x_grid, y_grid, z, levels):
+    '''
+    Returns a list of (lower level, paths) for every band between two
+    consecutive levels. Each path is a (vertices, codes) pair, a new ring
+    starting at every MOVETO code, as in matplotlib paths.
+    '''
+    z = asarray(z, dtype=float)
+    levels = [float(x) for x in levels]
+    generator = _contour_generator(x_grid, y_grid, z)
+    lowers = list(levels[:-1])
+    # same as contourf: include the minimum in the first band
+    if len(lowers) > 0 and lowers[0] == z.min():
+        lowers[0] -= 1e-10 * max(1., abs(lowers[0]))
+    bands = []
+    for lower, upper, level in zip(lowers, levels[1:], levels[:-1]):
+        if CONTOURPY_PRESENT:
+            vertices, codes = generator.filled(lower, upper)
+        else:
+            vertices, codes = generator.create_filled_contour(lower, upper)
+        bands.append((level, zip(vertices, codes)))
+    return bands
@@ -0,0 +1,152 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+'''
+In-process drivetime engine. Runs a bounded Dijkstra over the CSR graph
+exported by the loader (pgroutingloader.py --export-graph), so isochrones
+can be served without a database round trip. The file layout must match
+util/graphexport.py.
+'''
+
+import heapq
+import struct
+import sys
+
+from numpy import array, dtype, float64, frombuffer, inf, int32, memmap, nonzero
+
+import pgrouting_distance_isobands as pdi
+
+GRAPH_MAGIC = 'PGRCSR01'
+HEADER_FORMAT = '<8sIII12x'
+# restrictions at least this expensive forbid the turn, cheaper ones add a penalty
+FORBIDDEN_COST = 99999
+
+
+class CSRGraph(object):
+    def __init__(self, path):
+        self.data = memmap(path, mode='r')
+        header_size = struct.calcsize(HEADER_FORMAT)
+        magic, vertex_count, arc_count, restriction_count = struct.unpack(
+            HEADER_FORMAT, self.data[:header_size].tobytes())
+        if magic != GRAPH_MAGIC:
+            raise Exception("%s is not a CSR graph file" % (path,))
+        self.vertex_count = vertex_count
+        self.arc_count = arc_count
+        
+        layout = (('costs', float64, arc_count),
+                  ('lons', float64, vertex_count),
+                  ('lats', float64, vertex_count),
+                  ('restriction_costs', float64, restriction_count),
+                  ('offsets', int32, vertex_count + 1),
+                  ('targets', int32, arc_count),
+                  ('edge_ids', int32, arc_count),
+                  ('vertex_ids', int32, vertex_count),
+                  ('restriction_from', int32, restriction_count),
+                  ('restriction_to', int32, restriction_count))
+        offset = header_size
+        for name, item_type, count in layout:
+            item_type = dtype(item_type).newbyteorder('<')
+            setattr(self, name, frombuffer(self.data, dtype=item_type,
+                                           count=count, offset=offset))
+            offset += count * item_type.itemsize
+        
+        self.restrictions = {}
+        for from_edge, to_edge, cost in zip(self.restriction_from,
+                                            self.restriction_to,
+                                            self.restriction_costs):
+            self.restrictions.setdefault(int(from_edge), {})[int(to_edge)] = float(cost)
+        self._tree = None
+        self._arc_lists = None
+
+    def nearest_vertex(self, lat, lon):
+        if self._tree is None:
+            from scipy.spatial import cKDTree
+            self._tree = cKDTree(zip(self.lons, self.lats))
+        return int(self._tree.query((lon, lat))[1])
+
+    def arc_lists(self):
+        '''
+        The CSR arrays as plain lists, converted on first use; indexing numpy
+        arrays one element at a time in the Dijkstra loop is much slower
+        '''
+        if self._arc_lists is None:
+            self._arc_lists = (self.offsets.tolist(), self.targets.tolist(),
+                               self.costs.tolist(), self.edge_ids.tolist())
+        return self._arc_lists
+
+    def bounded_dijkstra(self, source, max_cost, blocked_edges=()):
+        '''
+        Costs from source to every vertex reachable within max_cost. Turn
+        restrictions are checked against the edge each vertex was settled
+        through, which is exact for simple from/to restrictions except when
+        the forbidden turn lies on the only shortest path to a vertex.
+        '''
+        offsets, targets, costs, edge_ids = self.arc_lists()
+        restrictions = self.restrictions
+        blocked_edges = set(blocked_edges)
+        distances = [inf] * self.vertex_count
+        incoming = {}
+        distances[source] = 0.
+        heap = [(0., source, -1)]
+        while heap:
+            cost, vertex, via_edge = heapq.heappop(heap)
+            if cost > distances[vertex] or vertex in incoming:
+                continue
+            incoming[vertex] = via_edge
+            turn_costs = restrictions.get(via_edge)
+            for arc in xrange(offsets[vertex], offsets[vertex + 1]):
+                edge = edge_ids[arc]
+                if edge in blocked_edges:
+                    continue
+                new_cost = cost + costs[arc]
+                if turn_costs is not None and edge in turn_costs:
+                    if turn_costs[edge] >= FORBIDDEN_COST:
+                        continue
+                    new_cost += turn_costs[edge]
+                target = targets[arc]
+                if new_cost <= max_cost and new_cost < distances[target]:
+                    distances[target] = new_cost
+                    heapq.heappush(heap, (new_cost, target, edge))
+        return array(distances)
+
+    def reached_points(self, lat, lon, max_cost, blocked_edges=()):
+        distances = self.bounded_dijkstra(self.nearest_vertex(lat, lon), max_cost,
+                                          blocked_edges)
+        reached = nonzero(distances <= max_cost)[0]
+        return pdi.PointDataset(self.lons[reached], self.lats[reached],
+                                distances[reached])
+
+
+def parse_blockage(blockage):
+    if not blockage:
+        return ()
+    return [int(x) for x in blockage.split(',') if x.strip()]
+
+
+if __name__ == '__main__':
+    # engine.py GRAPH_FILE lat lon cost [blocked edge gids, comma separated]
+    graph = CSRGraph(sys.argv[1])
+    blockage = sys.argv[5] if len(sys.argv) > 5 else ''
+    spatial_ds = graph.reached_points(float(sys.argv[2]), float(sys.argv[3]),
+                                      float(sys.argv[4]), parse_blockage(blockage))
+    pdi.isobands(spatial_ds, 0, 60, max_level=240,
+                 writer=pdi.GeoJSONWriter(sys.stdout))
@@ -0,0 +1,181 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+'''
+Streaming writers for isoband features. Features are written one at a time
+to a file-like object, so serialization stays linear in the output size.
+Each feature is a dict of properties and a list of rings, every ring being
+an (n, 2) array of coordinates, the first ring being the exterior one.
+'''
+
+import json
+import struct
+
+from math import ceil, log10
+from numpy import around, nonzero
+
+MOVETO = 1
+
+GEOJSON_HEADER = ('{"type": "FeatureCollection",' + 
+                  '"crs": { "type": "name", ' + 
+                  '"properties": { "name": "urn:ogc:def:crs:OGC:1.3:CRS84" } },' + 
+                  '"features": [')
+
+WKB_POLYGON = 3
+
+
+def split_rings(vertices, codes):
+    starts = list(nonzero(codes == MOVETO)[0]) + [len(vertices)]
+    return [vertices[starts[idx]:starts[idx + 1]] for idx in range(len(starts) - 1)]
+
+
+def quantize(ring, precision):
+    if precision is None:
+        return ring
+    # the second rounding drops float noise such as 26.000300000000001
+    digits = max(0, int(ceil(-log10(precision))))
+    return around(around(ring / precision) * precision, digits)
+
+
+class GeoJSONWriter(object):
+    def __init__(self, stream, precision=None):
+        self.stream = stream
+        self.precision = precision
+        self.first = True
+
+    def begin(self, srs=None):
+        self.stream.write(GEOJSON_HEADER)
+
+    def write_feature(self, properties, rings):
+        if self.first:
+            self.first = False
+        else:
+            self.stream.write(',')
+        self.stream.write('{"type": "Feature", "geometry": {"type": "Polygon", "coordinates": ')
+        self.stream.write(json.dumps([quantize(ring, self.precision).tolist()
+                                      for ring in rings]))
+        self.stream.write('}, "properties": ')
+        self.stream.write(json.dumps(properties))
+        self.stream.write('}')
+
+    def end(self):
+        self.stream.write(']}')
+
+
+class CollectingWriter(object):
+    '''
+    Keeps the features in a list, e.g. to send them back from a worker process
+    '''
+    def __init__(self):
+        self.features = []
+
+    def begin(self, srs=None):
+        pass
+
+    def write_feature(self, properties, rings):
+        self.features.append((dict(properties), rings))
+
+    def end(self):
+        pass
+
+
+class WKBWriter(object):
+    '''
+    Length prefixed little endian records: the cost level as a double, the
+    lengths of the remaining properties (as JSON) and of the polygon WKB, then
+    both. Coordinates stay doubles, so snapping them to precision degrees
+    keeps the records as large; only the compressed output gets smaller.
+    '''
+    def __init__(self, stream, precision=None, level_property='cost'):
+        self.stream = stream
+        self.precision = precision
+        self.level_property = level_property
+
+    def begin(self, srs=None):
+        pass
+
+    def write_feature(self, properties, rings):
+        parts = [struct.pack('<BII', 1, WKB_POLYGON, len(rings))]
+        for ring in rings:
+            ring = quantize(ring, self.precision)
+            parts.append(struct.pack('<I', len(ring)))
+            parts.append(ring.astype('<f8').tobytes())
+        wkb = ''.join(parts)
+        extra = dict((key, value) for key, value in properties.iteritems()
+                     if key != self.level_property)
+        extra = json.dumps(extra) if len(extra) > 0 else ''
+        self.stream.write(struct.pack('<dII', properties.get(self.level_property, 0),
+                                      len(extra), len(wkb)))
+        self.stream.write(extra)
+        self.stream.write(wkb)
+
+    def end(self):
+        pass
+
+
+class OGRWriter(object):
+    '''
+    Writes features to a file through an OGR driver, e.g. FlatGeobuf
+    (requires GDAL >= 3.1)
+    '''
+    def __init__(self, path, driver='FlatGeobuf', precision=None):
+        self.path = path
+        self.driver = driver
+        self.precision = precision
+        self.data_source = None
+        self.layer = None
+
+    def begin(self, srs=None):
+        from osgeo import ogr
+        self.ogr = ogr
+        drv = ogr.GetDriverByName(self.driver)
+        if drv is None:
+            raise Exception("OGR driver %s not available" % (self.driver,))
+        self.data_source = drv.CreateDataSource(self.path)
+        self.layer = self.data_source.CreateLayer('distances', srs=srs,
+                                                  geom_type=ogr.wkbPolygon)
+        self.fields = set()
+
+    def write_feature(self, properties, rings):
+        ogr = self.ogr
+        for key, value in properties.iteritems():
+            if key not in self.fields:
+                field_type = ogr.OFTReal if isinstance(value, float) else ogr.OFTString
+                self.layer.CreateField(ogr.FieldDefn(key, field_type))
+                self.fields.add(key)
+        feature = ogr.Feature(self.layer.GetLayerDefn())
+        for key, value in properties.iteritems():
+            feature.SetField(key, value)
+        polygon = ogr.Geometry(ogr.wkbPolygon)
+        for ring in rings:
+            ogr_ring = ogr.Geometry(ogr.wkbLinearRing)
+            for x, y in quantize(ring, self.precision):
+                ogr_ring.AddPoint_2D(float(x), float(y))
+            polygon.AddGeometry(ogr_ring)
+        feature.SetGeometry(polygon)
+        self.layer.CreateFeature(feature)
+        feature.Destroy()
+
+    def end(self):
+        if self.data_source is not None:
+            self.data_source.Destroy()
+            self.data_source = None
@@ -30,21 +30,29 @@ instead of polylines
 This version requires matplotlib, but there is another one
 '''
 
+import hashlib
+import re
 import sys
-import uuid
+import threading
 import time
-import matplotlib.pyplot as plt
+import uuid
+
+from collections import OrderedDict
+from cStringIO import StringIO
 
 import psycopg2.extensions
-from psycopg2.extras import DictCursor
-from scipy.interpolate import griddata
-from math import floor, ceil
+from scipy.spatial import Delaunay
+from math import floor, ceil, log, sqrt
 
-from numpy import arange
+from numpy import arange, asarray, column_stack, einsum, empty, full
 from numpy import meshgrid
 from osgeo import ogr
 from osgeo.osr import SpatialReference
 
+from contouring import filled_contours
+from output import GeoJSONWriter, split_rings
+from simplify import DOUGLAS_PEUCKER, count_vertices, simplify_features
+
 connString = 'PG:dbname=test_pyosm host=localhost user=postgres  password=*** port=5433'
 connParams = {'database':"test_pyosm",
               'host':"localhost",
@@ -52,10 +60,148 @@ connParams = {'database':"test_pyosm",
               'user':"postgres",
               'password':"***"}
 
+# the grid never gets finer than MIN_CELL_SIZE degrees nor larger than MAX_GRID_CELLS
+MIN_CELL_SIZE = 0.0003
+MAX_GRID_CELLS = 250000
+GRID_CACHE_SIZE = 8
+GRID_CACHE = OrderedDict()
+# the isoband service and batch threads share the caches
+GRID_CACHE_LOCK = threading.Lock()
+TRIANGULATION_CACHE_SIZE = 4
+TRIANGULATION_CACHE = OrderedDict()
+TRIANGULATION_CACHE_LOCK = threading.Lock()
+
 OGR_SQL = "select * from pgr_densedistance({0},{1},{2},'{3}')"
-PG_SQL = "select cost, ST_X(geom) as x, ST_Y(geom) as y from pgr_densedistance(%s,%s,%s,%s)"
+PG_NAMED_SQL = "select {0}, ST_X(geom) as x, ST_Y(geom) as y from pgr_densedistance(%s,%s,%s,%s)"
+FETCH_SIZE = 20000
+# zField is pasted into PG_NAMED_SQL, so it must be a plain column name
+FIELD_NAME_MATCHER = re.compile('^[A-Za-z_][A-Za-z0-9_]*$')
 
 # "select cost, ST_AsLatLonText(geom,'D.DDDDD') as txt_geom from pgr_densedistance(%s,%s,%s,%s)"
+
+def grid_definition(xMin, xMax, yMin, yMax, min_cell_size=MIN_CELL_SIZE,
+                    max_cells=MAX_GRID_CELLS, align=False):
+    '''
+    Picks a square cell size adapted to the extent so the interpolation grid
+    stays under max_cells, and returns the grid size and geotransform.
+    Aligned grids use power of two multiples of min_cell_size and start on a
+    multiple of the cell size, so overlapping extents share grid nodes.
+    '''
+    width, height = abs(xMax - xMin), abs(yMax - yMin)
+    cell_size = max(min_cell_size, sqrt(width * height / float(max_cells)))
+    if align:
+        cell_size = min_cell_size * 2 ** int(ceil(log(cell_size / min_cell_size, 2) - 1e-9))
+    while True:
+        if align:
+            xStart = floor(xMin / cell_size) * cell_size
+            yStart = ceil(yMax / cell_size) * cell_size
+        else:
+            xStart, yStart = xMin, yMax
+        xSize = max(1, int(ceil((xMax - xStart) / cell_size)))
+        ySize = max(1, int(ceil((yStart - yMin) / cell_size)))
+        if xSize * ySize <= max_cells:
+            break
+        cell_size *= 2 if align else 1.01
+    return (xSize, ySize), [xStart, cell_size, 0, yStart, 0, -cell_size]
+
+def _covering_grid(size, geotransform):
+    '''
+    Key and row, column offsets of a cached grid with the same cell size whose
+    nodes include every node of the requested grid, as aligned grids of
+    overlapping extents do
+    '''
+    cell_size = geotransform[1]
+    for key in reversed(GRID_CACHE.keys()):
+        x_size, y_size, x_start, cached_cell_size, y_start = key
+        if cached_cell_size != cell_size:
+            continue
+        col = (geotransform[0] - x_start) / cell_size
+        row = (y_start - geotransform[3]) / cell_size
+        col_idx, row_idx = int(round(col)), int(round(row))
+        if (abs(col - col_idx) > 1e-6 or abs(row - row_idx) > 1e-6
+            or col_idx < 0 or row_idx < 0
+            or col_idx + size[0] > x_size or row_idx + size[1] > y_size):
+            continue
+        return key, row_idx, col_idx
+    return None
+
+def build_grid(size, geotransform):
+    key = (size[0], size[1], geotransform[0], geotransform[1], geotransform[3])
+    with GRID_CACHE_LOCK:
+        grid = GRID_CACHE.pop(key, None)
+        if grid is not None:
+            GRID_CACHE[key] = grid
+            return grid
+        covering = _covering_grid(size, geotransform)
+        if covering is not None:
+            covering_key, row, col = covering
+            grid = GRID_CACHE.pop(covering_key)
+            GRID_CACHE[covering_key] = grid
+            return [nodes[row:row + size[1] + 1, col:col + size[0] + 1]
+                    for nodes in grid]
+    x_pos = geotransform[0] + arange(size[0] + 1) * geotransform[1]
+    y_pos = geotransform[3] + arange(size[1] + 1) * geotransform[5]
+    grid = meshgrid(x_pos, y_pos)
+    with GRID_CACHE_LOCK:
+        GRID_CACHE[key] = grid
+        while len(GRID_CACHE) > GRID_CACHE_SIZE:
+            GRID_CACHE.popitem(last=False)
+    return grid
+
+class GridInterpolator(object):
+    '''
+    Linear interpolation of a fixed point set on a fixed grid. The Delaunay
+    triangulation, the point location and the barycentric weights are
+    computed once; interpolating another set of values for the same points
+    is then a weighted sum. Cells outside the convex hull of the points are
+    masked with nodata and not interpolated.
+    '''
+    def __init__(self, x, y, x_grid, y_grid):
+        triangulation = Delaunay(column_stack((x, y)))
+        grid_points = column_stack((x_grid.ravel(), y_grid.ravel()))
+        simplices = triangulation.find_simplex(grid_points)
+        self.shape = x_grid.shape
+        self.inside = simplices >= 0
+        simplices = simplices[self.inside]
+        transform = triangulation.transform[simplices]
+        barycentric = einsum('ijk,ik->ij', transform[:, :2, :],
+                             grid_points[self.inside] - transform[:, 2, :])
+        self.weights = column_stack((barycentric, 1 - barycentric.sum(axis=1)))
+        self.vertices = triangulation.simplices[simplices]
+
+    def interpolate(self, vals, nodata):
+        vertex_vals = asarray(vals, dtype=float)[self.vertices]
+        result = full(self.shape[0] * self.shape[1], nodata, dtype=float)
+        result[self.inside] = einsum('ij,ij->i', vertex_vals, self.weights)
+        return result.reshape(self.shape)
+
+def get_grid_interpolator(x, y, size, geotransform):
+    '''
+    Returns the cached interpolator for this point set and grid, so several
+    cost scenarios or band schemes over the same points triangulate once
+    '''
+    x = asarray(x, dtype=float)
+    y = asarray(y, dtype=float)
+    key = (hashlib.sha1(x.tobytes() + y.tobytes()).hexdigest(),
+           size[0], size[1], geotransform[0], geotransform[1], geotransform[3])
+    with TRIANGULATION_CACHE_LOCK:
+        interpolator = TRIANGULATION_CACHE.pop(key, None)
+        if interpolator is not None:
+            TRIANGULATION_CACHE[key] = interpolator
+            return interpolator
+    # triangulating is slow, so other threads are not held up meanwhile
+    x_grid, y_grid = build_grid(size, geotransform)
+    interpolator = GridInterpolator(x, y, x_grid, y_grid)
+    with TRIANGULATION_CACHE_LOCK:
+        TRIANGULATION_CACHE[key] = interpolator
+        while len(TRIANGULATION_CACHE) > TRIANGULATION_CACHE_SIZE:
+            TRIANGULATION_CACHE.popitem(last=False)
+    return interpolator
+
+def interpolate_grid(x, y, vals, x_grid, y_grid, nodata):
+    return GridInterpolator(x, y, x_grid, y_grid).interpolate(vals, nodata)
+
+
 class SpatialDataset:
     def __init__(self, params, zField='z'):
         ds = ogr.Open(connString)
@@ -70,11 +216,7 @@ class SpatialDataset:
         self.vals = []
 
         xMin, xMax, yMin, yMax = extent
-        xSize, ySize = abs(xMax - xMin) / 0.0003, abs(yMin - yMax) / 0.0003
-        self.size = xSize, ySize
-        
-        self.geotransform = [xMin, (xMax - xMin) / xSize, 0,
-                             yMax, 0, (yMin - yMax) / ySize]
+        self.size, self.geotransform = grid_definition(xMin, xMax, yMin, yMax)
 
         
         feature = layer.GetNextFeature()        
@@ -89,160 +231,186 @@ class SpatialDataset:
         ds.Destroy()
 
 class SpatialDataset2:
-    def __init__(self, params, zField='z'):
+    def __init__(self, params, zField='z', connection=None):
         psycopg2.extensions.register_type(psycopg2.extensions.UNICODE)
         psycopg2.extensions.register_type(psycopg2.extensions.UNICODEARRAY)        
-        connection = psycopg2.connect(**connParams)
-
-        self.geotransform = []        
-        self.x = []
-        self.y = []
-        self.vals = []
-        
-        cursor = connection.cursor(cursor_factory=DictCursor)
-        cursor.execute(PG_SQL, params)
-        xMin, xMax, yMin, yMax = 91, -91, 181, -181
-        for record in cursor:
-            # print record['txt_geom']
-            # lat, lon = [float(x) for x in record['txt_geom'].split(' ')]
-            y = record['y']
-            x = record['x']
-            
-            if yMin > y:
-                yMin = y
-            if yMax < y:
-                yMax = y
-
-            if xMin > x:
-                xMin = x
-            if xMax < x:
-                xMax = x
-                
-            self.x.append(x)
-            self.y.append(y)
-            self.vals.append(record[zField])
+        if FIELD_NAME_MATCHER.match(zField) is None:
+            raise Exception('zField is not valid: ' + zField)
+        # connections handed in (e.g. from a pool) are left open for the caller
+        own_connection = connection is None
+        if own_connection:
+            connection = psycopg2.connect(**connParams)
+
+        # named cursor: rows are streamed from the server in FETCH_SIZE chunks
+        cursor = connection.cursor(name='densedistance_' + uuid.uuid4().hex)
+        cursor.itersize = FETCH_SIZE
+        cursor.execute(PG_NAMED_SQL.format(zField), params)
+        records = empty((FETCH_SIZE, 3))
+        count = 0
+        rows = cursor.fetchmany(FETCH_SIZE)
+        while rows:
+            if count + len(rows) > len(records):
+                records.resize((2 * len(records), 3), refcheck=False)
+            records[count:count + len(rows)] = rows
+            count += len(rows)
+            rows = cursor.fetchmany(FETCH_SIZE)
         cursor.close()
-        connection.close()
+        if own_connection:
+            connection.close()
+        else:
+            connection.rollback()
+        if count == 0:
+            raise Exception("no reachable points for %s" % (params,))
+
+        records = records[:count]
+        self.vals = records[:, 0]
+        self.x = records[:, 1]
+        self.y = records[:, 2]
+        xMin, xMax = self.x.min(), self.x.max()
+        yMin, yMax = self.y.min(), self.y.max()
         # print xMin, xMax, yMin, yMax
-        xSize, ySize = abs(xMax - xMin) / 0.0003, abs(yMin - yMax) / 0.0003
-        self.size = xSize, ySize
-        
-        self.geotransform = [xMin, (xMax - xMin) / xSize, 0,
-                             yMax, 0, (yMin - yMax) / ySize]
-        
         self.proj = SpatialReference()
         self.proj.ImportFromEPSG(4326)
-        xSize, ySize = abs(xMax - xMin) / 0.0003, abs(yMin - yMax) / 0.0003
-        self.size = xSize, ySize
-        
-        self.geotransform = [xMin, (xMax - xMin) / xSize, 0,
-                             yMax, 0, (yMin - yMax) / ySize]
+        self.size, self.geotransform = grid_definition(xMin, xMax, yMin, yMax)
 
-def isobands(spatial_ds, offset, interval, min_level=None, max_level=None, nodata=300):
+class PointDataset:
     '''
-    The method that calculates the isobands
+    Reached points already held in memory, e.g. shipped to a worker process
     '''
-    xsize_in, ysize_in = spatial_ds.size
-    geotransform_in = spatial_ds.geotransform
-    srs = spatial_ds.proj
-    # print geotransform_in
-
-    # Creating the output vectorial file
-    drv = ogr.GetDriverByName('Memory')
-    
-    # out_file = os.path.join(r"C:\tmp",str(uuid.uuid4())+".json")
-    out_file = str(uuid.uuid4())
-    # print out_file
-    dst_ds = drv.CreateDataSource(out_file)
-       
-    dst_layer = dst_ds.CreateLayer('distances', geom_type=ogr.wkbPolygon,
-        srs=srs)
-    attr_name = 'cost'
-    fdef = ogr.FieldDefn(attr_name, ogr.OFTReal)
-    dst_layer.CreateField(fdef)
-
-
-    x_pos = arange(geotransform_in[0],
-        geotransform_in[0] + xsize_in * geotransform_in[1], geotransform_in[1])
-    y_pos = arange(geotransform_in[3],
-        geotransform_in[3] + ysize_in * geotransform_in[5], geotransform_in[5])
-    x_grid, y_grid = meshgrid(x_pos, y_pos)
-    linear_intp = griddata((spatial_ds.x, spatial_ds.y),
-                           spatial_ds.vals,
-                           (x_grid, y_grid),
-                           method='linear',
-                           fill_value=nodata)
-
-
-    
+    def __init__(self, x, y, vals, align=False, proj=None):
+        self.x = asarray(x, dtype=float)
+        self.y = asarray(y, dtype=float)
+        self.vals = asarray(vals, dtype=float)
+        self.proj = proj
+        self.size, self.geotransform = grid_definition(self.x.min(), self.x.max(),
+                                                       self.y.min(), self.y.max(),
+                                                       align=align)
+
+def level_range(vals, offset, interval, min_level=None, max_level=None):
     if min_level is None:
-        min_value = min(spatial_ds.vals)
+        min_value = asarray(vals).min()
         min_level = offset + interval * floor((min_value - offset) / interval)
 
     if max_level is None:
-        max_value = max(spatial_ds.vals)
+        max_value = asarray(vals).max()
         # Due to range issues, a level is added
         max_level = offset + interval * (1 + ceil((max_value - offset) / interval)) 
+    return min_level, max_level, interval
 
-    levels = arange(min_level, max_level, interval)
-
-    contours = plt.contourf(x_grid, y_grid, linear_intp, levels)
-    # plt.show()
-
-    first = True
-
-    result = ('{"type": "FeatureCollection",' + 
-           '"crs": { "type": "name", ' + 
-           '"properties": { "name": "urn:ogc:def:crs:OGC:1.3:CRS84" } },' + 
-           '"features": [')
-                                                                            
-
-    for level in range(len(contours.collections)):
-        paths = contours.collections[level].get_paths()
-        for path in paths:
-
-            feat_out = ogr.Feature(dst_layer.GetLayerDefn())
-            feat_out.SetField(attr_name, contours.levels[level])
-            pol = ogr.Geometry(ogr.wkbPolygon)
-
-
-            ring = None            
-            
-            for i in range(len(path.vertices)):
-                point = path.vertices[i]
-                if path.codes[i] == 1:
-                    if ring != None:
-                        pol.AddGeometry(ring)
-                    ring = ogr.Geometry(ogr.wkbLinearRing)
-                    
-                ring.AddPoint_2D(point[0], point[1])
-            
-
-            pol.AddGeometry(ring)
-            feat_out.SetGeometry(pol)
-
-            if first:
-                first = False
-            else:
-                result += ","
-            result += feat_out.ExportToJson()
-
-            # print pol.ExportToWkt()
-            # print "-----"
-            
-            """
-            if dst_layer.CreateFeature(feat_out) != 0:
-                print "Failed to create feature in shapefile.\n"
-                exit( 1 )
-            """
-            
-            feat_out.Destroy()
-    dst_ds.Destroy()
-    # drv.DeleteDataSource( out_file )
-    result += ']}'
-    return result
+def isobands(spatial_ds, offset, interval, min_level=None, max_level=None, nodata=300,
+             writer=None, properties=None, simplify_tolerance=None,
+             simplify_method=DOUGLAS_PEUCKER, stats=None):
+    '''
+    The method that calculates the isobands. Features are streamed to writer;
+    if no writer is given the result is returned as a GeoJSON string.
+    With a simplify_tolerance (degrees) band polygons are generalized, keeping
+    shared boundaries identical. If a stats dict is given it receives the
+    duration of every stage and the vertex counts.
+    '''
+    if stats is None:
+        stats = {}
+    start = time.time()
+    xsize_in, ysize_in = spatial_ds.size
+    geotransform_in = spatial_ds.geotransform
+    srs = spatial_ds.proj
+    # print geotransform_in
+
+    x_grid, y_grid = build_grid((xsize_in, ysize_in), geotransform_in)
+    interpolator = get_grid_interpolator(spatial_ds.x, spatial_ds.y,
+                                         (xsize_in, ysize_in), geotransform_in)
+    linear_intp = interpolator.interpolate(spatial_ds.vals, nodata)
+    stats['interpolation'] = time.time() - start
 
+    start = time.time()
+    levels = arange(*level_range(spatial_ds.vals, offset, interval,
+                                 min_level, max_level))
+
+    contours = filled_contours(x_grid, y_grid, linear_intp, levels)
+    features = []
+    for level, paths in contours:
+        feature_properties = {'cost': float(level)}
+        if properties is not None:
+            feature_properties.update(properties)
+        for vertices, codes in paths:
+            features.append((feature_properties, split_rings(vertices, codes)))
+    stats['contouring'] = time.time() - start
+    stats['vertices'] = count_vertices(features)
+
+    if simplify_tolerance is not None:
+        # simplified one at a time as they are written, so the output streams
+        features = simplify_features(features, simplify_tolerance, simplify_method)
+        stats['simplified_vertices'] = 0
+
+    start = time.time()
+    serialization = 0.
+    result = None
+    if writer is None:
+        result = StringIO()
+        writer = GeoJSONWriter(result)
+    writer.begin(srs)
+    for feature_properties, rings in features:
+        written = time.time()
+        writer.write_feature(feature_properties, rings)
+        serialization += time.time() - written
+        if simplify_tolerance is not None:
+            stats['simplified_vertices'] += sum(len(ring) for ring in rings)
+    writer.end()
+    stats['serialization'] = serialization
+    if simplify_tolerance is not None:
+        stats['simplification'] = time.time() - start - serialization
+    if result is not None:
+        return result.getvalue()
+
+
+def scenario_datasets(datasets, nodata=None, align=False):
+    '''
+    Puts several cost scenarios of the same origin (e.g. blockage variants)
+    on the union of their reached points, points a scenario does not reach
+    getting nodata (by default just above the highest reached cost). All
+    returned datasets share their coordinates and grid, so isobands()
+    triangulates only once for all of them.
+    '''
+    if nodata is None:
+        nodata = max(asarray(spatial_ds.vals).max() for spatial_ds in datasets) + 1
+    index = {}
+    xs, ys = [], []
+    positions = []
+    for spatial_ds in datasets:
+        scenario_positions = []
+        for x, y in zip(spatial_ds.x, spatial_ds.y):
+            position = index.get((x, y))
+            if position is None:
+                position = len(xs)
+                index[(x, y)] = position
+                xs.append(x)
+                ys.append(y)
+            scenario_positions.append(position)
+        positions.append(scenario_positions)
+    x = asarray(xs, dtype=float)
+    y = asarray(ys, dtype=float)
+    result = []
+    for spatial_ds, scenario_positions in zip(datasets, positions):
+        vals = full(len(xs), nodata, dtype=float)
+        vals[scenario_positions] = spatial_ds.vals
+        scenario = PointDataset(x, y, vals, align=align, proj=spatial_ds.proj)
+        result.append(scenario)
+    return result
 
+def scenario_isobands(datasets, offset, interval, min_level=None, max_level=None,
+                      nodata=None):
+    # levels come from the reached points only, not from the nodata fill
+    ranges = [level_range(spatial_ds.vals, offset, interval, min_level, max_level)
+              for spatial_ds in datasets]
+    if nodata is None:
+        # the fill has to clear the top band of every scenario, which
+        # max(cost) + 1 does not when the budget is not a band boundary
+        nodata = max(scenario_max for _, scenario_max, _ in ranges)
+    results = []
+    for (scenario_min, scenario_max, _), scenario in zip(
+            ranges, scenario_datasets(datasets, nodata)):
+        results.append(isobands(scenario, offset, interval, min_level=scenario_min,
+                                max_level=scenario_max, nodata=nodata))
+    return results
 
 
 def test():
@@ -273,4 +441,4 @@ if __name__ == "__main__":
               float(sys.argv[3]),
               blockage)
     spatial_ds = SpatialDataset2(params, 'cost')
-    print isobands(spatial_ds, 0, 60, max_level=240),
+    isobands(spatial_ds, 0, 60, max_level=240, writer=GeoJSONWriter(sys.stdout))
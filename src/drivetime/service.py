@@ -0,0 +1,196 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+'''
+Long running isoband service. Keeps a pool of connections to the routing
+database and the heavy imports loaded, and answers requests such as
+
+    GET /isobands?lat=44.42735&lon=26.09241&cost=300&blockage=
+
+with the GeoJSON produced by isobands().
+'''
+
+import argparse
+import json
+import logging
+import threading
+import urlparse
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+import pgrouting_distance_isobands as pdi
+from cache import IsobandCache, make_key, snap_origin
+
+
+class IsobandService(object):
+    def __init__(self, connection_params, min_connections=1, max_connections=8,
+                 cache=None, table_prefix=''):
+        self.pool = ThreadedConnectionPool(min_connections, max_connections,
+                                           **connection_params)
+        # getconn raises PoolError when the pool is exhausted instead of
+        # waiting, so request threads queue here for a free connection
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.cache = cache
+        self.table_prefix = table_prefix
+
+    def compute(self, lat, lon, cost, blockage='', offset=0, interval=60,
+                max_level=240, simplify_tolerance=None):
+        key = None
+        with self.slots:
+            connection = self.pool.getconn()
+            broken = False
+            try:
+                if self.cache is not None:
+                    self.cache.check_generation(connection, self.table_prefix)
+                    vertex = snap_origin(connection, lat, lon, self.table_prefix)
+                    connection.rollback()
+                    # without a vertex every origin would share one key
+                    if vertex is not None:
+                        key = make_key(vertex, cost, blockage, offset, interval,
+                                       max_level=max_level) + (simplify_tolerance,)
+                        result = self.cache.get(key)
+                        if result is not None:
+                            return result
+                spatial_ds = pdi.SpatialDataset2((lat, lon, cost, blockage), 'cost',
+                                                 connection=connection)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True
+                raise
+            except Exception:
+                # unreachable origins and invalid requests leave the
+                # connection usable
+                broken = bool(connection.closed)
+                if not broken:
+                    try:
+                        connection.rollback()
+                    except psycopg2.Error:
+                        broken = True
+                raise
+            finally:
+                self.pool.putconn(connection, close=broken)
+        stats = {}
+        result = pdi.isobands(spatial_ds, offset, interval, max_level=max_level,
+                              simplify_tolerance=simplify_tolerance, stats=stats)
+        logging.debug("isobands for %s, %s: %s" % (lat, lon, stats))
+        if key is not None:
+            self.cache.put(key, result)
+        return result
+
+    def close(self):
+        self.pool.closeall()
+
+
+class IsobandRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        if url.path != '/isobands':
+            self.send_error(404)
+            return
+        query = dict((key, values[0]) for key, values in
+                     urlparse.parse_qs(url.query, keep_blank_values=True).iteritems())
+        try:
+            lat = float(query['lat'])
+            lon = float(query['lon'])
+            cost = float(query['cost'])
+            interval = float(query.get('interval', 60))
+            max_level = float(query.get('max_level', 240))
+            offset = float(query.get('offset', 0))
+            tolerance = query.get('simplify')
+            tolerance = float(tolerance) if tolerance else None
+        except (KeyError, ValueError) as e:
+            self.send_error(400, "invalid request: %s" % (e,))
+            return
+        try:
+            result = self.server.service.compute(lat, lon, cost,
+                                                 query.get('blockage', ''),
+                                                 offset, interval, max_level,
+                                                 tolerance)
+        except Exception as e:
+            logging.exception("error computing isobands for %s" % (self.path,))
+            self.send_error(500, str(e))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(result)))
+        self.end_headers()
+        self.wfile.write(result)
+
+    def log_message(self, format, *args):
+        logging.info(format % args)
+
+
+class IsobandServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        HTTPServer.__init__(self, address, IsobandRequestHandler)
+        self.service = service
+
+
+def serve(connection_params, host='localhost', port=8080, pool_size=8,
+          cache=None, table_prefix=''):
+    service = IsobandService(connection_params, max_connections=pool_size,
+                             cache=cache, table_prefix=table_prefix)
+    server = IsobandServer((host, port), service)
+    logging.info("serving isobands on %s:%s" % (host, port))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s %(levelname)-8s %(message)s')
+    parser = argparse.ArgumentParser(description='Serve isobands over HTTP.')
+    parser.add_argument('--host', type=str, dest='host', default='localhost')
+    parser.add_argument('--port', type=int, dest='port', default=8080)
+    parser.add_argument('--pool-size', type=int, dest='pool_size', default=8,
+                        help='Maximum number of pooled database connections')
+    parser.add_argument('--connection-params', type=str, dest='connection_params',
+                        help=('JSON object with psycopg2 connection parameters. ' + 
+                              'If not present, will use the module defaults'))
+    parser.add_argument('--prefix-tables', type=str, dest='prefix', default='',
+                        help='Prefix of the loaded routing tables')
+    parser.add_argument('--cache-entries', type=int, dest='cache_entries',
+                        default=0,
+                        help='Number of results kept in memory; 0 disables the cache')
+    parser.add_argument('--cache-max-age', type=int, dest='cache_max_age',
+                        default=3600,
+                        help='Seconds after which a cached result expires')
+    parser.add_argument('--cache-dir', type=str, dest='cache_dir', default=None,
+                        help='Directory backing the in-memory cache')
+    args = parser.parse_args()
+    params = pdi.connParams
+    if args.connection_params is not None:
+        params = json.loads(args.connection_params)
+    cache = None
+    if args.cache_entries > 0:
+        cache = IsobandCache(max_entries=args.cache_entries,
+                             max_age=args.cache_max_age,
+                             store_path=args.cache_dir)
+    serve(params, args.host, args.port, args.pool_size, cache, args.prefix)
@@ -0,0 +1,308 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+'''
+Topology preserving simplification of isoband polygons. Neighbouring bands
+share their boundaries vertex for vertex, so rings are cut into arcs at the
+vertices where boundaries meet or diverge, every distinct arc is simplified
+once and the same simplified arc is used by all the rings sharing it.
+A ring that would make its polygon invalid, crossing itself or another
+ring or ending up outside the shell or inside another hole, is kept
+unsimplified and so are its arcs in every other ring sharing them.
+'''
+
+import heapq
+
+from numpy import arange, around, array, concatenate, cross, cumsum, full, hypot, \
+    maximum, minimum, repeat, roll, searchsorted, vstack
+
+DOUGLAS_PEUCKER = 'douglas-peucker'
+VISVALINGAM = 'visvalingam'
+# bands computed from opposite sides of a boundary differ in the last bits,
+# snapping makes their shared vertices identical
+SNAP_DIGITS = 9
+# edge pairs tested for crossings at once, bounding the temporary arrays
+CROSSING_CHUNK = 100000
+
+
+def douglas_peucker(points, tolerance):
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        length = hypot(segment[0], segment[1])
+        middle = points[first + 1:last] - start
+        if length > 0:
+            distances = abs(cross(segment, middle)) / length
+        else:
+            distances = hypot(middle[:, 0], middle[:, 1])
+        farthest = distances.argmax()
+        if distances[farthest] > tolerance:
+            idx = first + 1 + farthest
+            keep[idx] = True
+            stack.append((first, idx))
+            stack.append((idx, last))
+    return points[array(keep)]
+
+
+def _triangle_area(points, before, idx, after):
+    return abs(cross(points[idx] - points[before], points[after] - points[before])) / 2.
+
+
+def visvalingam(points, tolerance):
+    # removes the vertex with the smallest effective area until all are above tolerance^2
+    min_area = tolerance * tolerance
+    count = len(points)
+    previous = range(-1, count - 1)
+    following = range(1, count + 1)
+    areas = [None] * count
+    heap = []
+    for idx in range(1, count - 1):
+        areas[idx] = _triangle_area(points, idx - 1, idx, idx + 1)
+        heap.append((areas[idx], idx))
+    heapq.heapify(heap)
+    removed = [False] * count
+    while heap:
+        area, idx = heapq.heappop(heap)
+        if removed[idx] or area != areas[idx]:
+            continue
+        if area >= min_area:
+            break
+        removed[idx] = True
+        before, after = previous[idx], following[idx]
+        following[before] = after
+        previous[after] = before
+        for neighbour in (before, after):
+            if 0 < neighbour < count - 1:
+                # an area never drops below the one of the vertex removed before it
+                areas[neighbour] = max(area, _triangle_area(points, previous[neighbour],
+                                                            neighbour,
+                                                            following[neighbour]))
+                heapq.heappush(heap, (areas[neighbour], neighbour))
+    return points[array([not x for x in removed])]
+
+
+SIMPLIFIERS = {DOUGLAS_PEUCKER: douglas_peucker, VISVALINGAM: visvalingam}
+
+
+def _open_ring(ring):
+    if len(ring) > 1 and tuple(ring[0]) == tuple(ring[-1]):
+        return ring[:-1]
+    return ring
+
+
+def _neighbour_pairs(rings):
+    pairs = {}
+    for ring in rings:
+        ring = _open_ring(ring)
+        count = len(ring)
+        for idx in range(count):
+            pair = frozenset((tuple(ring[idx - 1]), tuple(ring[(idx + 1) % count])))
+            pairs.setdefault(tuple(ring[idx]), set()).add(pair)
+    return pairs
+
+
+def _split_arcs(ring, junctions):
+    ring = _open_ring(ring)
+    count = len(ring)
+    cuts = [idx for idx in range(count) if tuple(ring[idx]) in junctions]
+    if len(cuts) == 0:
+        # no junction: cut at the smallest vertex so rings shared by two bands
+        # are cut at the same place whatever their starting point
+        cuts = [min(range(count), key=lambda idx: tuple(ring[idx]))]
+    arcs = []
+    for number, cut in enumerate(cuts):
+        next_cut = cuts[(number + 1) % len(cuts)]
+        if next_cut <= cut:
+            next_cut += count
+        arcs.append(vstack([ring[idx % count] for idx in range(cut, next_cut + 1)]))
+    return arcs
+
+
+def _arc_key(arc):
+    # arcs shared by two rings run in opposite directions, the key is the
+    # smaller of both directions
+    forward = tuple(map(tuple, arc))
+    backward = forward[::-1]
+    if backward < forward:
+        return backward, True
+    return forward, False
+
+
+def _crossing_rings(rings):
+    # rings having an edge that properly crosses another edge, edges sharing
+    # a vertex do not cross
+    starts = vstack(rings)
+    ends = vstack([roll(ring, -1, axis=0) for ring in rings])
+    ring_ids = concatenate([full(len(ring), number) for number, ring in enumerate(rings)])
+    min_x = minimum(starts[:, 0], ends[:, 0])
+    order = min_x.argsort()
+    starts, ends, ring_ids, min_x = starts[order], ends[order], ring_ids[order], min_x[order]
+    max_x = maximum(starts[:, 0], ends[:, 0])
+    min_y = minimum(starts[:, 1], ends[:, 1])
+    max_y = maximum(starts[:, 1], ends[:, 1])
+    # edges sorted by their left end only need to be tested against the
+    # following edges starting left of their right end
+    counts = maximum(searchsorted(min_x, max_x, side='right') - arange(len(starts)) - 1, 0)
+    firsts = repeat(arange(len(starts)), counts)
+    seconds = firsts + 1 + arange(len(firsts)) - repeat(cumsum(counts) - counts, counts)
+    result = set()
+    for chunk in xrange(0, len(firsts), CROSSING_CHUNK):
+        first = firsts[chunk:chunk + CROSSING_CHUNK]
+        second = seconds[chunk:chunk + CROSSING_CHUNK]
+        overlapping = (min_y[second] <= max_y[first]) & (max_y[second] >= min_y[first])
+        first, second = first[overlapping], second[overlapping]
+        first_start, first_end = starts[first], ends[first]
+        second_start, second_end = starts[second], ends[second]
+        first_dir = first_end - first_start
+        second_dir = second_end - second_start
+        crossing = ((cross(first_dir, second_start - first_start) *
+                     cross(first_dir, second_end - first_start) < 0) &
+                    (cross(second_dir, first_start - second_start) *
+                     cross(second_dir, first_end - second_start) < 0))
+        result.update(ring_ids[first[crossing]])
+        result.update(ring_ids[second[crossing]])
+    return result
+
+
+def _inside(ring, other, other_vertices):
+    # even-odd test of a vertex of ring that is not a vertex of other
+    for point in ring:
+        if tuple(point) not in other_vertices:
+            break
+    else:
+        return False
+    starts, ends = other, roll(other, -1, axis=0)
+    straddling = (starts[:, 1] > point[1]) != (ends[:, 1] > point[1])
+    starts, ends = starts[straddling], ends[straddling]
+    crossing_x = starts[:, 0] + ((point[1] - starts[:, 1]) * (ends[:, 0] - starts[:, 0]) /
+                                 (ends[:, 1] - starts[:, 1]))
+    return (crossing_x > point[0]).sum() % 2 == 1
+
+
+def _misplaced_rings(rings):
+    # holes outside the shell or nested in another hole
+    lower = [ring.min(axis=0) for ring in rings]
+    upper = [ring.max(axis=0) for ring in rings]
+    vertices = {}
+
+    def within(number, other):
+        # only a ring within the bounds of the other can be inside it
+        if not ((lower[number] >= lower[other]).all() and
+                (upper[number] <= upper[other]).all()):
+            return False
+        if other not in vertices:
+            vertices[other] = set(map(tuple, rings[other]))
+        return _inside(rings[number], rings[other], vertices[other])
+
+    result = set()
+    for number in range(1, len(rings)):
+        if not within(number, 0):
+            # either the shell or the hole may have moved
+            result.update((0, number))
+        for other in range(1, len(rings)):
+            if other != number and within(number, other):
+                result.update((number, other))
+    return result
+
+
+def invalid_rings(rings):
+    '''
+    Indexes of the rings of a polygon (shell first, then holes) breaking its
+    validity: rings with crossing edges, holes outside the shell and nested
+    holes
+    '''
+    rings = [_open_ring(ring) for ring in rings]
+    return _crossing_rings(rings) | _misplaced_rings(rings)
+
+
+def _simplify_ring(ring, simplifier, tolerance, junctions, cache):
+    # the simplified ring and the keys of its arcs, no keys for rings too
+    # small to be simplified
+    if len(_open_ring(ring)) < 3:
+        return ring, []
+    keys, arcs = [], []
+    for arc in _split_arcs(ring, junctions):
+        key, reverse = _arc_key(arc)
+        simplified = cache.get(key)
+        if simplified is None:
+            simplified = simplifier(arc[::-1] if reverse else arc, tolerance)
+            cache[key] = simplified
+        keys.append(key)
+        arcs.append(simplified[::-1] if reverse else simplified)
+    return vstack([arcs[0]] + [arc[1:] for arc in arcs[1:]]), keys
+
+
+def simplify_features(features, tolerance, method=DOUGLAS_PEUCKER):
+    '''
+    Simplifies the rings of (properties, rings) features with the given
+    tolerance in degrees, yielding the features one at a time. features is
+    read several times: to find the vertices shared by boundaries, to
+    validate the simplified polygons until none changes and to yield them.
+    Rings that would collapse below a triangle or make their polygon invalid
+    are kept unchanged, together with the arcs they share with other rings.
+    '''
+    simplifier = SIMPLIFIERS[method]
+    pairs = _neighbour_pairs(around(ring, SNAP_DIGITS)
+                             for _, rings in features for ring in rings)
+    junctions = set(point for point, point_pairs in pairs.iteritems()
+                    if len(point_pairs) > 1)
+    cache = {}
+    raw_arcs = set()
+    feature_keys = []
+    checked = None
+    while True:
+        # restoring an arc changes every ring using it, the features sharing
+        # an arc restored in the previous pass are validated again
+        restored = set()
+        for number, (_, rings) in enumerate(features):
+            if checked is not None and number not in checked:
+                continue
+            results = [_simplify_ring(around(ring, SNAP_DIGITS), simplifier, tolerance,
+                                      junctions, cache) for ring in rings]
+            if checked is None:
+                feature_keys.append(set(key for _, keys in results for key in keys))
+            invalid = invalid_rings([ring for ring, _ in results])
+            invalid.update(idx for idx, (ring, keys) in enumerate(results)
+                           if keys and len(ring) < 4)
+            for idx in invalid:
+                for key in results[idx][1]:
+                    if key not in raw_arcs:
+                        cache[key] = array(key)
+                        raw_arcs.add(key)
+                        restored.add(key)
+        if not restored:
+            break
+        checked = set(number for number, keys in enumerate(feature_keys)
+                      if not keys.isdisjoint(restored))
+    for properties, rings in features:
+        yield properties, [_simplify_ring(around(ring, SNAP_DIGITS), simplifier, tolerance,
+                                          junctions, cache)[0] for ring in rings]
+
+
+def count_vertices(features):
+    return sum(len(ring) for _, rings in features for ring in rings)
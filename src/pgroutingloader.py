@@ -23,7 +23,8 @@ import sys
 
 import ConfigParser
 
-from os.path import exists
+from collections import Counter
+from os.path import basename, exists
 from util.dbwriter import test_connection
 
 IMPOSM_PRESENT = False
@@ -43,9 +44,20 @@ from util import dbwriter
 from util.config import SURE_AREA, BOTH_WAYS, ONEWAY_FORWARD, ONEWAY_BACKWARD, \
     load_connection_info_from_config, load_connection_info_from_gdal_string
 from util.tag_utils import read_tags_from_osm_node, is_not_empty
+from util.geom import hilbert_key, zorder_key
 from util.synchronizedregistry import SynchronizedRegistry
+from util.propertydictionary import PropertyDictionary
+from util.instrumentation import PhaseReport
+from util.diagnostics import Diagnostics
+from util.progress import ProgressReporter
+from util.turncosts import compute_turn_costs
+from util.components import strongly_connected_components, size_histogram
+from util.parallel import imap_in_processes
+from util.clipping import CLIP_POLICIES, CLIP_POLICY_ANY, CLIP_GAP, \
+    clip_way_nodes, load_clip_area
 
-from profile import way_function
+import profile
+from profiles import load_profiles
 
 '''
 Created on Dec 14, 2015
@@ -53,19 +65,83 @@ Created on Dec 14, 2015
 @author: daniel.urda
 '''
 
+SPATIAL_ORDER_NONE = 'none'
+SPATIAL_ORDER_HILBERT = 'hilbert'
+SPATIAL_ORDER_ZORDER = 'zorder'
+SPATIAL_ORDERS = {SPATIAL_ORDER_NONE: None,
+                  SPATIAL_ORDER_HILBERT: hilbert_key,
+                  SPATIAL_ORDER_ZORDER: zorder_key}
+
+COMPONENT_POLICY_REPORT = 'report'
+COMPONENT_POLICY_FLAG = 'flag'
+COMPONENT_POLICY_DROP = 'drop'
+COMPONENT_POLICIES = (COMPONENT_POLICY_REPORT, COMPONENT_POLICY_FLAG,
+                      COMPONENT_POLICY_DROP)
+DEFAULT_MIN_COMPONENT_SIZE = 50
+
 def db_id_generator():
     x = 1
     while True:
         yield x 
         x += 1
 
+def spatially_ordered(items, get_position, curve_key):
+    '''
+    Sorts items along a space filling curve so that rows written in this order
+    end up physically clustered by location. Items without a position go last.
+    '''
+    if curve_key is None:
+        return list(items)
+    keyed = []
+    unplaced = []
+    for item in items:
+        position = get_position(item)
+        if position is None:
+            unplaced.append(item)
+        else:
+            keyed.append((curve_key(position[0], position[1]), item))
+    keyed.sort(key=lambda x: x[0])
+    return [item for _, item in keyed] + unplaced
+
+def segment_midpoint(segment, coordinates):
+    head = coordinates.get(segment.get_head())
+    tail = coordinates.get(segment.get_tail())
+    if head is None or tail is None:
+        return head or tail
+    return ((head[0] + tail[0]) / 2., (head[1] + tail[1]) / 2.)
+
+def counting_callback(callback, progress, element_type):
+    '''
+    Wraps an imposm callback so every batch is counted by the progress reporter
+    '''
+    def counted(elements):
+        callback(elements)
+        progress.update(element_type, len(elements))
+    return counted
+
+def directed_speeds(profile_result):
+    '''
+    Forward and backward speed of a profile result, -1 where the way cannot
+    be travelled in that direction
+    '''
+    if profile_result is None:
+        return -1, -1
+    f_speed, b_speed = -1, -1
+    if profile_result.forward_mode > 0 and profile_result.forward_speed > 0:
+        f_speed = profile_result.forward_speed
+    if profile_result.backward_mode > 0 and profile_result.backward_speed > 0:
+        b_speed = profile_result.backward_speed
+    return f_speed, b_speed
+
 class NodeProcessor(object):
     def __init__(self, node_collection):
         self.nodes = SynchronizedRegistry()
         self.node_set = set(node_collection)
+        self.processed_elements = 0
         logging.info("Nodes to read: %s" % (len(self.node_set),))
         
     def process_node_element(self, elem, use_imposm=False):
+        self.processed_elements += 1
         guid = elem[0] if use_imposm else int(elem.get('id'))
         if guid in self.node_set:
             if use_imposm:
@@ -83,22 +159,66 @@ class NodeProcessor(object):
         return self.nodes.get_backing_dict()
 
 class NetworkProcessor(object):
-    def __init__(self, const):
+    def __init__(self, const, diagnostics=None, profiles=None, clip_area=None,
+                 clip_policy=CLIP_POLICY_ANY):
         self.const = const
+        if diagnostics is None:
+            diagnostics = Diagnostics()
+        self.diagnostics = diagnostics
+        if profiles is None:
+            profiles = [('car', profile)]
+        # the first profile fills the default speed columns
+        self.profiles = profiles
+        self.extra_highways = set()
+        for _, module in profiles[1:]:
+            self.extra_highways.update(getattr(module, 'routable_highways', ()))
         self.nodes = {}
         self.ways = SynchronizedRegistry()
         self.relation_restrictions = SynchronizedRegistry()
         self.barrier_restrictions = SynchronizedRegistry()
+        self.traffic_signals = set()
         self.normalized = False
         self.node_way_map = SynchronizedRegistry()
+        self.property_dictionary = PropertyDictionary()
+        self.processed_elements = 0
+        # ids of the nodes inside the clip area, known before the ways are read
+        self.clip_area = clip_area
+        self.clip_policy = clip_policy
+        self.inside_nodes = set()
+        self.clipped_ways = 0
+        # extract each merged way came from, to spot junctions across borders
+        self.way_sources = {}
+        self.border_nodes = set()
+        self.merge_counts = {'duplicate_ways': 0, 'replaced_ways': 0,
+                             'duplicate_barriers': 0, 'duplicate_relations': 0}
         
+    def process_clip_element(self, elem, use_imposm=False):
+        if use_imposm:
+            guid, lon, lat = elem
+        else:
+            guid, lon, lat = (int(elem.get('id')), float(elem.get('lon')),
+                              float(elem.get('lat')))
+        if self.clip_area.contains(lon, lat):
+            self.inside_nodes.add(guid)
+            
+    def process_clip_coords(self, coordz):
+        for elem in coordz:
+            self.process_clip_element(elem, use_imposm=True)
         
     def process_barrier_element(self, elem, use_imposm=False):
+        self.processed_elements += 1
         guid = elem[0] if use_imposm else int(elem.get('id'))
+        if (self.clip_area is not None and self.clip_policy != CLIP_POLICY_ANY
+            and guid not in self.inside_nodes):
+            return
         
         if use_imposm:
+            if elem[1].get('highway') == 'traffic_signals':
+                self.traffic_signals.add(guid)
             res = True if elem[1].has_key('barrier') else None
         else:
+            if elem.find("tag[@k='highway'][@v='traffic_signals']") is not None:
+                self.traffic_signals.add(guid)
             res = elem.find("tag[@k='barrier']")
              
         if res is not None:        
@@ -106,7 +226,7 @@ class NetworkProcessor(object):
                         
             barrier_cost = self.const.get_barrier_cost(keyval)
             if barrier_cost is None:
-                logging.warn("Unknown barrier value '%s' for node %s" % (keyval['barrier'], guid))
+                self.diagnostics.record("unknown barrier value", guid, keyval['barrier'])
                 del keyval
                 return
             
@@ -122,6 +242,7 @@ class NetworkProcessor(object):
             del keyval
             
     def process_relation_element(self, elem, use_imposm=False):
+        self.processed_elements += 1
         guid = elem[0] if use_imposm else int(elem.get('id'))
     
         if use_imposm:
@@ -154,7 +275,7 @@ class NetworkProcessor(object):
                     if node_type == 'way':
                         temp_restriction.add_end_member(node_role, node_ref)                   
                     elif node_type == 'node':
-                        logging.warn("ERROR: Found node as end member in restriction %s" % (guid,))
+                        self.diagnostics.record("node as end member of restriction", guid)
                 elif node_role == 'via':
                     if node_type == 'way':
                         temp_restriction.add_via_member(node_type, node_ref)
@@ -168,21 +289,22 @@ class NetworkProcessor(object):
                 if not self.const.is_excepted(tags):
                     actual_restriction = self.const.get_actual_restriction_type(tags)
                     if actual_restriction is None:
-                        logging.warn("restriction not applicable %s" % (guid,))
+                        self.diagnostics.record("restriction not applicable", guid)
                     elif (actual_restriction == 'no_u_turn' 
                           and len(temp_restriction.get_common_ends()) > 0):
-                        logging.info("no_u_turn restriction %s has common from and to" % (guid,))
+                        self.diagnostics.record("no_u_turn restriction with common from and to", guid)
                     else:
                         temp_restriction.get_properties()['restriction'] = actual_restriction
                         self.relation_restrictions.set(guid, temp_restriction)
                         return
                 else:
-                    logging.info("excepted restriction %s; except tag was '%s'" % (guid, tags['except']))
+                    self.diagnostics.record("excepted restriction", guid, tags['except'])
             del temp_restriction
             del members
             del tags
 
     def process_way_element(self, elem, use_imposm=False):
+        self.processed_elements += 1
         guid = elem[0] if use_imposm else int(elem.get('id'))
         
         if use_imposm:
@@ -200,15 +322,15 @@ class NetworkProcessor(object):
             and self.const.is_routable_way(tags) 
             and self.const.is_area(tags) != SURE_AREA):
             
-            if (self.const.is_routable_highway(tags) or
-                self.const.is_adequate_ferry(tags) or
-                self.const.is_routable_junction(tags)):
+            primary_routable = (self.const.is_routable_highway(tags) or
+                                self.const.is_adequate_ferry(tags) or
+                                self.const.is_routable_junction(tags))
+            if primary_routable or tags.get('highway') in self.extra_highways:
                     
                 access = self.const.get_actual_access(tags)
                 multiplier = self.const.get_access_cost_multiplier(access)
-                if multiplier > 0:
-                    tags['access'] = access
-                    
+                # the loader access rules only apply to the first profile
+                if multiplier > 0 or len(self.profiles) > 1:
                     first, last = -1, -1
                     useful_nodes = []
                     for node in nodez:
@@ -218,19 +340,31 @@ class NetworkProcessor(object):
                             last = node
                             useful_nodes.append(node)
                         else:
-                            logging.warn("multiple successive appearances of node %s on way %s" % (node, guid))
+                            self.diagnostics.record("repeated successive node on way", guid, node)
+                    
+                    if self.clip_area is not None:
+                        useful_nodes = clip_way_nodes(useful_nodes, self.inside_nodes,
+                                                      self.clip_policy)
+                        if useful_nodes is None:
+                            self.clipped_ways += 1
+                            return
  
                     if  len(useful_nodes) < 2:
-                        logging.warn("way %s has only one distinct node" % (guid,))
+                        self.diagnostics.record("way with one distinct node", guid)
                     else:
                         way = RoutingWay(guid)
+                        
+                        # the other profiles see the tags as they are in the file
+                        profile_speeds = {}
+                        for name, module in self.profiles[1:]:
+                            profile_speeds[name] = directed_speeds(
+                                        self._apply_profile(module, tags, guid))
                                                
-                        try:
-                            profile_result = way_function(tags)
-                        except Exception:
-                            logging.warn("ERROR: error profiling way %s" % (guid,))
-                            way_function(tags, True)
-                            profile_result = None
+                        profile_result = None
+                        if primary_routable and multiplier > 0:
+                            tags['access'] = access
+                            profile_result = self._apply_profile(self.profiles[0][1],
+                                                                 tags, guid)
                         
                         # way.oneway = self.const.get_Direction(tags)
                         # way.max_speed = self.const.get_Speed_As_Number(tags)/ multiplier
@@ -245,7 +379,7 @@ class NetworkProcessor(object):
                             elif profile_result.backward_mode > 0:
                                 way.oneway = ONEWAY_BACKWARD
                             else:
-                                logging.warn("unaccesible way %s" % (guid,))
+                                self.diagnostics.record("unaccessible way", guid)
                             
                             if profile_result.duration > 0:
                                 way.duration = profile_result.duration                            
@@ -253,24 +387,153 @@ class NetworkProcessor(object):
                             way.b_speed = profile_result.backward_speed
                             if is_not_empty(profile_result.name):
                                 tags['std_name'] = profile_result.name
-                            way.set_attributes(self.const.get_useful_properties(tags))
-                            
-                            for node in useful_nodes:
-                                way.add_node_placeholder(node)
-                                self.node_way_map.put(node, guid)
-                            self.node_way_map.put(first, guid)
-                            self.node_way_map.put(last, guid)
-                            
-                            self.ways.set(guid, way)
+                            way.profile_speeds = profile_speeds
+                            way.set_attributes(self.property_dictionary.intern_attributes(
+                                                   self.const.get_useful_properties(tags)))
+                            self._register_way(way, useful_nodes)
+                        elif any(f_speed > 0 or b_speed > 0
+                                 for f_speed, b_speed in profile_speeds.itervalues()):
+                            # only usable by the other profiles
+                            way.oneway = BOTH_WAYS
+                            way.profile_speeds = profile_speeds
+                            way.set_attributes(self.property_dictionary.intern_attributes(
+                                                   self.const.get_useful_properties(tags)))
+                            self._register_way(way, useful_nodes)
                         else:
-                            logging.info("profile rejected way %s" % (guid,))
+                            self.diagnostics.record("profile rejected way", guid)
                             del way
                         
                 elif access != 'no':
-                    logging.warn("ignoring way %s because actual access is '%s'" % (guid, access))
+                    self.diagnostics.record("way ignored for access", guid, access)
         del nodez
         del tags
     
+    def _apply_profile(self, module, tags, guid):
+        try:
+            return module.way_function(tags)
+        except Exception:
+            self.diagnostics.record("error profiling way", guid)
+            if self.diagnostics.verbose:
+                module.way_function(tags, True)
+            return None
+    
+    def _register_way(self, way, useful_nodes):
+        for node in useful_nodes:
+            way.add_node_placeholder(node)
+        self._map_way_nodes(way.get_id(), useful_nodes)
+        self.ways.set(way.get_id(), way)
+    
+    def _map_way_nodes(self, guid, nodes, source=None):
+        node_way_map = self.node_way_map.get_backing_dict()
+        last = len(nodes) - 1
+        if source is not None:
+            self.way_sources[guid] = source
+        for idx, node in enumerate(nodes):
+            if node is CLIP_GAP:
+                continue
+            if source is not None:
+                if any(self.way_sources.get(x, source) != source
+                       for x in node_way_map.get(node, ())):
+                    self.border_nodes.add(node)
+            self.node_way_map.put(node, guid)
+            # way ends, including the ends of clipped runs, are registered
+            # twice so they always become routing nodes
+            if (idx == 0 or idx == last or nodes[idx - 1] is CLIP_GAP
+                or nodes[idx + 1] is CLIP_GAP):
+                self.node_way_map.put(node, guid)
+    
+    def _unmap_way_nodes(self, guid, nodes):
+        node_way_map = self.node_way_map.get_backing_dict()
+        for node in set(nodes):
+            guids = node_way_map.get(node)
+            if guids is None:
+                continue
+            guids[:] = [x for x in guids if x != guid]
+            if len(guids) == 0:
+                del node_way_map[node]
+    
+    def _refresh_border_nodes(self, nodes):
+        node_way_map = self.node_way_map.get_backing_dict()
+        for node in set(nodes):
+            if node is CLIP_GAP:
+                continue
+            sources = set(self.way_sources[x] for x in node_way_map.get(node, ())
+                          if x is not None)
+            if len(sources) > 1:
+                self.border_nodes.add(node)
+            else:
+                self.border_nodes.discard(node)
+    
+    def get_parse_result(self):
+        '''
+        What the first parse of one extract found, to be merged in another
+        process with merge_parse_result. Ways travel as plain records, which
+        pickle to a fraction of the objects.
+        '''
+        ways = self.ways.get_backing_dict()
+        return {'ways': [way_record(ways.pop(guid)) for guid in ways.keys()],
+                'barrier_restrictions': self.barrier_restrictions.get_backing_dict(),
+                'relation_restrictions': self.relation_restrictions.get_backing_dict(),
+                'traffic_signals': self.traffic_signals,
+                'processed_elements': self.processed_elements,
+                'inside_nodes': len(self.inside_nodes),
+                'clipped_ways': self.clipped_ways,
+                'diagnostics': self.diagnostics}
+    
+    def merge_parse_result(self, result, source):
+        '''
+        Adds the elements of one more extract. Elements already read from a
+        neighbouring extract are skipped, unless a way was cut shorter there;
+        node_way_map is filled again so junctions across borders are found.
+        '''
+        if self.normalized:
+            raise Exception("ERROR: unable to process further elements after normalization")
+        ways = self.ways.get_backing_dict()
+        records = result['ways']
+        while records:
+            way = way_from_record(records.pop(), self.property_dictionary)
+            guid = way.get_id()
+            known = ways.get(guid)
+            if known is not None:
+                self.merge_counts['duplicate_ways'] += 1
+                if known.get_node_ph_count() >= way.get_node_ph_count():
+                    continue
+                self.merge_counts['replaced_ways'] += 1
+                self._unmap_way_nodes(guid, known.get_node_placeholders())
+            self._map_way_nodes(guid, way.get_node_placeholders(), source)
+            self.ways.set(guid, way)
+            if known is not None:
+                # the replaced copy may have made or hidden border junctions
+                self._refresh_border_nodes(known.get_node_placeholders()
+                                           + way.get_node_placeholders())
+        barriers = self.barrier_restrictions.get_backing_dict()
+        for guid, barrier in result['barrier_restrictions'].iteritems():
+            if barriers.has_key(guid):
+                self.merge_counts['duplicate_barriers'] += 1
+                continue
+            self.node_way_map.put(guid, None)
+            self.barrier_restrictions.set(guid, barrier)
+        relations = self.relation_restrictions.get_backing_dict()
+        for guid, restriction in result['relation_restrictions'].iteritems():
+            if relations.has_key(guid):
+                self.merge_counts['duplicate_relations'] += 1
+                continue
+            for node_ref in restriction.get_via_nodes():
+                self.node_way_map.put(node_ref, None)
+            self.relation_restrictions.set(guid, restriction)
+        self.traffic_signals.update(result['traffic_signals'])
+        self.processed_elements += result['processed_elements']
+        self.clipped_ways += result['clipped_ways']
+        self.diagnostics.merge(result['diagnostics'])
+    
+    def get_border_junctions(self):
+        '''
+        Nodes joining ways that only exist in different extracts
+        '''
+        node_way_map = self.node_way_map.get_backing_dict()
+        return [x for x in self.border_nodes
+                if len(set(node_way_map.get(x, ())).difference([None])) > 1]
+    
     def process_barriers(self, nodez):
         if self.normalized:
             raise Exception("ERROR: unable to process further elements after normalization")
@@ -314,8 +577,7 @@ class NetworkProcessor(object):
             restriction = self.relation_restrictions[key]
             actually_valid = restriction.validate_ways(self.ways)
             if not actually_valid:
-                logging.info("deleting restriction relation %s between unroutable ways"
-                             % (key,))
+                self.diagnostics.record("restriction between unroutable ways", key)
                 del self.relation_restrictions[key]
           
         restriction_keys = self.barrier_restrictions.keys()      
@@ -323,106 +585,442 @@ class NetworkProcessor(object):
             restriction = self.barrier_restrictions[key]
             actually_valid = restriction.validate_ways(self.ways)
             if not actually_valid:
-                logging.info("deleting barrier restriction %s on unroutable way(s)"
-                              % (key,))
-                del self.barrier_restrictions[key]            
+                self.diagnostics.record("barrier on unroutable ways", key)
+                del self.barrier_restrictions[key]
 
+    def analyze_components(self, min_size=DEFAULT_MIN_COMPONENT_SIZE,
+                           policy=COMPONENT_POLICY_REPORT):
+        '''
+        Strongly connected components of the normalized network, following
+        the directions the primary profile can travel. Segments touching a
+        component with less than min_size routing nodes are islands:
+        reported, flagged on the segment or dropped. Ways only usable by the
+        other profiles are left out.
+        '''
+        if not self.normalized:
+            raise Exception("ERROR: components need a normalized network")
+        if policy not in COMPONENT_POLICIES:
+            raise Exception("unknown component policy '%s'" % (policy,))
 
- 
-def run(target_db, file_path, length_projection,
-        use_imposm=True, clean_db=True, table_prefix=''):    
-    
-    logging.info("parsing osm file " + file_path)
-    
-    const = utils.Configuration()    
-    processor = NetworkProcessor(const)
-    
+        successors = {}
+        for way in self.ways.itervalues():
+            forward, backward = primary_directions(way)
+            if not (forward or backward):
+                continue
+            for segment in way.get_segments():
+                head, tail = segment.get_head(), segment.get_tail()
+                successors.setdefault(head, [])
+                successors.setdefault(tail, [])
+                if forward:
+                    successors[head].append(tail)
+                if backward:
+                    successors[tail].append(head)
+        component_of, sizes = strongly_connected_components(successors)
+        del successors
+
+        # rank components by size so that 0 is the main network
+        ranks = sorted(range(len(sizes)), key=lambda x: -sizes[x])
+        rank_of = [0] * len(sizes)
+        for rank, component in enumerate(ranks):
+            rank_of[component] = rank
+        small = set(x for x in range(len(sizes)) if sizes[x] < min_size)
+
+        island_segments = 0
+        removed_segments = set()
+        removed_ways = set()
+        for key in self.ways.keys():
+            way = self.ways[key]
+            if not any(primary_directions(way)):
+                continue
+            kept = []
+            for segment in way.get_segments():
+                head = component_of[segment.get_head()]
+                tail = component_of[segment.get_tail()]
+                is_island = head in small or tail in small
+                if is_island:
+                    island_segments += 1
+                if policy == COMPONENT_POLICY_FLAG:
+                    segment.component_id = max(rank_of[head], rank_of[tail])
+                    segment.island = is_island
+                elif policy == COMPONENT_POLICY_DROP and is_island:
+                    for node_id in (segment.get_head(), segment.get_tail()):
+                        self.nodes[node_id].segments.discard(segment)
+                    removed_segments.add(segment)
+                    continue
+                kept.append(segment)
+            if policy != COMPONENT_POLICY_DROP or len(kept) == len(way.get_segments()):
+                continue
+            way._segments_placeholders = kept
+            if len(kept) == 0:
+                removed_ways.add(way)
+                del self.ways[key]
+                self._unmap_way_nodes(key, way.get_node_placeholders())
+
+        removed_nodes = 0
+        if policy == COMPONENT_POLICY_DROP:
+            # nodes of an island also used by the other profiles stay
+            for key in self.nodes.keys():
+                if component_of.get(key) in small and not self.nodes[key].segments:
+                    del self.nodes[key]
+                    removed_nodes += 1
+            # ways partly dropped may have lost the segment a restriction uses
+            for key in self.relation_restrictions.keys():
+                restriction = self.relation_restrictions[key]
+                if (not restriction.discard_ways(removed_ways)
+                    or not restriction.discard_segments(removed_segments)):
+                    self.diagnostics.record("restriction on dropped island", key)
+                    del self.relation_restrictions[key]
+            for key in self.barrier_restrictions.keys():
+                restriction = self.barrier_restrictions[key]
+                if (not self.nodes.has_key(key)
+                    or not restriction.discard_ways(removed_ways)
+                    or not restriction.discard_segments(removed_segments)):
+                    self.diagnostics.record("barrier on dropped island", key)
+                    del self.barrier_restrictions[key]
+
+        return {'policy': policy,
+                'min_size': min_size,
+                'components': len(sizes),
+                'largest': max(sizes) if sizes else 0,
+                'histogram': size_histogram(sizes),
+                'small_components': len(small),
+                'small_component_nodes': sum(sizes[x] for x in small),
+                'island_segments': island_segments,
+                'dropped_ways': len(removed_ways),
+                'dropped_nodes': removed_nodes}
+
+
+
+def primary_directions(way):
+    '''
+    Whether the primary profile can travel the way forward and backward
+    '''
+    return (way.f_speed > 0 and way.oneway != ONEWAY_BACKWARD,
+            way.b_speed > 0 and way.oneway != ONEWAY_FORWARD)
+
+def way_record(way):
+    '''
+    Plain tuple holding what the first parse sets on a way
+    '''
+    # unaccessible ways never get a direction
+    return (way.get_id(), way.get_node_placeholders(), getattr(way, 'oneway', None),
+            way.duration,
+            way.f_speed, way.b_speed, way.profile_speeds, way.get_attributes())
+
+def way_from_record(record, property_dictionary):
+    guid, nodes, oneway, duration, f_speed, b_speed, profile_speeds, attributes = record
+    way = RoutingWay(guid)
+    for node in nodes:
+        way.add_node_placeholder(node)
+    if oneway is not None:
+        way.oneway = oneway
+    way.duration = duration
+    way.f_speed = f_speed
+    way.b_speed = b_speed
+    way.profile_speeds = profile_speeds
+    way.set_attributes(property_dictionary.intern_attributes(attributes))
+    return way
+
+def read_inside_nodes(processor, file_path, progress_interval=30., status_path=None,
+                      phase='clip pass'):
+    '''
+    Clip pass for imposm, which does not hand over the nodes before the ways
+    '''
+    progress = ProgressReporter(phase, interval=progress_interval,
+                                status_path=status_path, check_every=1)
+    parser = OSMParser(concurrency=4,
+                       coords_callback=counting_callback(processor.process_clip_coords,
+                                                         progress, 'nodes'))
+    parser.parse(file_path)
+    del parser
+    progress.finish()
+
+def read_network(processor, file_path, use_imposm=True, progress_interval=30.,
+                 status_path=None, phase='first parse'):
     if use_imposm:
-        parser = OSMParser(concurrency=4, ways_callback=processor.process_ways,
-                      nodes_callback=processor.process_barriers,
-                      relations_callback=processor.process_relations)
+        # imposm reads the file in worker processes; only counts are known
+        progress = ProgressReporter(phase, interval=progress_interval,
+                                    status_path=status_path, check_every=1)
+        parser = OSMParser(concurrency=4,
+                      ways_callback=counting_callback(processor.process_ways,
+                                                      progress, 'ways'),
+                      nodes_callback=counting_callback(processor.process_barriers,
+                                                       progress, 'tagged nodes'),
+                      relations_callback=counting_callback(processor.process_relations,
+                                                           progress, 'relations'))
         parser.parse(file_path)
         del parser
     else:
-        proc_nodes, proc_ways, proc_rel = 0, 0, 0
-        context = ET.iterparse(file_path)
+        source = open(file_path, 'rb')
+        progress = ProgressReporter(phase, source,
+                                    interval=progress_interval,
+                                    status_path=status_path)
+        context = ET.iterparse(source)
         context = iter(context)
         event, root = context.next()     
         for event, elem in context:
             if elem.tag == "node":
+                # nodes come before ways in OSM files, so this is known in time
+                if processor.clip_area is not None:
+                    processor.process_clip_element(elem)
                 processor.process_barrier_element(elem)
                 elem.clear()
-                proc_nodes += 1
-                if proc_nodes % 50000 == 0:
-                    logging.debug("processed %s nodes" 
-                                  % (proc_nodes,))    
+                progress.update('nodes')
             elif elem.tag == "way":
                 processor.process_way_element(elem)
                 elem.clear() 
-                proc_ways += 1
-                if proc_ways % 10000 == 0:
-                    logging.debug("processed %s ways" 
-                                  % (proc_ways,))                                   
+                progress.update('ways')
             elif elem.tag == "relation":
                 processor.process_relation_element(elem)
                 elem.clear()
-                proc_rel += 1
-                if proc_rel % 1000 == 0:
-                    logging.debug("processed %s relations" 
-                                  % (proc_rel,))
+                progress.update('relations')
             root.clear()
         del root, context
-    logging.info("ways and restriction done read")
-    
-    edge_id_generator = db_id_generator()
-    processor.normalize_network(edge_id_generator)
-    logging.info("network normalized")
-    
-    node_processor = NodeProcessor(processor.get_used_node_ids())
+        source.close()
+    progress.finish()
+
+def read_node_coordinates(node_processor, file_path, use_imposm=True,
+                          progress_interval=30., status_path=None,
+                          phase='node parse'):
     if use_imposm: 
+        progress = ProgressReporter(phase, interval=progress_interval,
+                                    status_path=status_path, check_every=1)
         parser = OSMParser(concurrency=4,
-                           coords_callback=node_processor.process_nodes)
+                           coords_callback=counting_callback(node_processor.process_nodes,
+                                                             progress, 'nodes'))
         parser.parse(file_path)
         del parser
     else:
-        proc_nodes = 0
-        context = ET.iterparse(file_path)
+        source = open(file_path, 'rb')
+        progress = ProgressReporter(phase, source,
+                                    interval=progress_interval,
+                                    status_path=status_path)
+        context = ET.iterparse(source)
         context = iter(context)
         event, root = context.next()     
         for event, elem in context:
             if elem.tag == "node":
                 node_processor.process_node_element(elem)
                 elem.clear()
-                proc_nodes += 1
-                if proc_nodes % 50000 == 0:
-                    logging.debug("processed %s nodes..." % (proc_nodes,))
+                progress.update('nodes')
             elif elem.tag in ('way', 'relation'):
                 elem.clear()
+                progress.update(elem.tag + 's')
             root.clear()
         del root, context
+        source.close()
+    progress.finish()
+
+def part_status_path(status_path, idx):
+    return None if status_path is None else '%s.%s' % (status_path, idx)
+
+def read_network_part(file_path, use_imposm, processor, progress_interval,
+                      status_path):
+    '''
+    First parse of one of several extracts, run in its own process
+    '''
+    name = basename(file_path)
+    if processor.clip_area is not None and use_imposm:
+        read_inside_nodes(processor, file_path, progress_interval, status_path,
+                          'clip pass of ' + name)
+    read_network(processor, file_path, use_imposm, progress_interval,
+                 status_path, 'first parse of ' + name)
+    result = processor.get_parse_result()
+    result['rule_counts'] = profile.get_rule_counts()
+    return result
+
+def read_node_part(file_path, use_imposm, node_processor, progress_interval,
+                   status_path):
+    read_node_coordinates(node_processor, file_path, use_imposm,
+                          progress_interval, status_path,
+                          'node parse of ' + basename(file_path))
+    return node_processor.get_node_coordinates(), node_processor.processed_elements
+
+ 
+def run(target_db, file_path, length_projection,
+        use_imposm=True, clean_db=True, table_prefix='',
+        properties_mode=dbwriter.PROPERTIES_EAV, properties_gin_index=False,
+        spatial_order=SPATIAL_ORDER_NONE,
+        vacuum=False, cluster=False, prewarm=False,
+        commit_batches=None, commit_per_table=False, graph_export_path=None,
+        report_path=None, writer_class=dbwriter.DbWriter, profile_dir=None,
+        verbose=False, progress_interval=30., status_path=None,
+        profile_names=('car',), turn_costs=False, component_policy=None,
+        min_component_size=DEFAULT_MIN_COMPONENT_SIZE, clip_area=None,
+        clip_policy=CLIP_POLICY_ANY):    
+    
+    file_paths = [file_path] if isinstance(file_path, basestring) else list(file_path)
+    logging.info("parsing osm file " + ', '.join(file_paths))
+    report = PhaseReport(metadata={'file': file_paths[0] if len(file_paths) == 1 else file_paths,
+                                   'use_imposm': use_imposm,
+                                   'properties_mode': properties_mode,
+                                   'spatial_order': spatial_order,
+                                   'commit_batches': commit_batches,
+                                   'commit_per_table': commit_per_table,
+                                   'profiles': list(profile_names),
+                                   'clip_bounds': (clip_area.get_bounds()
+                                                   if clip_area is not None else None),
+                                   'clip_policy': clip_policy},
+                         profile_dir=profile_dir)
+    # extract processes inherit the setting
+    profile.reset_rule_counts(counting=profile_dir is not None)
+    
+    const = utils.Configuration()    
+    diagnostics = Diagnostics(verbose=verbose)
+    profiles = load_profiles(profile_names)
+    processor = NetworkProcessor(const, diagnostics, profiles, clip_area, clip_policy)
+    
+    if len(file_paths) == 1:
+        if clip_area is not None and use_imposm:
+            phase = report.begin('clip pass')
+            read_inside_nodes(processor, file_paths[0], progress_interval, status_path)
+            report.end(phase, elements=len(processor.inside_nodes))
+        phase = report.begin('first parse')
+        read_network(processor, file_paths[0], use_imposm, progress_interval,
+                     status_path)
+        report.end(phase, elements=processor.processed_elements)
+        rule_counts = profile.get_rule_counts()
+        inside_nodes = len(processor.inside_nodes)
+    else:
+        # one process per extract, merged into a single network afterwards
+        phase = report.begin('first parse')
+        jobs = [(path, use_imposm,
+                 NetworkProcessor(const, Diagnostics(verbose=verbose), profiles,
+                                  clip_area, clip_policy),
+                 progress_interval, part_status_path(status_path, idx))
+                for idx, path in enumerate(file_paths)]
+        rule_counts = Counter()
+        inside_nodes = 0
+        # every extract is merged and freed as soon as it arrives
+        for idx, result in enumerate(imap_in_processes(read_network_part, jobs)):
+            processor.merge_parse_result(result, idx)
+            rule_counts.update(result['rule_counts'])
+            inside_nodes += result['inside_nodes']
+            del result
+        del jobs
+        report.end(phase, elements=processor.processed_elements)
+        merge_counts = dict(processor.merge_counts)
+        merge_counts['files'] = len(file_paths)
+        merge_counts['border_junctions'] = len(processor.get_border_junctions())
+        report.counters['merge'] = merge_counts
+        logging.info(("merged %s extracts: %s duplicate ways (%s replaced by a longer copy), " + 
+                      "%s duplicate barriers, %s duplicate restrictions, " + 
+                      "%s junctions across borders") % (len(file_paths),
+                                                        merge_counts['duplicate_ways'],
+                                                        merge_counts['replaced_ways'],
+                                                        merge_counts['duplicate_barriers'],
+                                                        merge_counts['duplicate_relations'],
+                                                        merge_counts['border_junctions']))
+    if clip_area is not None:
+        report.counters['clip'] = {'inside_nodes': inside_nodes,
+                                   'clipped_ways': processor.clipped_ways}
+        logging.info("%s nodes inside the clip area, %s ways outside of it" % (
+                                                    inside_nodes,
+                                                    processor.clipped_ways))
+        processor.inside_nodes = set()
+    logging.info("ways and restriction done read")
+    if profile_dir is not None:
+        report.counters['way_function_rules'] = dict(rule_counts)
+        for rule, count in sorted(rule_counts.iteritems(), key=lambda x: -x[1]):
+            logging.info("way_function rule %s fired %s times" % (rule, count))
+    
+    phase = report.begin('normalization')
+    edge_id_generator = db_id_generator()
+    processor.normalize_network(edge_id_generator)
+    report.end(phase, elements=len(processor.ways))
+    logging.info("network normalized")
+
+    if component_policy is not None:
+        phase = report.begin('components')
+        components = processor.analyze_components(min_component_size,
+                                                  component_policy)
+        report.end(phase, elements=len(processor.nodes))
+        report.counters['components'] = components
+        logging.info(("%s strongly connected components, largest has %s nodes; " + 
+                      "%s below %s nodes cover %s segments") % (components['components'],
+                                                               components['largest'],
+                                                               components['small_components'],
+                                                               min_component_size,
+                                                               components['island_segments']))
+        for label, count in sorted(components['histogram'].iteritems(),
+                                   key=lambda x: int(x[0].split('-')[0])):
+            logging.info("components of %s nodes: %s" % (label, count))
+        if component_policy == COMPONENT_POLICY_DROP:
+            logging.info("dropped %s ways and %s nodes on islands" % (components['dropped_ways'],
+                                                                     components['dropped_nodes']))
+    
+    phase = report.begin('node parse')
+    node_processor = NodeProcessor(processor.get_used_node_ids())
+    if len(file_paths) == 1:
+        read_node_coordinates(node_processor, file_paths[0], use_imposm,
+                              progress_interval, status_path)
+    else:
+        jobs = [(path, use_imposm, node_processor, progress_interval,
+                 part_status_path(status_path, idx))
+                for idx, path in enumerate(file_paths)]
+        for coordinates, processed_elements in imap_in_processes(read_node_part, jobs):
+            node_processor.nodes.get_backing_dict().update(coordinates)
+            node_processor.processed_elements += processed_elements
+        del jobs
+    report.end(phase, elements=node_processor.processed_elements)
     logging.info("%s nodes done read" % (len(node_processor.get_node_coordinates().keys()),))
-    logging.warning("unable to read node info for ids: %s" % list(set(processor.get_used_node_ids()).difference(set(node_processor.get_node_coordinates().keys()))))
+    coordinates = node_processor.get_node_coordinates()
+    diagnostics.record_many("node without coordinates",
+                            (x for x in node_processor.node_set if x not in coordinates))
+
+    db_writer = writer_class(target_db, table_prefix=table_prefix,
+                             properties_mode=properties_mode,
+                             properties_gin_index=properties_gin_index,
+                             property_dictionary=processor.property_dictionary,
+                             commit_batches=commit_batches,
+                             commit_per_table=commit_per_table,
+                             report=report,
+                             profiles=[name for name, _ in profiles[1:]],
+                             turn_costs=turn_costs,
+                             component_flags=component_policy == COMPONENT_POLICY_FLAG)
+    row_counter = lambda: db_writer.rows_written
 
-    db_writer = dbwriter.DbWriter(target_db, table_prefix=table_prefix)
 
+    curve_key = SPATIAL_ORDERS[spatial_order]
 
-    db_writer.init_db(clean=clean_db)   
-    for node in processor.nodes.values():
-        db_writer.insert_node(node, node_processor.nodes.get(node.get_id()))
+    with report.phase('init db'):
+        db_writer.init_db(clean=clean_db)   
+    phase = report.begin('node write', row_counter)
+    for node in spatially_ordered(processor.nodes.values(),
+                                  lambda x: coordinates.get(x.get_id()),
+                                  curve_key):
+        db_writer.insert_node(node, coordinates.get(node.get_id()))
     db_writer.flush_caches()
+    report.end(phase, elements=len(processor.nodes))
     logging.info("nodes loaded")
 
-    for way in processor.ways.values():
-        for segment in way.get_segments():
-            db_writer.insert_way(segment, node_processor.get_node_coordinates())
-        db_writer.insert_way_properties(way)
+    phase = report.begin('way write', row_counter)
+
+    if curve_key is None:
+        for way in processor.ways.values():
+            for segment in way.get_segments():
+                db_writer.insert_way(segment, coordinates)
+            db_writer.insert_way_properties(way)
+    else:
+        segments = [segment for way in processor.ways.values()
+                    for segment in way.get_segments()]
+        for segment in spatially_ordered(segments,
+                                         lambda x: segment_midpoint(x, coordinates),
+                                         curve_key):
+            db_writer.insert_way(segment, coordinates)
+        del segments
+        for way in processor.ways.values():
+            db_writer.insert_way_properties(way)
     db_writer.flush_caches()
+    report.end(phase, elements=len(processor.ways))
     logging.info("ways loaded")
 
+    phase = report.begin('restriction write', row_counter)
     proper_restrictions_by_source = {}
     
     for key, val in processor.relation_restrictions.iteritems():
-        restriction_map = val.get_as_proper_restrictions(node_processor.nodes)
+        restriction_map = val.get_as_proper_restrictions(node_processor.nodes,
+                                                         diagnostics)
         for node_key, restr_vals in restriction_map.iteritems():
             for restr_val in restr_vals:
                 keypair = (restr_val.from_segm.get_db_id(), node_key)
@@ -432,7 +1030,8 @@ def run(target_db, file_path, length_projection,
     
     # simplified processing for point barriers            
     for key, val in processor.barrier_restrictions.iteritems():
-        restriction_map = val.get_as_proper_restrictions(node_processor.nodes)
+        restriction_map = val.get_as_proper_restrictions(node_processor.nodes,
+                                                         diagnostics)
         for node_key, restr_vals in restriction_map.iteritems():
             for restr_val in restr_vals:
                 keypair = (restr_val.from_segm.get_db_id(), node_key)
@@ -462,7 +1061,7 @@ def run(target_db, file_path, length_projection,
                     explicit_no.add(val.to_segm.get_db_id())
                     db_writer.insert_restriction(val, node_processor.get_node_coordinates())
                 if  val._type == 'barrier':
-                    logging.warn("barrier %s on only_* restriction", (val.via_node,))
+                    diagnostics.record("barrier on only_* restriction", val.via_node)
             block_routes = block_routes.difference(explicit_no)
                     
             pivot = only_restrictions[0]
@@ -488,18 +1087,46 @@ def run(target_db, file_path, length_projection,
             for val in value:
                 if val._type == 'barrier':
                     if has_explicit_no:
-                        logging.warn(" barrier %s on no_* restriction", (val.via_node,))
+                        diagnostics.record("barrier on no_* restriction", val.via_node)
                     db_writer.insert_restriction(val, 
                                                  node_processor.get_node_coordinates())
 
 
+    db_writer.flush_caches()
+    report.end(phase, elements=len(proper_restrictions_by_source))
     logging.info("restrictions loaded") 
+
+    if turn_costs:
+        phase = report.begin('turn costs', row_counter)
+        for turn in compute_turn_costs(processor.nodes, coordinates,
+                                       profiles[0][1], processor.traffic_signals):
+            db_writer.insert_turn_cost(*turn)
+        db_writer.flush_caches()
+        report.end(phase, elements=len(processor.nodes))
+        logging.info("turn costs loaded")
    
     db_writer.rebuild_topology(epsg_projection=length_projection)
     logging.info("topology rebuilt")
 
+    if vacuum or cluster or prewarm:
+        with report.phase('maintenance'):
+            db_writer.run_maintenance(vacuum=vacuum, cluster=cluster, prewarm=prewarm)
+        logging.info("maintenance done")
+
+    if graph_export_path is not None:
+        with report.phase('graph export'):
+            db_writer.export_graph(graph_export_path)
+
     db_writer.close()
     logging.info("db written")
+
+    diagnostics.log_summary()
+    report.counters['diagnostics'] = diagnostics.as_dict()
+
+    if report_path is not None:
+        report.write_json(report_path)
+        logging.info("load report written to " + report_path)
+    return report
     
 
 if __name__ == '__main__':
@@ -511,12 +1138,14 @@ if __name__ == '__main__':
     
     parser = argparse.ArgumentParser(description=('Load OpenStreetMap dump '
                                                   + 'into pgRouting database.'))
-    parser.add_argument('--file', '-f', type=str,
-                        dest='input_file',
+    parser.add_argument('--file', '-f', type=str, nargs='+',
+                        dest='input_files', metavar='INPUT_FILE',
                         required=True,
                         help=('OSM dump (either xml or pbf). Loading from pbf '
                               + 'is allowed only if imposm.parser is available '
-                              + 'on the system'))    
+                              + 'on the system. Several neighbouring extracts '
+                              + 'are parsed in parallel and merged into one '
+                              + 'network, shared elements loaded once'))    
     parser.add_argument('--use-imposm', '-b', dest='use_imposm',
                         action='store_true',
                         help=('Use the imposm.parser for parsing xml files'))    
@@ -535,7 +1164,112 @@ if __name__ == '__main__':
     parser.add_argument('--length-projection', '-e', type=str,
                         dest='epsg_code', default='', required=True,
                         help=('EPSG of projection to use to compute way length'))
+    parser.add_argument('--properties-mode', '-m', type=str,
+                        dest='properties_mode', default=dbwriter.PROPERTIES_EAV,
+                        choices=dbwriter.PROPERTIES_MODES,
+                        help=('How way properties are stored: one row per tag ' + 
+                              '(eav), one jsonb/hstore row per way or one row ' + 
+                              'per tag with dictionary encoded keys and values'))
+    parser.add_argument('--properties-gin-index', '-g', action='store_true',
+                        dest='properties_gin_index',
+                        help=('Create a GIN index on the jsonb/hstore way ' + 
+                              'properties column'))
+    parser.add_argument('--spatial-order', type=str,
+                        dest='spatial_order', default=SPATIAL_ORDER_NONE,
+                        choices=sorted(SPATIAL_ORDERS.keys()),
+                        help=('Write nodes and way segments sorted along a ' + 
+                              'space filling curve so tables are clustered ' + 
+                              'by location'))
+    parser.add_argument('--vacuum', action='store_true', dest='vacuum',
+                        help=('Run VACUUM ANALYZE on the loaded tables ' + 
+                              'once the load is finished'))
+    parser.add_argument('--cluster', action='store_true', dest='cluster',
+                        help=('CLUSTER the ways and restrictions tables on ' + 
+                              'their geometry index once the load is finished ' + 
+                              '(implies --vacuum)'))
+    parser.add_argument('--prewarm', action='store_true', dest='prewarm',
+                        help=('Load the tables into shared buffers using ' + 
+                              'pg_prewarm, if the extension is available'))
+    parser.add_argument('--commit-batches', type=int,
+                        dest='commit_batches', default=None, metavar='N',
+                        help=('Group inserts in transactions of N batches ' + 
+                              'with synchronous_commit off, instead of ' + 
+                              'committing every statement'))
+    parser.add_argument('--commit-per-table', action='store_true',
+                        dest='commit_per_table',
+                        help=('Load every table in a single transaction ' + 
+                              'with synchronous_commit off; a failure is ' + 
+                              'replayed only while the table has less than ' + 
+                              '%s rows' % (dbwriter.DEFAULT_MAX_PENDING_ROWS,)))
+    parser.add_argument('--export-graph', type=str, dest='graph_export_path',
+                        default=None, metavar='GRAPH_FILE',
+                        help=('Also write the loaded network as a compact ' + 
+                              'CSR graph file for the in-process drivetime engine'))
+    parser.add_argument('--report', type=str, dest='report_path',
+                        default=None, metavar='REPORT_FILE',
+                        help=('Write per-phase wall time, CPU time, peak ' + 
+                              'memory and throughput of the load as JSON'))
+    parser.add_argument('--profiles', type=str, nargs='+',
+                        dest='profile_names', default=['car'], metavar='PROFILE',
+                        help=('Routing profiles evaluated in the same parse ' + 
+                              '(car, bike, foot or a module path). The first ' + 
+                              'fills maxspeed_* and f_cost/r_cost, every other ' + 
+                              'one gets <profile>_maxspeed_* and ' + 
+                              '<profile>_f_cost/<profile>_r_cost columns'))
+    parser.add_argument('--turn-costs', action='store_true', dest='turn_costs',
+                        help=('Precompute the turn penalty of every allowed ' + 
+                              'turn at each junction with the first profile ' + 
+                              'into turn_costs; turn_costs_trsp exposes it ' + 
+                              'as pgr_trsp restrictions'))
+    clip_group = parser.add_mutually_exclusive_group()
+    clip_group.add_argument('--bbox', type=str, dest='bbox', default=None,
+                        metavar='MIN_LON,MIN_LAT,MAX_LON,MAX_LAT',
+                        help='Only load the part of the file inside this box')
+    clip_group.add_argument('--polygon', type=str, dest='polygon', default=None,
+                        metavar='POLYGON',
+                        help=('Only load the part of the file inside this ' + 
+                              'GeoJSON or WKT (multi)polygon, given inline ' + 
+                              'or as a file path'))
+    parser.add_argument('--clip-policy', type=str, dest='clip_policy',
+                        default=CLIP_POLICY_ANY, choices=CLIP_POLICIES,
+                        help=('Keep ways with any node inside the area whole, ' + 
+                              'only ways with all nodes inside, or clip ways ' + 
+                              'to their inside parts (default any)'))
+    parser.add_argument('--component-policy', type=str,
+                        dest='component_policy', default=None,
+                        choices=COMPONENT_POLICIES,
+                        help=('Compute the strongly connected components of ' + 
+                              'the network after normalization and report, ' + 
+                              'flag (component_id and island columns) or drop ' + 
+                              'the segments of small ones'))
+    parser.add_argument('--min-component-size', type=int,
+                        dest='min_component_size',
+                        default=DEFAULT_MIN_COMPONENT_SIZE, metavar='NODES',
+                        help=('Components with less routing nodes are islands ' + 
+                              '(default %s)' % (DEFAULT_MIN_COMPONENT_SIZE,)))
+    parser.add_argument('--verbose', '-v', action='store_true', dest='verbose',
+                        help=('Log every skipped or suspicious element ' + 
+                              'instead of only a summary per category'))
+    parser.add_argument('--progress-interval', type=float,
+                        dest='progress_interval', default=30., metavar='SECONDS',
+                        help=('Log parse progress, rates and ETA every ' + 
+                              'SECONDS (default 30)'))
+    parser.add_argument('--status-file', type=str, dest='status_path',
+                        default=None, metavar='STATUS_FILE',
+                        help=('Keep the parse progress in this JSON file ' + 
+                              'for monitoring'))
+    parser.add_argument('--profile', type=str, dest='profile_dir',
+                        default=None, metavar='PROFILE_DIR',
+                        help=('Run every phase under cProfile and dump its ' + 
+                              'stats in PROFILE_DIR; also logs how often ' + 
+                              'each way_function rule fired'))
     args = parser.parse_args()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    
+    if args.commit_batches is not None and args.commit_batches < 1:
+        logging.error("--commit-batches should be at least 1")
+        sys.exit(1)
     
     if args.gdal_string is None:
         if backup_connection_info[1]:
@@ -560,16 +1294,40 @@ if __name__ == '__main__':
                       error)
         sys.exit(1)
 
-    if not exists(args.input_file):
-        logging.error("Input file not found: " + args.input_file)
-        sys.exit(1)
-        
-    if args.input_file.endswith('.pbf') and not IMPOSM_PRESENT:
-        logging.error("Unable to parse pbf file as imposm.parser is not available")
+    for input_file in args.input_files:
+        if not exists(input_file):
+            logging.error("Input file not found: " + input_file)
+            sys.exit(1)
+            
+        if input_file.endswith('.pbf') and not IMPOSM_PRESENT:
+            logging.error("Unable to parse pbf file as imposm.parser is not available")
+            sys.exit(1)
+    
+    try:
+        clip_area = load_clip_area(args.bbox, args.polygon)
+    except Exception as e:
+        logging.error("Unable to read the clip area: " + str(e))
         sys.exit(1)
         
 
-    run(connection_info, args.input_file,
+    run(connection_info, args.input_files,
         args.epsg_code,
         use_imposm=args.use_imposm, clean_db=args.clean_db,
-        table_prefix=args.prefix)
+        table_prefix=args.prefix,
+        properties_mode=args.properties_mode,
+        properties_gin_index=args.properties_gin_index,
+        spatial_order=args.spatial_order,
+        vacuum=args.vacuum, cluster=args.cluster, prewarm=args.prewarm,
+        commit_batches=args.commit_batches,
+        commit_per_table=args.commit_per_table,
+        graph_export_path=args.graph_export_path,
+        report_path=args.report_path,
+        profile_dir=args.profile_dir,
+        verbose=args.verbose,
+        progress_interval=args.progress_interval,
+        status_path=args.status_path,
+        profile_names=args.profile_names,
+        turn_costs=args.turn_costs,
+        component_policy=args.component_policy,
+        min_component_size=args.min_component_size,
+        clip_area=clip_area, clip_policy=args.clip_policy)
@@ -29,6 +29,7 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 # Car profile
 import logging
+from collections import Counter
 from util.tag_utils import find_access_tag, is_not_empty
 from util.duration import parse_duration
 from util.config import NUMBER_MATCHER, MPH_MATCHER, SPEED_CONSTANTS_MATCHER
@@ -182,6 +183,19 @@ mode_normal = 1
 mode_ferry = 2
 mode_movable_bridge = 3
 
+# how often each rule of way_function fired since the last reset, only
+# counted when the load is profiled
+counting_rules = False
+rule_counts = Counter()
+
+def get_rule_counts():
+    return dict(rule_counts)
+
+def reset_rule_counts(counting=False):
+    global counting_rules
+    counting_rules = counting
+    rule_counts.clear()
+
 def get_exceptions(vector):
     for tag in restriction_exception_tags:
         vector.add(tag)
@@ -195,9 +209,13 @@ def parse_maxspeed(source,debug=False):
     if n_match is not None:
         n = float(n_match.group(1))
         if MPH_MATCHER.match(source):
+            if counting_rules: rule_counts['maxspeed_mph'] += 1
             n = (n * 1609) / 1000
+        else:
+            if counting_rules: rule_counts['maxspeed_number'] += 1
     else:
         # parse maxspeed like FR:urban
+        if counting_rules: rule_counts['maxspeed_symbolic'] += 1
         source = source.lower()    
         if not maxspeed_table.has_key(source):
             highway_type = SPEED_CONSTANTS_MATCHER.match(source)
@@ -260,30 +278,37 @@ def way_function(way,debug=False):
     result = WayResult()
 
     if not (is_not_empty(highway) or is_not_empty(route) or is_not_empty(bridge)):
+        if counting_rules: rule_counts['rejected_not_a_road'] += 1
         return
 
     # we dont route over areas
     if ignore_areas and  way.has_key('area') and way['area'] == "yes":
+        if counting_rules: rule_counts['rejected_area'] += 1
         return
 
     oneway = way.get('oneway', None)
     if  oneway is not None and "reversible" == way['oneway']:
+        if counting_rules: rule_counts['rejected_reversible'] += 1
         return
 
     if  way.has_key('impassable') and "yes" == way['impassable']:
+        if counting_rules: rule_counts['rejected_impassable'] += 1
         return
     
     if  way.has_key('status') and "impassable" == way['status']:
+        if counting_rules: rule_counts['rejected_impassable'] += 1
         return
 
     # Check if we are allowed to access the way
     access = find_access_tag(way, access_tags_hierachy)
     if access_tag_blacklist.get(access, False):
+        if counting_rules: rule_counts['rejected_access'] += 1
         return
 
     # handling ferries and piers
     route_speed = speed_profile.get(route, -1)
     if (route_speed > 0):
+        if counting_rules: rule_counts['ferry'] += 1
         highway = route
         duration = parse_duration(way.get('duration',None))
         if duration>-1:
@@ -300,6 +325,7 @@ def way_function(way,debug=False):
                     else -1)
     capacity_car = way.get("capacity:car", None)
     if bridge_speed > 0 and (capacity_car is None or capacity_car != 0):
+        if counting_rules: rule_counts['movable_bridge'] += 1
         highway = bridge
         duration = parse_duration(way.get('duration',None))
         if duration>-1:
@@ -321,17 +347,20 @@ def way_function(way,debug=False):
         # Set the avg speed on the way if it is accessible by road class
         if highway_speed is not None:
             if max_speed  is not None and max_speed > highway_speed:
+                if counting_rules: rule_counts['speed_from_maxspeed'] += 1
                 result.forward_speed = max_speed
                 if debug: print "max_speed", max_speed
                 result.backward_speed = max_speed
                 # max_speed = 9999
             else:
+                if counting_rules: rule_counts['speed_from_highway'] += 1
                 result.forward_speed = highway_speed
                 if debug: print "hihgway_speed"
                 result.backward_speed = highway_speed
         else:
             # Set the avg speed on ways that are marked accessible
             if access_tag_whitelist.get(access, False):
+                if counting_rules: rule_counts['speed_default'] += 1
                 result.forward_speed = speed_profile["default"]
                 if debug: print "speed_profile"
                 result.backward_speed = speed_profile["default"]
@@ -343,12 +372,14 @@ def way_function(way,debug=False):
         result.backward_speed = min(result.backward_speed, max_speed)
 
     if -1 == result.forward_speed and -1 == result.backward_speed:
-        logging.warn("ERROR: access utterly forbidden")
+        logging.debug("access utterly forbidden")
+        if counting_rules: rule_counts['rejected_forbidden'] += 1
         return
 
     # reduce speed on special side roads
     if way.has_key("side_road"):
         if way["side_road"] in ("yes", "rotary"):
+            if counting_rules: rule_counts['side_road'] += 1
             result.forward_speed = result.forward_speed * side_road_speed_multiplier
             if debug: print "side_road"
             result.backward_speed = result.backward_speed * side_road_speed_multiplier
@@ -360,16 +391,19 @@ def way_function(way,debug=False):
 
     if surface is not None and surface_speeds.has_key(surface) :
         if surface_speeds[surface] is not None:
+            if counting_rules: rule_counts['surface'] += 1
             result.forward_speed = min(surface_speeds[surface], result.forward_speed)
             if debug: print "surface_speed",surface_speeds[surface], result.forward_speed
             result.backward_speed = min(surface_speeds[surface], result.backward_speed)
         
     if tracktype is not None and tracktype_speeds.has_key(tracktype):
+        if counting_rules: rule_counts['tracktype'] += 1
         result.forward_speed = min(tracktype_speeds[tracktype], result.forward_speed)
         if debug: print "track_speed"
         result.backward_speed = min(tracktype_speeds[tracktype], result.backward_speed)
         
     if smoothness is not None and smoothness_speeds.has_key(smoothness):
+        if counting_rules: rule_counts['smoothness'] += 1
         result.forward_speed = min(smoothness_speeds[smoothness], result.forward_speed)
         if debug: print "smoothness_speed"
         result.backward_speed = min(smoothness_speeds[smoothness], result.backward_speed)
@@ -396,29 +430,35 @@ def way_function(way,debug=False):
     #    result.name = highway  # if no name exists, use way type
 
     if junction is not None and "roundabout" == junction:
+        if counting_rules: rule_counts['roundabout'] += 1
         result.roundabout = True
 
     # Set access restriction flag if access is allowed under certain restrictions only
     if access != "" and access_tag_restricted.get(access, False):
+        if counting_rules: rule_counts['access_restricted'] += 1
         result.is_access_restricted= True
 
     # Set access restriction flag if service is allowed under certain restrictions only
     if is_not_empty(service) and service_tag_restricted.get(service, False):
+        if counting_rules: rule_counts['service_restricted'] += 1
         result.is_access_restricted= True
 
     # Set direction according to tags on way
     if obey_oneway:
         if oneway is not None:
             if oneway == "-1":
+                if counting_rules: rule_counts['oneway_reverse'] += 1
                 result.forward_mode = 0
             elif (oneway in ("yes", "1", "True") 
                   or result.roundabout
                   or (highway is not None and
                        highway in ("motorway_link", "motorway") 
                       and oneway != "no")):
+                if counting_rules: rule_counts['oneway'] += 1
                 result.backward_mode = 0
         elif (result.roundabout  or 
               (highway is not None and highway in ("motorway_link", "motorway"))):
+            if counting_rules: rule_counts['implied_oneway'] += 1
             result.backward_mode = 0
 
 
@@ -426,12 +466,14 @@ def way_function(way,debug=False):
     maxspeed_forward = parse_maxspeed(way.get("maxspeed:forward", None),debug)
     maxspeed_backward = parse_maxspeed(way.get("maxspeed:backward", None),debug)
     if maxspeed_forward > 0:
+        if counting_rules: rule_counts['maxspeed_forward'] += 1
         if 0 != result.forward_mode and 0 != result.backward_mode:
             result.backward_speed = result.forward_speed
         result.forward_speed = maxspeed_forward
         if debug: print "max_speed_forward"
 
     if maxspeed_backward > 0:
+        if counting_rules: rule_counts['maxspeed_backward'] += 1
         result.backward_speed = maxspeed_backward
 
     # Override speed settings if advisory forward/backward maxspeeds are given
@@ -440,17 +482,20 @@ def way_function(way,debug=False):
     advisory_backward = parse_maxspeed(way.get("maxspeed:advisory:backward", None),debug)
     # apply bi-directional advisory speed first
     if advisory_speed > 0:
+        if counting_rules: rule_counts['advisory_speed'] += 1
         if 0 != result.forward_mode:
             result.forward_speed = advisory_speed
             if debug: print "advisory_speed"
         if 0 != result.backward_mode:
             result.backward_speed = advisory_speed
     if advisory_forward > 0:
+        if counting_rules: rule_counts['advisory_forward'] += 1
         if 0 != result.forward_mode and 0 != result.backward_mode:
             result.backward_speed = result.forward_speed
         result.forward_speed = advisory_forward
         if debug: print "advisory_forward"
     if advisory_backward > 0:
+        if counting_rules: rule_counts['advisory_backward'] += 1
         result.backward_speed = advisory_backward
 
     width = 9999
@@ -464,6 +509,8 @@ def way_function(way,debug=False):
             lanes = float(NUMBER_MATCHER.match(lanes_string).group(1))
 
     is_bidirectional = result.forward_mode != 0 and result.backward_mode != 0
+    if width <= 3 or (lanes <= 1 and is_bidirectional):
+        if counting_rules: rule_counts['narrow_penalty'] += 1
 
     # scale speeds to get better avg driving times
     if result.forward_speed > 0:
@@ -484,6 +531,7 @@ def way_function(way,debug=False):
 
     result.is_startpoint = (result.forward_mode == mode_normal 
                                or result.backward_mode == mode_normal)
+    if counting_rules: rule_counts['accepted'] += 1
     return result
 
 
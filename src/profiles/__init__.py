@@ -0,0 +1,28 @@
+import importlib
+import re
+
+# name -> module of the built-in profiles; anything else is imported as a module path
+PROFILE_MODULES = {'car': 'profile',
+                   'bike': 'profiles.bike',
+                   'foot': 'profiles.foot'}
+
+PROFILE_NAME_MATCHER = re.compile('^[a-z][a-z0-9_]*$')
+
+
+def load_profile(name):
+    module_name = PROFILE_MODULES.get(name, name)
+    profile_name = name.split('.')[-1].lower()
+    if PROFILE_NAME_MATCHER.match(profile_name) is None:
+        raise Exception("profile name '%s' is not usable as a column prefix" % (profile_name,))
+    return profile_name, importlib.import_module(module_name)
+
+
+def load_profiles(names):
+    '''
+    Ordered (name, module) pairs; the first profile fills the default cost
+    columns, the others get columns prefixed with their name
+    '''
+    profiles = [load_profile(name) for name in names]
+    if len(set(name for name, _ in profiles)) != len(profiles):
+        raise Exception("duplicate profiles in %s" % (names,))
+    return profiles
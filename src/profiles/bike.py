@@ -0,0 +1,195 @@
+"""
+Python translation of :
+https://github.com/Project-OSRM/osrm-backend/blob/develop/profiles/bicycle.lua
+
+bicycle.lua copyright notice:
+Copyright (c) 2016, Project OSRM contributors
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this list
+of conditions and the following disclaimer.
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+# Bicycle profile
+from profile import WayResult, parse_maxspeed
+from util.tag_utils import find_access_tag, is_not_empty
+from util.duration import parse_duration
+
+
+access_tag_whitelist = { "yes" : True, "permissive" : True, "designated" : True }
+access_tag_blacklist = { "no" : True, "private" : True, "agricultural" : True, "forestry" : True, "delivery" : True }
+access_tags_hierachy = [ "bicycle", "vehicle", "access" ]
+
+default_speed = 15
+walking_speed = 6
+
+bicycle_speeds = {
+  "cycleway" : default_speed,
+  "primary" : default_speed,
+  "primary_link" : default_speed,
+  "secondary" : default_speed,
+  "secondary_link" : default_speed,
+  "tertiary" : default_speed,
+  "tertiary_link" : default_speed,
+  "residential" : default_speed,
+  "unclassified" : default_speed,
+  "living_street" : default_speed,
+  "road" : default_speed,
+  "service" : default_speed,
+  "track" : 12,
+  "path" : 12
+}
+
+# ways where the bicycle is pushed unless cycling is explicitly allowed
+pedestrian_speeds = {
+  "footway" : walking_speed,
+  "pedestrian" : walking_speed,
+  "steps" : 2
+}
+
+route_speeds = {
+  "ferry" : 5
+}
+
+surface_speeds = {
+  "cobblestone:flattened" : 10,
+  "paving_stones" : 10,
+  "compacted" : 10,
+  "cobblestone" : 6,
+  "unpaved" : 6,
+  "fine_gravel" : 6,
+  "gravel" : 6,
+  "pebblestone" : 6,
+  "ground" : 6,
+  "dirt" : 6,
+  "earth" : 6,
+  "grass" : 6,
+  "mud" : 3,
+  "sand" : 3,
+  "sett" : 10
+}
+
+# highway values routed by this profile on top of the loader configuration
+routable_highways = set(["cycleway", "path", "footway", "pedestrian", "steps"])
+
+u_turn_penalty = 20
+traffic_signal_penalty = 2
+turn_penalty = 6
+turn_bias = 1.4
+
+mode_normal = 1
+mode_ferry = 2
+mode_pushing = 4
+
+def way_function(way, debug=False):
+    highway = way.get("highway", None)
+    route = way.get("route", None)
+
+    if not (is_not_empty(highway) or is_not_empty(route)):
+        return
+
+    # we dont route over areas
+    if way.get("area", None) == "yes":
+        return
+
+    if way.get("impassable", None) == "yes" or way.get("status", None) == "impassable":
+        return
+
+    access = find_access_tag(way, access_tags_hierachy)
+    if access_tag_blacklist.get(access, False):
+        return
+
+    result = WayResult()
+    bicycle = way.get("bicycle", None)
+    if route is not None and route_speeds.has_key(route):
+        # ferries
+        result.forward_mode = mode_ferry
+        result.backward_mode = mode_ferry
+        duration = parse_duration(way.get("duration", None))
+        if duration > -1:
+            result.duration = max(duration, 1)
+        result.forward_speed = route_speeds[route]
+        result.backward_speed = route_speeds[route]
+    elif bicycle_speeds.has_key(highway):
+        result.forward_speed = bicycle_speeds[highway]
+        result.backward_speed = bicycle_speeds[highway]
+    elif pedestrian_speeds.has_key(highway):
+        if access_tag_whitelist.get(bicycle, False):
+            result.forward_speed = default_speed
+            result.backward_speed = default_speed
+        else:
+            result.forward_mode = mode_pushing
+            result.backward_mode = mode_pushing
+            result.forward_speed = pedestrian_speeds[highway]
+            result.backward_speed = pedestrian_speeds[highway]
+    elif access_tag_whitelist.get(access, False):
+        # unknown road type, but explicitly allowed
+        result.forward_speed = default_speed
+        result.backward_speed = default_speed
+    else:
+        if debug: print "no speed for highway", highway
+        return
+
+    # cyclists do not go faster than the legal limit
+    max_speed = parse_maxspeed(way.get("maxspeed", None))
+    if max_speed > 0:
+        result.forward_speed = min(result.forward_speed, max_speed)
+        result.backward_speed = min(result.backward_speed, max_speed)
+
+    surface = way.get("surface", None)
+    if surface is not None and surface_speeds.has_key(surface):
+        result.forward_speed = min(surface_speeds[surface], result.forward_speed)
+        result.backward_speed = min(surface_speeds[surface], result.backward_speed)
+
+    # oneway, unless lifted for bicycles; against it the bicycle is pushed
+    oneway = way.get("oneway:bicycle", way.get("oneway", None))
+    cycleway = way.get("cycleway", "")
+    if cycleway.startswith("opposite"):
+        oneway = "no"
+    if way.get("junction", None) == "roundabout" and oneway is None:
+        oneway = "yes"
+    if oneway in ("yes", "1", "true"):
+        if way.get("junction", None) == "roundabout":
+            result.backward_mode = 0
+        else:
+            result.backward_mode = mode_pushing
+            result.backward_speed = min(walking_speed, result.backward_speed)
+    elif oneway == "-1":
+        result.forward_mode = mode_pushing
+        result.forward_speed = min(walking_speed, result.forward_speed)
+
+    name = way.get("name", None)
+    ref = way.get("ref", None)
+    if is_not_empty(name) and is_not_empty(ref):
+        result.name = name + u" (" + ref + u")"
+    elif is_not_empty(ref):
+        result.name = ref
+    elif is_not_empty(name):
+        result.name = name
+    return result
+
+
+def turn_function(angle):
+    # compute turn penalty as angle^2, with a left/right bias
+    k = turn_penalty / (90.0 * 90.0)
+    if angle >= 0:
+        return angle * angle * k / turn_bias
+    else:
+        return angle * angle * k * turn_bias
@@ -0,0 +1,146 @@
+"""
+Python translation of :
+https://github.com/Project-OSRM/osrm-backend/blob/develop/profiles/foot.lua
+
+foot.lua copyright notice:
+Copyright (c) 2016, Project OSRM contributors
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this list
+of conditions and the following disclaimer.
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
+
+# Foot profile
+from profile import WayResult
+from util.tag_utils import find_access_tag, is_not_empty
+from util.duration import parse_duration
+
+
+access_tag_whitelist = { "yes" : True, "foot" : True, "permissive" : True, "designated" : True }
+access_tag_blacklist = { "no" : True, "private" : True, "agricultural" : True, "forestry" : True, "delivery" : True }
+access_tags_hierachy = [ "foot", "access" ]
+
+walking_speed = 5
+
+speeds = {
+  "primary" : walking_speed,
+  "primary_link" : walking_speed,
+  "secondary" : walking_speed,
+  "secondary_link" : walking_speed,
+  "tertiary" : walking_speed,
+  "tertiary_link" : walking_speed,
+  "unclassified" : walking_speed,
+  "residential" : walking_speed,
+  "road" : walking_speed,
+  "living_street" : walking_speed,
+  "service" : walking_speed,
+  "track" : walking_speed,
+  "path" : walking_speed,
+  "steps" : walking_speed,
+  "pedestrian" : walking_speed,
+  "footway" : walking_speed,
+  "pier" : walking_speed
+}
+
+route_speeds = {
+  "ferry" : 5
+}
+
+surface_speeds = {
+  "fine_gravel" : walking_speed * 0.75,
+  "gravel" : walking_speed * 0.75,
+  "pebblestone" : walking_speed * 0.75,
+  "mud" : walking_speed * 0.5,
+  "sand" : walking_speed * 0.5
+}
+
+# highway values routed by this profile on top of the loader configuration
+routable_highways = set(["footway", "pedestrian", "path", "steps", "pier", "bridleway"])
+
+u_turn_penalty = 0
+traffic_signal_penalty = 2
+
+mode_normal = 1
+mode_ferry = 2
+
+def way_function(way, debug=False):
+    highway = way.get("highway", None)
+    route = way.get("route", None)
+
+    if not (is_not_empty(highway) or is_not_empty(route)):
+        return
+
+    # we dont route over areas
+    if way.get("area", None) == "yes":
+        return
+
+    if way.get("impassable", None) == "yes" or way.get("status", None) == "impassable":
+        return
+
+    access = find_access_tag(way, access_tags_hierachy)
+    if access_tag_blacklist.get(access, False):
+        return
+
+    result = WayResult()
+    if route is not None and route_speeds.has_key(route):
+        # ferries
+        result.forward_mode = mode_ferry
+        result.backward_mode = mode_ferry
+        duration = parse_duration(way.get("duration", None))
+        if duration > -1:
+            result.duration = max(duration, 1)
+        result.forward_speed = route_speeds[route]
+        result.backward_speed = route_speeds[route]
+    elif speeds.has_key(highway):
+        result.forward_speed = speeds[highway]
+        result.backward_speed = speeds[highway]
+    elif access_tag_whitelist.get(access, False):
+        # unknown road type, but explicitly allowed
+        result.forward_speed = walking_speed
+        result.backward_speed = walking_speed
+    else:
+        if debug: print "no speed for highway", highway
+        return
+
+    surface = way.get("surface", None)
+    if surface is not None and surface_speeds.has_key(surface):
+        result.forward_speed = min(surface_speeds[surface], result.forward_speed)
+        result.backward_speed = min(surface_speeds[surface], result.backward_speed)
+
+    # pedestrians ignore oneway, except when explicitly tagged for them
+    oneway = way.get("oneway:foot", None)
+    if oneway in ("yes", "1", "true"):
+        result.backward_mode = 0
+    elif oneway == "-1":
+        result.forward_mode = 0
+
+    name = way.get("name", None)
+    ref = way.get("ref", None)
+    if is_not_empty(name) and is_not_empty(ref):
+        result.name = name + u" (" + ref + u")"
+    elif is_not_empty(ref):
+        result.name = ref
+    elif is_not_empty(name):
+        result.name = name
+    return result
+
+
+def turn_function(angle):
+    return 0
@@ -0,0 +1,136 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# the drivetime modules import each other as top level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'drivetime'))
+
+from cache import IsobandCache, make_key
+
+
+class MakeKeyTest(unittest.TestCase):
+    def test_equivalent_requests_share_a_key(self):
+        self.assertEqual(make_key(12, 300, None, 0, 60),
+                         make_key(12, 300., '', 0., 60., None, None))
+        self.assertNotEqual(make_key(12, 300, None, 0, 60),
+                            make_key(12, 300, '5,6', 0, 60))
+        self.assertNotEqual(make_key(12, 300, None, 0, 60, max_level=240),
+                            make_key(12, 300, None, 0, 60))
+
+
+class IsobandCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lru_eviction(self):
+        cache = IsobandCache(max_entries=2)
+        cache.put('a', '1')
+        cache.put('b', '2')
+        self.assertEqual(cache.get('a'), '1')
+        cache.put('c', '3')
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), '1')
+        self.assertEqual(cache.get('c'), '3')
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_expired_entry_is_a_miss(self):
+        cache = IsobandCache(max_age=10)
+        cache._put_memory('a', '1', time.time() - 20)
+        self.assertEqual(cache.get('a'), None)
+        self.assertFalse('a' in cache.entries)
+
+    def test_disk_entry_keeps_its_age(self):
+        cache = IsobandCache(max_age=100, store_path=self.directory)
+        cache.invalidate('1')
+        cache.put('a', '{}')
+        stored = time.time() - 60
+        path = cache._disk_path('a')
+        os.utime(path, (stored, stored))
+
+        restarted = IsobandCache(max_age=100, store_path=self.directory)
+        restarted.invalidate('1')
+        self.assertEqual(restarted.get('a'), '{}')
+        self.assertAlmostEqual(restarted.entries['a'][0], stored, places=0)
+
+        stale = IsobandCache(max_age=30, store_path=self.directory)
+        stale.invalidate('1')
+        self.assertEqual(stale.get('a'), None)
+        self.assertFalse(os.path.exists(path))
+
+    def test_disk_entries_are_bounded(self):
+        cache = IsobandCache(store_path=self.directory, max_disk_entries=3)
+        cache.invalidate('1')
+        for idx in range(5):
+            cache.put(idx, str(idx))
+        self.assertEqual(len(os.listdir(cache._disk_dir())), 3)
+
+    def test_new_generation_drops_entries(self):
+        cache = IsobandCache(store_path=self.directory)
+        cache.invalidate('1')
+        cache.put('a', '{}')
+        cache.invalidate('2')
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_generation_is_checked_once_per_interval(self):
+        generations = ['1', '1', '2']
+
+        class Cursor(object):
+            def execute(self, sql, params):
+                pass
+
+            def fetchone(self):
+                return (generations.pop(0),)
+
+            def close(self):
+                pass
+
+        class Connection(object):
+            def cursor(self):
+                return Cursor()
+
+        cache = IsobandCache(generation_check_interval=3600)
+        cache.check_generation(Connection())
+        cache.put('a', '{}')
+        cache.check_generation(Connection())
+        self.assertEqual(cache.get('a'), '{}')
+        cache.last_generation_check = 0
+        cache.check_generation(Connection())
+        self.assertEqual(cache.get('a'), '{}')
+        cache.last_generation_check = 0
+        cache.check_generation(Connection())
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.generation, '2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from math import cos, pi, sin
+
+from util.clipping import CLIP_GAP, CLIP_POLICY_ALL, CLIP_POLICY_ANY, CLIP_POLICY_CLIP, \
+    clip_way_nodes, load_clip_area, load_polygon, parse_bbox
+
+SQUARE_WITH_HOLE = ('POLYGON((0 0, 10 0, 10 10, 0 10, 0 0),'
+                    '(4 4, 6 4, 6 6, 4 6, 4 4))')
+
+
+class ClipAreaTest(unittest.TestCase):
+    def test_bbox(self):
+        area = parse_bbox('25.9,44.3,26.2,44.5')
+        self.assertEqual(area.get_bounds(), (25.9, 44.3, 26.2, 44.5))
+        self.assertTrue(area.contains(26.0, 44.4))
+        self.assertFalse(area.contains(26.3, 44.4))
+        self.assertFalse(area.contains(26.0, 44.6))
+
+    def test_invalid_bbox(self):
+        self.assertRaises(Exception, parse_bbox, '26.2,44.3,25.9,44.5')
+        self.assertRaises(Exception, parse_bbox, '25.9,44.3,26.2')
+
+    def test_wkt_polygon_with_hole(self):
+        area = load_polygon(SQUARE_WITH_HOLE)
+        self.assertTrue(area.contains(1, 1))
+        self.assertTrue(area.contains(9, 5))
+        self.assertFalse(area.contains(5, 5))
+        self.assertFalse(area.contains(11, 5))
+
+    def test_ewkt(self):
+        area = load_polygon('SRID=4326;' + SQUARE_WITH_HOLE)
+        self.assertTrue(area.contains(1, 1))
+
+    def test_geojson_multipolygon_file(self):
+        geometry = {'type': 'Feature',
+                    'geometry': {'type': 'MultiPolygon',
+                                 'coordinates': [[[[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]]],
+                                                 [[[5, 5], [7, 5], [7, 7], [5, 7], [5, 5]]]]}}
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'area.geojson')
+            with open(path, 'w') as f:
+                json.dump(geometry, f)
+            area = load_polygon(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertTrue(area.contains(1, 1))
+        self.assertTrue(area.contains(6, 6))
+        self.assertFalse(area.contains(3.5, 3.5))
+
+    def test_many_edges_use_bands(self):
+        # a regular 400-gon approximating a circle of radius 1
+        ring = [(cos(2 * pi * x / 400), sin(2 * pi * x / 400)) for x in range(400)]
+        area = load_polygon(json.dumps({'type': 'Polygon', 'coordinates': [ring]}))
+        self.assertTrue(area.band_count > 1)
+        self.assertTrue(area.contains(0.7, 0.7))
+        self.assertFalse(area.contains(0.72, 0.72))
+
+    def test_unsupported_geometry(self):
+        self.assertRaises(Exception, load_polygon, 'LINESTRING(0 0, 1 1)')
+        self.assertRaises(Exception, load_polygon,
+                          json.dumps({'type': 'Point', 'coordinates': [0, 0]}))
+
+    def test_load_clip_area(self):
+        self.assertEqual(load_clip_area(), None)
+        self.assertRaises(Exception, load_clip_area, '0,0,1,1', SQUARE_WITH_HOLE)
+
+
+class ClipWayNodesTest(unittest.TestCase):
+    def test_any(self):
+        self.assertEqual(clip_way_nodes([1, 2, 3], set([3]), CLIP_POLICY_ANY), [1, 2, 3])
+        self.assertEqual(clip_way_nodes([1, 2, 3], set([4]), CLIP_POLICY_ANY), None)
+
+    def test_all(self):
+        self.assertEqual(clip_way_nodes([1, 2, 3], set([1, 2, 3]), CLIP_POLICY_ALL),
+                         [1, 2, 3])
+        self.assertEqual(clip_way_nodes([1, 2, 3], set([1, 2]), CLIP_POLICY_ALL), None)
+
+    def test_clip_keeps_inside_runs(self):
+        nodes = [1, 2, 3, 4, 5, 6, 7]
+        self.assertEqual(clip_way_nodes(nodes, set([1, 2, 4, 5, 6]), CLIP_POLICY_CLIP),
+                         [1, 2, CLIP_GAP, 4, 5, 6])
+
+    def test_clip_drops_single_nodes(self):
+        self.assertEqual(clip_way_nodes([1, 2, 3, 4], set([1, 3]), CLIP_POLICY_CLIP), None)
+        self.assertEqual(clip_way_nodes([1, 2, 3, 4], set([1, 3, 4]), CLIP_POLICY_CLIP),
+                         [3, 4])
+
+    def test_unknown_policy(self):
+        self.assertRaises(Exception, clip_way_nodes, [1, 2], set([1, 2]), 'some')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import random
+import unittest
+
+from util.components import strongly_connected_components, size_histogram
+
+
+def reachable(successors, start):
+    seen = set([start])
+    todo = [start]
+    while todo:
+        for child in successors[todo.pop()]:
+            if child not in seen:
+                seen.add(child)
+                todo.append(child)
+    return seen
+
+
+class StronglyConnectedComponentsTest(unittest.TestCase):
+    def test_cycle_with_tail(self):
+        successors = {1: [2], 2: [3], 3: [1], 4: [1], 5: []}
+        component_of, sizes = strongly_connected_components(successors)
+        self.assertEqual(component_of[1], component_of[2])
+        self.assertEqual(component_of[1], component_of[3])
+        self.assertNotEqual(component_of[4], component_of[1])
+        self.assertNotEqual(component_of[5], component_of[4])
+        self.assertEqual(sorted(sizes), [1, 1, 3])
+
+    def test_oneway_dead_end_is_its_own_component(self):
+        successors = {1: [2], 2: [1, 3], 3: []}
+        component_of, sizes = strongly_connected_components(successors)
+        self.assertEqual(component_of[1], component_of[2])
+        self.assertEqual(sizes[component_of[3]], 1)
+
+    def test_long_cycle_does_not_recurse(self):
+        count = 20000
+        successors = dict((x, [(x + 1) % count]) for x in range(count))
+        component_of, sizes = strongly_connected_components(successors)
+        self.assertEqual(sizes, [count])
+
+    def test_matches_mutual_reachability(self):
+        generator = random.Random(7)
+        for _ in range(20):
+            count = 30
+            successors = dict((x, generator.sample(range(count), generator.randint(0, 2)))
+                              for x in range(count))
+            component_of, sizes = strongly_connected_components(successors)
+            reach = dict((x, reachable(successors, x)) for x in successors)
+            for x in successors:
+                for y in successors:
+                    same = x in reach[y] and y in reach[x]
+                    self.assertEqual(component_of[x] == component_of[y], same)
+            self.assertEqual(sum(sizes), count)
+
+
+class SizeHistogramTest(unittest.TestCase):
+    def test_orders_of_magnitude(self):
+        self.assertEqual(size_histogram([1, 1, 5, 12, 99, 150]),
+                         {'1': 2, '2-9': 1, '10-99': 2, '100-999': 1})
+
+    def test_empty(self):
+        self.assertEqual(size_histogram([]), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import unittest
+
+from util.diagnostics import Diagnostics
+
+
+class DiagnosticsTest(unittest.TestCase):
+    def test_record_counts_and_samples(self):
+        diagnostics = Diagnostics(sample_size=3)
+        for element_id in range(5):
+            diagnostics.record('way with one distinct node', element_id)
+        diagnostics.record('unaccessible way', 42)
+        self.assertEqual(diagnostics.get_count('way with one distinct node'), 5)
+        self.assertEqual(diagnostics.get_count('unaccessible way'), 1)
+        self.assertEqual(diagnostics.get_count('unknown'), 0)
+        self.assertEqual(diagnostics.samples['way with one distinct node'], [0, 1, 2])
+
+    def test_record_many(self):
+        diagnostics = Diagnostics(sample_size=4)
+        diagnostics.record('node without coordinates', 1)
+        diagnostics.record_many('node without coordinates', (x for x in range(10, 20)))
+        diagnostics.record_many('node without coordinates', [])
+        diagnostics.record_many('empty', [])
+        self.assertEqual(diagnostics.get_count('node without coordinates'), 11)
+        self.assertEqual(diagnostics.samples['node without coordinates'], [1, 10, 11, 12])
+        self.assertFalse('empty' in diagnostics.as_dict())
+
+    def test_merge(self):
+        first = Diagnostics(sample_size=3)
+        second = Diagnostics(sample_size=3)
+        first.record('profile rejected way', 1)
+        first.record('profile rejected way', 2)
+        second.record('profile rejected way', 3)
+        second.record('profile rejected way', 4)
+        second.record('error profiling way', 5)
+        first.merge(second)
+        self.assertEqual(first.as_dict(),
+                         {'profile rejected way': {'count': 4, 'sample': [1, 2, 3]},
+                          'error profiling way': {'count': 1, 'sample': [5]}})
+
+
+if __name__ == '__main__':
+    unittest.main()
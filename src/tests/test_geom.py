@@ -0,0 +1,65 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import unittest
+
+from util.geom import hilbert_key, zorder_key
+
+ORDER = 4
+SIDE = (1 << ORDER) - 1
+
+
+def cell_center(x, y):
+    # lon / lat falling in cell x, y of the curve grid
+    return (-180. + (x + 0.5) * 360. / SIDE, -90. + (y + 0.5) * 180. / SIDE)
+
+
+class CurveKeyTest(unittest.TestCase):
+    def cells(self):
+        return [(x, y) for x in range(1 << ORDER) for y in range(1 << ORDER)]
+
+    def test_zorder_interleaves_bits(self):
+        for x, y in self.cells():
+            key = zorder_key(*cell_center(x, y), order=ORDER)
+            self.assertEqual(sum(((key >> (2 * bit)) & 1) << bit for bit in range(ORDER)), x)
+            self.assertEqual(sum(((key >> (2 * bit + 1)) & 1) << bit for bit in range(ORDER)), y)
+
+    def test_keys_are_a_permutation(self):
+        for function in (zorder_key, hilbert_key):
+            keys = sorted(function(*cell_center(x, y), order=ORDER) for x, y in self.cells())
+            self.assertEqual(keys, range(1 << (2 * ORDER)))
+
+    def test_hilbert_steps_to_neighbours(self):
+        by_key = dict((hilbert_key(*cell_center(x, y), order=ORDER), (x, y))
+                      for x, y in self.cells())
+        for key in range(1, len(by_key)):
+            (x1, y1), (x2, y2) = by_key[key - 1], by_key[key]
+            self.assertEqual(abs(x1 - x2) + abs(y1 - y2), 1)
+
+    def test_out_of_range_is_clamped(self):
+        self.assertEqual(zorder_key(-200, -100, order=ORDER), 0)
+        self.assertEqual(zorder_key(200, 100, order=ORDER), (1 << (2 * ORDER)) - 1)
+        self.assertEqual(hilbert_key(200, 100, order=ORDER),
+                         hilbert_key(180, 90, order=ORDER))
+
+    def test_default_order_orders_nearby_points_together(self):
+        near = abs(hilbert_key(26.1, 44.4) - hilbert_key(26.1001, 44.4001))
+        far = abs(hilbert_key(26.1, 44.4) - hilbert_key(-70.0, -30.0))
+        self.assertTrue(near < far)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from util.progress import ProgressReporter, _format_bytes, _format_duration
+
+
+class ProgressReporterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.directory, 'input.osm')
+        with open(self.input_path, 'wb') as f:
+            f.write('x' * 1000)
+        self.status_path = os.path.join(self.directory, 'status.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fraction_and_eta(self):
+        with open(self.input_path, 'rb') as source:
+            progress = ProgressReporter('first parse', source, interval=3600)
+            source.read(250)
+            progress.update('nodes', 10)
+            status = progress.get_status(now=progress.start + 5)
+        self.assertEqual(status['total_bytes'], 1000)
+        self.assertEqual(status['bytes_read'], 250)
+        self.assertEqual(status['fraction'], 0.25)
+        self.assertEqual(status['bytes_per_sec'], 50)
+        self.assertEqual(status['eta_seconds'], 15)
+        self.assertEqual(status['counts'], {'nodes': 10})
+        self.assertEqual(status['rates'], {'nodes': 2})
+
+    def test_without_source(self):
+        progress = ProgressReporter('clip pass', interval=3600)
+        progress.update('nodes')
+        status = progress.get_status()
+        self.assertEqual(status['fraction'], None)
+        self.assertEqual(status['eta_seconds'], None)
+        self.assertEqual(status['counts'], {'nodes': 1})
+
+    def test_status_file(self):
+        with open(self.input_path, 'rb') as source:
+            progress = ProgressReporter('node parse', source, interval=0,
+                                        status_path=self.status_path, check_every=2)
+            progress.update('ways')
+            self.assertFalse(os.path.exists(self.status_path))
+            progress.update('ways')
+            with open(self.status_path) as f:
+                self.assertEqual(json.load(f)['counts'], {'ways': 2})
+        progress.finish()
+        with open(self.status_path) as f:
+            status = json.load(f)
+        self.assertTrue(status['done'])
+        self.assertEqual(status['fraction'], 1.)
+        self.assertFalse(os.path.exists(self.status_path + '.tmp'))
+
+    def test_formatting(self):
+        self.assertEqual(_format_duration(3725.9), '01:02:05')
+        self.assertEqual(_format_bytes(512), '512.0 B')
+        self.assertEqual(_format_bytes(2048), '2.0 kB')
+        self.assertEqual(_format_bytes(3 * 1024 ** 4), '3072.0 GB')
+
+
+if __name__ == '__main__':
+    unittest.main()
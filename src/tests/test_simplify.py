@@ -0,0 +1,144 @@
+'''
+Copyright (c) 2016 daniel.urda
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import os
+import sys
+import types
+import unittest
+
+from numpy import array
+
+# the drivetime modules import each other as top level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'drivetime'))
+
+from simplify import DOUGLAS_PEUCKER, VISVALINGAM, douglas_peucker, invalid_rings, \
+    simplify_features, visvalingam
+
+
+def ring(*points):
+    return array(points + (points[0],), dtype=float)
+
+
+# a square whose top side bulges up to (50, 104), within 5 of the straight side
+BULGING_SHELL = ring((0, 0), (100, 0), (100, 100), (50, 104), (0, 100))
+HOLE_IN_BULGE = ring((49.5, 101), (50.5, 101), (50.5, 102), (49.5, 102))
+# the band above it, sharing the bulging side
+ABOVE_BULGE = ring((0, 100), (50, 104), (100, 100), (100, 200), (0, 200))
+
+
+class LineSimplificationTest(unittest.TestCase):
+    def test_douglas_peucker(self):
+        points = array([(0, 0), (1, 0.1), (2, -0.1), (3, 5), (4, 6), (5, 7)], dtype=float)
+        self.assertEqual(douglas_peucker(points, 0.5).tolist(),
+                         [[0, 0], [2, -0.1], [3, 5], [5, 7]])
+
+    def test_visvalingam(self):
+        points = array([(0, 0), (1, 0.01), (2, 0), (3, 3), (4, 0)], dtype=float)
+        self.assertEqual(visvalingam(points, 0.5).tolist(),
+                         [[0, 0], [2, 0], [3, 3], [4, 0]])
+
+    def test_ends_are_kept(self):
+        points = array([(0, 0), (1, 0), (2, 0)], dtype=float)
+        for simplifier in (douglas_peucker, visvalingam):
+            self.assertEqual(simplifier(points, 10).tolist(), [[0, 0], [2, 0]])
+
+
+class InvalidRingsTest(unittest.TestCase):
+    def test_valid_polygon(self):
+        shell = ring((0, 0), (10, 0), (10, 10), (0, 10))
+        hole = ring((2, 2), (4, 2), (4, 4), (2, 4))
+        self.assertEqual(invalid_rings([shell, hole]), set())
+
+    def test_self_crossing(self):
+        bow_tie = ring((0, 0), (10, 10), (10, 0), (0, 10))
+        self.assertEqual(invalid_rings([bow_tie]), set([0]))
+
+    def test_hole_crossing_shell(self):
+        shell = ring((0, 0), (10, 0), (10, 10), (0, 10))
+        hole = ring((8, 8), (12, 8), (12, 9), (8, 9))
+        self.assertEqual(invalid_rings([shell, hole]), set([0, 1]))
+
+    def test_hole_outside_shell(self):
+        shell = ring((0, 0), (10, 0), (10, 10), (0, 10))
+        hole = ring((12, 2), (14, 2), (14, 4), (12, 4))
+        self.assertEqual(invalid_rings([shell, hole]), set([0, 1]))
+
+    def test_nested_holes(self):
+        shell = ring((0, 0), (10, 0), (10, 10), (0, 10))
+        outer = ring((2, 2), (8, 2), (8, 8), (2, 8))
+        inner = ring((4, 4), (6, 4), (6, 6), (4, 6))
+        self.assertEqual(invalid_rings([shell, outer, inner]), set([1, 2]))
+
+    def test_shared_vertex_is_not_a_crossing(self):
+        shell = ring((0, 0), (10, 0), (10, 10), (0, 10))
+        hole = ring((0, 0), (4, 2), (2, 4))
+        self.assertEqual(invalid_rings([shell, hole]), set())
+
+
+class SimplifyFeaturesTest(unittest.TestCase):
+    def test_features_are_streamed(self):
+        features = [({'cost': 60.}, [BULGING_SHELL])]
+        simplified = simplify_features(features, 5)
+        self.assertTrue(isinstance(simplified, types.GeneratorType))
+        properties, rings = next(simplified)
+        self.assertEqual(properties, {'cost': 60.})
+        self.assertEqual(len(rings[0]), len(BULGING_SHELL) - 1)
+
+    def test_ring_leaving_a_hole_outside_is_kept(self):
+        features = [({'cost': 60.}, [BULGING_SHELL, HOLE_IN_BULGE])]
+        for method in (DOUGLAS_PEUCKER, VISVALINGAM):
+            (_, rings), = simplify_features(features, 5, method)
+            self.assertEqual(rings[0].tolist(), BULGING_SHELL.tolist())
+            self.assertEqual(rings[1].tolist(), HOLE_IN_BULGE.tolist())
+
+    def test_shared_boundary_stays_identical(self):
+        # two bands meeting along a wiggly line from (0, 5) to (10, 5)
+        wiggle = [(x, 5 + (0.1 if x % 2 else -0.1)) for x in range(1, 10)]
+        lower = array([(0, 0), (10, 0), (10, 5)] + wiggle[::-1] + [(0, 5), (0, 0)],
+                      dtype=float)
+        upper = array([(0, 5)] + wiggle + [(10, 5), (10, 10), (0, 10), (0, 5)],
+                      dtype=float)
+        features = [({'cost': 60.}, [lower]), ({'cost': 120.}, [upper])]
+        (_, (lower_ring,)), (_, (upper_ring,)) = simplify_features(features, 0.5)
+        self.assertTrue(len(lower_ring) < len(lower))
+        lower_points = set(map(tuple, lower_ring.tolist()))
+        upper_points = set(map(tuple, upper_ring.tolist()))
+        shared = set(map(tuple, array(wiggle + [(0, 5), (10, 5)]).tolist()))
+        self.assertEqual(lower_points & shared, upper_points & shared)
+
+    def test_restored_ring_restores_shared_arcs(self):
+        lower = ({'cost': 60.}, [BULGING_SHELL, HOLE_IN_BULGE])
+        upper = ({'cost': 120.}, [ABOVE_BULGE])
+        for features in ([lower, upper], [upper, lower]):
+            simplified = dict((properties['cost'], rings)
+                              for properties, rings in simplify_features(features, 5))
+            # rings rebuilt from their arcs start at a junction
+            for (shell, ), original in ((simplified[60.][:1], BULGING_SHELL),
+                                        (simplified[120.], ABOVE_BULGE)):
+                self.assertEqual(len(shell), len(original))
+                self.assertEqual(set(map(tuple, shell.tolist())),
+                                 set(map(tuple, original.tolist())))
+
+
+if __name__ == '__main__':
+    unittest.main()
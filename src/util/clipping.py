@@ -0,0 +1,184 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import json
+import re
+
+from os.path import exists
+
+'''
+Area of interest for loading only part of an extract: a bounding box or a
+GeoJSON/WKT (multi)polygon in WGS84. Ways are kept whole when any or all of
+their nodes are inside, or clipped to their inside runs of nodes.
+'''
+
+CLIP_POLICY_ANY = 'any'
+CLIP_POLICY_ALL = 'all'
+CLIP_POLICY_CLIP = 'clip'
+CLIP_POLICIES = (CLIP_POLICY_ANY, CLIP_POLICY_ALL, CLIP_POLICY_CLIP)
+
+# placeholder between two runs of a clipped way
+CLIP_GAP = None
+
+WKT_RING_MATCHER = re.compile(r'\(([^()]*)\)')
+
+
+class ClipArea(object):
+    '''
+    Even-odd point in polygon over every ring (holes and multipolygon parts
+    included). Ring edges are bucketed into horizontal bands so a test only
+    looks at the few edges crossing the latitude of the point.
+    '''
+
+    def __init__(self, rings, is_box=False):
+        rings = [ring for ring in rings if len(ring) > 2]
+        if len(rings) == 0:
+            raise Exception("clip area has no polygon ring")
+        self.rings = rings
+        self.is_box = is_box
+        self.min_lon = min(lon for ring in rings for lon, _ in ring)
+        self.max_lon = max(lon for ring in rings for lon, _ in ring)
+        self.min_lat = min(lat for ring in rings for _, lat in ring)
+        self.max_lat = max(lat for ring in rings for _, lat in ring)
+        edges = []
+        for ring in rings:
+            for idx in range(len(ring)):
+                start, end = ring[idx - 1], ring[idx]
+                if start[1] != end[1]:
+                    edges.append((start, end))
+        self.band_count = max(1, len(edges) / 4)
+        self.band_height = (self.max_lat - self.min_lat) / self.band_count or 1.
+        self.bands = [[] for _ in range(self.band_count)]
+        for edge in edges:
+            low = self._band(min(edge[0][1], edge[1][1]))
+            high = self._band(max(edge[0][1], edge[1][1]))
+            for band in range(low, high + 1):
+                self.bands[band].append(edge)
+
+    def _band(self, lat):
+        return min(self.band_count - 1,
+                   max(0, int((lat - self.min_lat) / self.band_height)))
+
+    def get_bounds(self):
+        return self.min_lon, self.min_lat, self.max_lon, self.max_lat
+
+    def contains(self, lon, lat):
+        if (lon < self.min_lon or lon > self.max_lon
+            or lat < self.min_lat or lat > self.max_lat):
+            return False
+        if self.is_box:
+            return True
+        inside = False
+        for (x1, y1), (x2, y2) in self.bands[self._band(lat)]:
+            if (y1 > lat) != (y2 > lat):
+                if lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+                    inside = not inside
+        return inside
+
+
+def parse_bbox(text):
+    '''
+    Reads "min_lon,min_lat,max_lon,max_lat"
+    '''
+    try:
+        min_lon, min_lat, max_lon, max_lat = [float(x) for x in text.split(',')]
+    except ValueError:
+        raise Exception("bounding box should be min_lon,min_lat,max_lon,max_lat; got '%s'" % (text,))
+    if min_lon >= max_lon or min_lat >= max_lat:
+        raise Exception("empty bounding box '%s'" % (text,))
+    return ClipArea([[(min_lon, min_lat), (max_lon, min_lat),
+                      (max_lon, max_lat), (min_lon, max_lat)]], is_box=True)
+
+
+def _geojson_rings(geometry):
+    _type = geometry.get('type')
+    if _type == 'FeatureCollection':
+        return [ring for feature in geometry['features']
+                for ring in _geojson_rings(feature)]
+    if _type == 'Feature':
+        return _geojson_rings(geometry['geometry'])
+    if _type == 'GeometryCollection':
+        return [ring for part in geometry['geometries']
+                for ring in _geojson_rings(part)]
+    if _type == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif _type == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        raise Exception("unsupported GeoJSON geometry '%s' for clipping" % (_type,))
+    return [[(float(x[0]), float(x[1])) for x in ring]
+            for polygon in polygons for ring in polygon]
+
+
+def _wkt_rings(text):
+    kind = text.lstrip().split('(')[0].strip().upper()
+    if kind not in ('POLYGON', 'MULTIPOLYGON'):
+        raise Exception("unsupported WKT geometry '%s' for clipping" % (kind,))
+    rings = []
+    for ring_text in WKT_RING_MATCHER.findall(text):
+        rings.append([tuple(float(x) for x in point.split()[:2])
+                      for point in ring_text.split(',')])
+    return rings
+
+
+def load_polygon(source):
+    '''
+    Reads a GeoJSON or WKT polygon, either inline or from a file
+    '''
+    if exists(source):
+        with open(source, 'r') as f:
+            source = f.read()
+    text = source.strip()
+    if text.upper().startswith('SRID='):
+        text = text.split(';', 1)[1]
+    if text.startswith('{'):
+        return ClipArea(_geojson_rings(json.loads(text)))
+    return ClipArea(_wkt_rings(text))
+
+
+def load_clip_area(bbox=None, polygon=None):
+    if bbox is not None and polygon is not None:
+        raise Exception("use either a bounding box or a polygon to clip")
+    if bbox is not None:
+        return parse_bbox(bbox)
+    if polygon is not None:
+        return load_polygon(polygon)
+    return None
+
+
+def clip_way_nodes(nodes, inside_nodes, policy):
+    '''
+    Node ids of the way that survive the clip, with CLIP_GAP between the
+    inside runs of a clipped way, or None if the way is out of the area
+    '''
+    if policy == CLIP_POLICY_ANY:
+        return nodes if any(x in inside_nodes for x in nodes) else None
+    if policy == CLIP_POLICY_ALL:
+        return nodes if all(x in inside_nodes for x in nodes) else None
+    if policy != CLIP_POLICY_CLIP:
+        raise Exception("unknown clip policy '%s'" % (policy,))
+    clipped = []
+    run = []
+    for node in nodes + [CLIP_GAP]:
+        if node is not CLIP_GAP and node in inside_nodes:
+            run.append(node)
+            continue
+        if len(run) > 1:
+            if clipped:
+                clipped.append(CLIP_GAP)
+            clipped.extend(run)
+        run = []
+    return clipped if clipped else None
@@ -0,0 +1,93 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+'''
+Strongly connected components of the routing graph, used to find islands
+(private driveways, fragments cut at the extract border) that cannot be
+routed to and from the rest of the network.
+'''
+
+
+def strongly_connected_components(successors):
+    '''
+    Iterative Tarjan over a dict vertex -> list of successor vertices; every
+    successor must be a key. Returns a dict vertex -> component index and the
+    list of component sizes.
+    '''
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    component_of = {}
+    sizes = []
+    next_index = 0
+    for root in successors:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack.add(root)
+        # (vertex, iterator over its successors) replaces the recursion
+        work = [(root, iter(successors[root]))]
+        while work:
+            vertex, children = work[-1]
+            descended = False
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = next_index
+                    next_index += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors[child])))
+                    descended = True
+                    break
+                elif child in on_stack and index[child] < lowlink[vertex]:
+                    lowlink[vertex] = index[child]
+            if descended:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[vertex] < lowlink[parent]:
+                    lowlink[parent] = lowlink[vertex]
+            if lowlink[vertex] == index[vertex]:
+                component = len(sizes)
+                size = 0
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component_of[member] = component
+                    size += 1
+                    if member == vertex:
+                        break
+                sizes.append(size)
+    return component_of, sizes
+
+
+def size_histogram(sizes):
+    '''
+    Number of components per order of magnitude of their size: 1, 2-9, 10-99...
+    '''
+    histogram = {}
+    for size in sizes:
+        low = 1
+        while low * 10 <= size:
+            low *= 10
+        label = '1' if size == 1 else '%s-%s' % (max(low, 2), low * 10 - 1)
+        histogram[label] = histogram.get(label, 0) + 1
+    return histogram
@@ -15,19 +15,32 @@
     along with this program.  If not, see <http://www.gnu.org/licenses/>.
 '''
 import psycopg2.extensions
-from psycopg2.extras import DictCursor
+from psycopg2.extras import DictCursor, Json, register_hstore
 from util.geom import TextGeometry, wkt_point
+from util.propertydictionary import PropertyDictionary
+from util.graphexport import export_csr_graph
+from util.instrumentation import PhaseReport
 import logging
+import time
+
+PROPERTIES_EAV = 'eav'
+PROPERTIES_JSONB = 'jsonb'
+PROPERTIES_HSTORE = 'hstore'
+PROPERTIES_DICTIONARY = 'dictionary'
+PROPERTIES_MODES = (PROPERTIES_EAV, PROPERTIES_JSONB, PROPERTIES_HSTORE,
+                    PROPERTIES_DICTIONARY)
+DEFAULT_MAX_PENDING_ROWS = 1000000
 
 psycopg2.extensions.register_type(psycopg2.extensions.UNICODE)
 psycopg2.extensions.register_type(psycopg2.extensions.UNICODEARRAY)
 
 
 class CachedWriter(object):
-    def __init__(self, connection, statement, cache_entries=200):
+    def __init__(self, connection, statement, cache_entries=200, executor=None):
         self.connection = connection
         self.statement = statement
         self.cache_entries = cache_entries
+        self.executor = executor
         self.rows = [] 
         psycopg2.extensions.register_adapter(TextGeometry,
                                              TextGeometry.adapter)
@@ -57,9 +70,12 @@ class CachedWriter(object):
         cursor.close()
         
     def _execute_insert(self):
-        cursor = self.connection.cursor()
         records_list_template = ','.join(['%s'] * len(self.rows))
         insert_query = self.statement.format(records_list_template)        
+        if self.executor is not None:
+            self.executor(insert_query, self.rows)
+            return
+        cursor = self.connection.cursor()
         cursor.execute(insert_query, self.rows)
         cursor.close()
         
@@ -80,9 +96,25 @@ class DbWriter(object):
     '''
 
 
-    def __init__(self, connection_properties, table_prefix=""):        
+    def __init__(self, connection_properties, table_prefix="",
+                 properties_mode=PROPERTIES_EAV, properties_gin_index=False,
+                 property_dictionary=None, commit_batches=None,
+                 commit_per_table=False, max_retries=3,
+                 max_pending_rows=DEFAULT_MAX_PENDING_ROWS, report=None,
+                 profiles=(), turn_costs=False, component_flags=False):
 
+        if properties_mode not in PROPERTIES_MODES:
+            raise Exception("unknown way properties mode '%s'" % (properties_mode,))
+        if commit_batches is not None and commit_batches < 1:
+            raise Exception("commit_batches should be at least 1; got %s" % (commit_batches,))
         self.table_prefix = table_prefix
+        self.properties_mode = properties_mode
+        self.properties_gin_index = properties_gin_index
+        if property_dictionary is None:
+            property_dictionary = PropertyDictionary()
+        self.property_dictionary = property_dictionary
+        self.written_property_keys = 0
+        self.written_property_values = 0
         self.connection_properties = connection_properties
         self.connection_properties['cursor_factory'] = DictCursor
         self.connection = None
@@ -91,13 +123,126 @@ class DbWriter(object):
         self.nodes_cached_writer = None
         self.restrictions_cached_writer = None
         self.properties_cached_writer = None
+        self.property_keys_cached_writer = None
+        self.property_values_cached_writer = None
+        # batches executed since the last commit, replayed if the transaction fails
+        self.transactional = commit_batches is not None or commit_per_table
+        self.commit_batches = commit_batches
+        self.commit_per_table = commit_per_table
+        self.max_retries = max_retries
+        self.pending_batches = []
+        # batches of the open transaction, counted apart from the replay
+        # buffer which is dropped past max_pending_rows
+        self.uncommitted_batches = 0
+        # past this many rows (a whole table with commit_per_table) the batches
+        # are no longer kept; a failure then aborts instead of replaying
+        self.max_pending_rows = max_pending_rows
+        self.pending_rows = 0
+        self.replayable = True
+        if report is None:
+            report = PhaseReport()
+        self.report = report
+        self.rows_written = 0
+        # extra routing profiles, each with its own speed and cost columns
+        self.profiles = list(profiles)
+        self.turn_costs = turn_costs
+        self.turn_costs_cached_writer = None
+        # component_id/island columns filled by the component analysis
+        self.component_flags = component_flags
 
     def _get_connection(self):
         if self.connection is None:
             self.connection = psycopg2.connect(**self.connection_properties)
-            self.connection.autocommit = True
+            self.connection.autocommit = not self.transactional
+            if self.properties_mode == PROPERTIES_HSTORE:
+                # a reconnected session needs the adapter again before a replay
+                cursor = self.connection.cursor()
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS hstore;")
+                cursor.close()
+                if self.transactional:
+                    self.connection.commit()
+                register_hstore(self.connection)
+            if self.transactional:
+                cursor = self.connection.cursor()
+                cursor.execute("SET synchronous_commit TO off;")
+                cursor.close()
+                self.connection.commit()
         return self.connection      
 
+    def _create_cached_writer(self, statement):
+        return CachedWriter(self._get_connection(), statement,
+                            executor=self._execute_batch)
+
+    def _execute_batch(self, statement, rows):
+        self.rows_written += len(rows)
+        if not self.transactional:
+            cursor = self._get_connection().cursor()
+            cursor.execute(statement, rows)
+            cursor.close()
+            return
+        
+        self.uncommitted_batches += 1
+        if self.replayable:
+            self.pending_rows += len(rows)
+            if self.pending_rows > self.max_pending_rows:
+                logging.warn(("more than %s rows pending in one transaction; " + 
+                              "a failure will not be replayed until the next commit")
+                             % (self.max_pending_rows,))
+                self.replayable = False
+                self.pending_batches = []
+            else:
+                self.pending_batches.append((statement, list(rows)))
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute(statement, rows)
+            cursor.close()
+        except psycopg2.Error as e:
+            if not self.replayable:
+                logging.error("batch insert failed and the transaction is too large to replay")
+                raise
+            logging.warn("batch insert failed, replaying %s pending batches: %s"
+                         % (len(self.pending_batches), e))
+            self._replay_pending_batches()
+        if (not self.commit_per_table
+            and self.uncommitted_batches >= self.commit_batches):
+            self._commit()
+
+    def _replay_pending_batches(self):
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.connection is not None and not self.connection.closed:
+                self.connection.rollback()
+            else:
+                self.connection = None
+            try:
+                cursor = self._get_connection().cursor()
+                for statement, rows in self.pending_batches:
+                    cursor.execute(statement, rows)
+                cursor.close()
+                return
+            except psycopg2.Error as e:
+                if attempt >= self.max_retries:
+                    logging.error("unable to replay pending batches after %s attempts"
+                                  % (attempt,))
+                    if self.connection is not None and not self.connection.closed:
+                        self.connection.rollback()
+                    self.pending_batches = []
+                    self.pending_rows = 0
+                    self.uncommitted_batches = 0
+                    raise
+                logging.warn("replay attempt %s failed: %s" % (attempt, e))
+                if self.connection is not None and self.connection.closed:
+                    self.connection = None
+
+    def _commit(self):
+        if self.transactional and self.connection is not None:
+            self.connection.commit()
+        self.pending_batches = []
+        self.pending_rows = 0
+        self.uncommitted_batches = 0
+        self.replayable = True
+
     def _create_ways_table(self):
         connection = self._get_connection()
         cursor = connection.cursor()
@@ -112,6 +257,11 @@ class DbWriter(object):
                             ' osm_id bigint, segment_id integer, geom geometry(LineString,4326),' + 
                             ' oneway character varying(2), projected_length double precision,' + 
                             ' f_cost double precision, r_cost double precision,' + 
+                            ''.join(' {0}_maxspeed_forward double precision, {0}_maxspeed_backward double precision,'.format(name) + 
+                                    ' {0}_f_cost double precision, {0}_r_cost double precision,'.format(name)
+                                    for name in self.profiles) + 
+                            (' component_id integer, island boolean,'
+                             if self.component_flags else '') + 
                             ' CONSTRAINT {0}ways_pkey PRIMARY KEY (gid))' + 
                             ' WITH (OIDS=FALSE);').format(self.table_prefix)
         
@@ -141,6 +291,12 @@ class DbWriter(object):
         cursor.close()
 
     def _create_way_properties_table(self):
+        if self.properties_mode == PROPERTIES_DICTIONARY:
+            self._create_encoded_way_properties_tables()
+            return
+        if self.properties_mode != PROPERTIES_EAV:
+            self._create_way_tags_table()
+            return
         connection = self._get_connection()
         cursor = connection.cursor()
         drop_statement = ('DROP TABLE IF EXISTS {0}way_properties CASCADE;').format(self.table_prefix)
@@ -154,6 +310,54 @@ class DbWriter(object):
         cursor.execute(create_statement)
         cursor.execute('CREATE INDEX IF NOT EXISTS {0}way_fk_idx ON {0}way_properties USING btree(way_id);'.format(self.table_prefix)) 
         cursor.close()
+
+    def _create_encoded_way_properties_tables(self):
+        # keys and values are stored once in lookup tables, the fact table only holds ids
+        connection = self._get_connection()
+        cursor = connection.cursor()
+        for table, column in (('property_keys', 'key'), ('property_values', 'value')):
+            drop_statement = ('DROP TABLE IF EXISTS {0}{1} CASCADE;').format(self.table_prefix, table)
+            cursor.execute(drop_statement)
+            create_statement = ('CREATE TABLE {0}{1} ' + 
+                                '(id integer, {2} character varying, ' + 
+                                ' CONSTRAINT {0}{1}_pkey PRIMARY KEY (id))' + 
+                                ' WITH (OIDS=FALSE);').format(self.table_prefix,
+                                                              table, column)
+            cursor.execute(create_statement)
+        drop_statement = ('DROP TABLE IF EXISTS {0}way_properties CASCADE;').format(self.table_prefix)
+        cursor.execute(drop_statement)
+        create_statement = ('CREATE TABLE {0}way_properties ' + 
+                            '(gid serial, way_id bigint, ' + 
+                            ' key_id integer, value_id integer, ' + 
+                            ' CONSTRAINT {0}way_properties_pkey PRIMARY KEY (gid))' + 
+                            ' WITH (OIDS=FALSE);').format(self.table_prefix)
+        cursor.execute(create_statement)
+        cursor.execute('CREATE INDEX IF NOT EXISTS {0}way_fk_idx ON {0}way_properties USING btree(way_id);'.format(self.table_prefix))
+        cursor.execute(('CREATE OR REPLACE VIEW {0}way_properties_decoded AS ' + 
+                        'SELECT p.gid, p.way_id, k.key, v.value ' + 
+                        'FROM {0}way_properties AS p ' + 
+                        'JOIN {0}property_keys AS k ON p.key_id=k.id ' + 
+                        'JOIN {0}property_values AS v ON p.value_id=v.id;').format(self.table_prefix))
+        cursor.close()
+
+    def _create_way_tags_table(self):
+        # one row per way, all useful tags packed in a single jsonb/hstore column
+        connection = self._get_connection()
+        cursor = connection.cursor()
+        if self.properties_mode == PROPERTIES_HSTORE:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS hstore;")
+        drop_statement = ('DROP TABLE IF EXISTS {0}way_properties CASCADE;').format(self.table_prefix)
+        cursor.execute(drop_statement)
+        create_statement = ('CREATE TABLE {0}way_properties ' + 
+                            '(way_id bigint, tags {1}, ' + 
+                            ' CONSTRAINT {0}way_properties_pkey PRIMARY KEY (way_id))' + 
+                            ' WITH (OIDS=FALSE);').format(self.table_prefix,
+                                                          self.properties_mode)
+        
+        cursor.execute(create_statement)
+        if self.properties_gin_index:
+            cursor.execute('CREATE INDEX IF NOT EXISTS {0}way_tags_idx ON {0}way_properties USING gin(tags);'.format(self.table_prefix))
+        cursor.close()
         
     def _create_restrictions_table(self):
         connection = self._get_connection()
@@ -180,6 +384,26 @@ class DbWriter(object):
         cursor.execute('CREATE INDEX IF NOT EXISTS {0}restr_geom_idx ON {0}restrictions USING gist(geom);'.format(self.table_prefix))
         cursor.close()
         
+    def _create_turn_costs_table(self):
+        connection = self._get_connection()
+        cursor = connection.cursor()
+        drop_statement = ('DROP TABLE IF EXISTS {0}turn_costs CASCADE;').format(self.table_prefix)
+        cursor.execute(drop_statement)
+        create_statement = ('CREATE TABLE {0}turn_costs ' + 
+                            '(from_gid integer NOT NULL,' + 
+                            ' to_gid integer NOT NULL,' + 
+                            ' via_node_id bigint,' + 
+                            ' angle real,' + 
+                            ' cost real)' + 
+                            'WITH ( OIDS=FALSE);').format(self.table_prefix)
+        cursor.execute(create_statement)
+        cursor.execute('CREATE INDEX IF NOT EXISTS {0}turn_costs_idx ON {0}turn_costs USING btree(from_gid, to_gid);'.format(self.table_prefix))
+        # restrictions_sql layout of pgr_trsp: SELECT to_cost, target_id, via_path FROM ...
+        cursor.execute(('CREATE VIEW {0}turn_costs_trsp AS ' + 
+                        'SELECT cost::double precision AS to_cost, to_gid AS target_id, ' + 
+                        'from_gid::text AS via_path FROM {0}turn_costs;').format(self.table_prefix))
+        cursor.close()
+        
     def init_db(self, clean=True):
         if clean:
             self._clean_db()
@@ -188,24 +412,110 @@ class DbWriter(object):
         self._create_nodes_table()
         self._create_way_properties_table()
         self._create_restrictions_table()
+        if self.turn_costs:
+            self._create_turn_costs_table()
+        self._commit()
         
+    def _topology_step(self, cursor, name, statement, count_rows=True):
+        phase = self.report.begin('topology: ' + name)
+        cursor.execute(statement)
+        self.report.end(phase, rows=cursor.rowcount if count_rows else None)
+
     def rebuild_topology(self, epsg_projection='3844'):
         self.flush_caches()
         connection = self._get_connection()
         cursor = connection.cursor()
-        cursor.execute("SELECT pgr_createTopology('{0}ways', 0.00001, 'geom', 'gid');".format(self.table_prefix))
-        cursor.execute(("UPDATE {0}ways as w SET x1=n.lon, y1=n.lat " + 
-                       "FROM {0}nodes as n WHERE w.from_osm_id=n.osm_id;").format(self.table_prefix))
-        cursor.execute(("UPDATE {0}ways as w SET x2=n.lon, y2=n.lat " + 
-                       "FROM {0}nodes as n WHERE w.to_osm_id=n.osm_id;").format(self.table_prefix))
-        cursor.execute(("UPDATE {0}ways " + 
-                       "SET projected_length=ST_Length(ST_Transform(geom,{1}));").format(self.table_prefix, epsg_projection))
-        cursor.execute(("UPDATE {0}ways " + 
-                       "SET f_cost=(CASE WHEN oneway='TF' THEN -1 ELSE (projected_length*3.6)/maxspeed_forward END), " + 
-                       "r_cost=(CASE WHEN oneway='FT' THEN -1 ELSE (projected_length*3.6)/maxspeed_backward END)" + 
-                       ";").format(self.table_prefix))
+        self._topology_step(cursor, 'create topology',
+                            "SELECT pgr_createTopology('{0}ways', 0.00001, 'geom', 'gid');".format(self.table_prefix),
+                            count_rows=False)
+        self._topology_step(cursor, 'source coordinates',
+                            ("UPDATE {0}ways as w SET x1=n.lon, y1=n.lat " + 
+                             "FROM {0}nodes as n WHERE w.from_osm_id=n.osm_id;").format(self.table_prefix))
+        self._topology_step(cursor, 'target coordinates',
+                            ("UPDATE {0}ways as w SET x2=n.lon, y2=n.lat " + 
+                             "FROM {0}nodes as n WHERE w.to_osm_id=n.osm_id;").format(self.table_prefix))
+        self._topology_step(cursor, 'projected length',
+                            ("UPDATE {0}ways " + 
+                             "SET projected_length=ST_Length(ST_Transform(geom,{1}));").format(self.table_prefix, epsg_projection))
+        self._topology_step(cursor, 'costs',
+                            ("UPDATE {0}ways " + 
+                             "SET f_cost=(CASE WHEN oneway='TF' THEN -1 ELSE (projected_length*3.6)/maxspeed_forward END), " + 
+                             "r_cost=(CASE WHEN oneway='FT' THEN -1 ELSE (projected_length*3.6)/maxspeed_backward END)" + 
+                             ";").format(self.table_prefix))
+        for name in self.profiles:
+            self._topology_step(cursor, name + ' costs',
+                                ("UPDATE {0}ways " + 
+                                 "SET {1}_f_cost=(CASE WHEN {1}_maxspeed_forward <= 0 THEN -1 ELSE (projected_length*3.6)/{1}_maxspeed_forward END), " + 
+                                 "{1}_r_cost=(CASE WHEN {1}_maxspeed_backward <= 0 THEN -1 ELSE (projected_length*3.6)/{1}_maxspeed_backward END)" + 
+                                 ";").format(self.table_prefix, name))
         cursor.close()
+        phase = self.report.begin('topology: commit')
+        self._commit()
+        self.report.end(phase)
         
+    def _get_loaded_tables(self):
+        tables = ['ways', 'ways_vertices_pgr', 'nodes', 'way_properties', 'restrictions']
+        if self.turn_costs:
+            tables.append('turn_costs')
+        if self.properties_mode == PROPERTIES_DICTIONARY:
+            tables.extend(['property_keys', 'property_values'])
+        return [self.table_prefix + table for table in tables]
+
+    def _timed_execute(self, cursor, step, table, statement, report):
+        start = time.time()
+        cursor.execute(statement)
+        duration = time.time() - start
+        logging.info("%s %s took %.2fs" % (step, table, duration))
+        report.append({'step': step, 'table': table, 'duration': duration})
+
+    def run_maintenance(self, vacuum=True, cluster=False, prewarm=False):
+        '''
+        Post-load maintenance: optionally CLUSTER on the geometry indexes,
+        VACUUM ANALYZE every loaded table and load them into shared buffers
+        with pg_prewarm. Returns the timing of every step.
+        '''
+        self.flush_caches()
+        report = []
+        connection = self._get_connection()
+        # VACUUM and CLUSTER cannot run inside a transaction block
+        connection.autocommit = True
+        cursor = connection.cursor()
+        if cluster:
+            for table, index in (('ways', 'ways_geom_idx'),
+                                 ('restrictions', 'restr_geom_idx')):
+                self._timed_execute(cursor, 'CLUSTER', self.table_prefix + table,
+                                    'CLUSTER {0}{1} USING {0}{2};'.format(self.table_prefix,
+                                                                          table, index),
+                                    report)
+        if vacuum or cluster:
+            for table in self._get_loaded_tables():
+                self._timed_execute(cursor, 'VACUUM ANALYZE', table,
+                                    'VACUUM ANALYZE {0};'.format(table),
+                                    report)
+        if prewarm:
+            cursor.execute("SELECT count(*) FROM pg_available_extensions WHERE name='pg_prewarm';")
+            if cursor.fetchone()[0] > 0:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_prewarm;")
+                for table in self._get_loaded_tables():
+                    self._timed_execute(cursor, 'PREWARM', table,
+                                        "SELECT pg_prewarm('{0}');".format(table),
+                                        report)
+            else:
+                logging.warn("pg_prewarm extension not available; skipping prewarm")
+        cursor.close()
+        connection.autocommit = not self.transactional
+        return report
+
+    def export_graph(self, path):
+        self.flush_caches()
+        start = time.time()
+        connection = self._get_connection()
+        counts = export_csr_graph(connection, path, self.table_prefix)
+        self._commit()
+        logging.info("exported %s vertices, %s arcs and %s restrictions to %s in %.2fs"
+                     % (counts + (path, time.time() - start)))
+        return counts
+
     def close(self):
         self.flush_caches()
         connection = self._get_connection()
@@ -228,27 +538,33 @@ class DbWriter(object):
         
     def insert_way(self, segment, nodes):
         if self.ways_cached_writer is None:
-            connection = self._get_connection()
-            self.ways_cached_writer = CachedWriter(connection,
+            self.ways_cached_writer = self._create_cached_writer(
                           (u'INSERT INTO {0}ways ' + 
                            ' (gid, from_osm_id, to_osm_id, ' + 
-                           '  maxspeed_forward, maxspeed_backward, oneway, osm_id, segment_id, geom) ' + 
-                           ' VALUES {{0}};').format(self.table_prefix))
+                           '  maxspeed_forward, maxspeed_backward, oneway, osm_id, segment_id, geom' + 
+                           ''.join(', {0}_maxspeed_forward, {0}_maxspeed_backward'.format(name)
+                                   for name in self.profiles) + 
+                           (', component_id, island' if self.component_flags else '') + 
+                           ') VALUES {{0}};').format(self.table_prefix))
         # if segment.parent.max_speed<10:
         #   print segment.parent.get_id(),'computed speed',segment.parent.max_speed
         writable, geometry = segment.get_wkt(nodes)
         if writable:
-            self.ways_cached_writer.insert_row(
-                                             (segment.get_db_id(),
-                                              segment.get_head(),
-                                              segment.get_tail(),
-                                              segment.parent.f_speed,
-                                              segment.parent.b_speed,
-                                              segment.parent.oneway,
-                                              segment.parent.get_id(),
-                                              segment.idx,
-                                              TextGeometry(geometry)
-                                              ))
+            row = (segment.get_db_id(),
+                   segment.get_head(),
+                   segment.get_tail(),
+                   segment.parent.f_speed,
+                   segment.parent.b_speed,
+                   segment.parent.oneway,
+                   segment.parent.get_id(),
+                   segment.idx,
+                   TextGeometry(geometry)
+                   )
+            for name in self.profiles:
+                row += segment.parent.profile_speeds.get(name, (-1, -1))
+            if self.component_flags:
+                row += (segment.component_id, segment.island)
+            self.ways_cached_writer.insert_row(row)
         else:
             logging.error(("error writing segment %s of way %s: "+
                            "unable to find nodes %s") % (segment.idx, 
@@ -257,8 +573,7 @@ class DbWriter(object):
         
     def insert_node(self, node, geometry):
         if self.nodes_cached_writer is None:
-            connection = self._get_connection()
-            self.nodes_cached_writer = CachedWriter(connection,
+            self.nodes_cached_writer = self._create_cached_writer(
                             (u'INSERT INTO {0}nodes ' + 
                            ' (lon, lat, osm_id) ' + 
                            ' VALUES {{0}};').format(self.table_prefix))
@@ -266,8 +581,7 @@ class DbWriter(object):
         
     def insert_restriction(self, proper_restriction, nodes):
         if self.restrictions_cached_writer is None:
-            connection = self._get_connection()
-            self.restrictions_cached_writer = CachedWriter(connection,
+            self.restrictions_cached_writer = self._create_cached_writer(
                             (u'INSERT INTO {0}restrictions ' + 
                            ' (from_way, to_way, via_ways, osm_id,' + 
                            ' cost, via_node_id, geom) '
@@ -285,10 +599,24 @@ class DbWriter(object):
                                           )
                                                    )
             
+    def insert_turn_cost(self, from_gid, to_gid, via_node_id, angle, cost):
+        if self.turn_costs_cached_writer is None:
+            self.turn_costs_cached_writer = self._create_cached_writer(
+                            (u'INSERT INTO {0}turn_costs ' + 
+                           ' (from_gid, to_gid, via_node_id, angle, cost) '
+                           ' VALUES {{0}};').format(self.table_prefix))
+        self.turn_costs_cached_writer.insert_row((from_gid, to_gid, via_node_id,
+                                                  angle, cost))
+            
     def insert_way_properties(self, way):
+        if self.properties_mode == PROPERTIES_DICTIONARY:
+            self.insert_encoded_way_properties(way)
+            return
+        if self.properties_mode != PROPERTIES_EAV:
+            self.insert_way_tags(way)
+            return
         if self.properties_cached_writer is None:
-            connection = self._get_connection()
-            self.properties_cached_writer = CachedWriter(connection,
+            self.properties_cached_writer = self._create_cached_writer(
                             (u'INSERT INTO {0}way_properties ' + 
                            ' (way_id, key, value) '
                            ' VALUES {{0}};').format(self.table_prefix))
@@ -297,6 +625,57 @@ class DbWriter(object):
             self.properties_cached_writer.insert_row((way.get_id(),
                                                        key,
                                                        vals))
+
+    def insert_encoded_way_properties(self, way):
+        if self.properties_cached_writer is None:
+            self.properties_cached_writer = self._create_cached_writer(
+                            (u'INSERT INTO {0}way_properties ' + 
+                           ' (way_id, key_id, value_id) '
+                           ' VALUES {{0}};').format(self.table_prefix))
+                           
+        for key, vals in way.get_attributes().iteritems():
+            key_id, value_id = self.property_dictionary.encode(key, vals)
+            self.properties_cached_writer.insert_row((way.get_id(),
+                                                       key_id,
+                                                       value_id))
+
+    def _flush_property_dictionary(self):
+        if self.properties_mode != PROPERTIES_DICTIONARY:
+            return
+        if self.property_keys_cached_writer is None:
+            self.property_keys_cached_writer = self._create_cached_writer(
+                            (u'INSERT INTO {0}property_keys ' + 
+                           ' (id, key) '
+                           ' VALUES {{0}};').format(self.table_prefix))
+            self.property_values_cached_writer = self._create_cached_writer(
+                            (u'INSERT INTO {0}property_values ' + 
+                           ' (id, value) '
+                           ' VALUES {{0}};').format(self.table_prefix))
+        keys = self.property_dictionary.keys
+        for entry in keys.get_entries(self.written_property_keys):
+            self.property_keys_cached_writer.insert_row(entry)
+        self.written_property_keys = len(keys)
+        values = self.property_dictionary.values
+        for entry in values.get_entries(self.written_property_values):
+            self.property_values_cached_writer.insert_row(entry)
+        self.written_property_values = len(values)
+        self.property_keys_cached_writer.flush()
+        self.property_values_cached_writer.flush()
+
+    def insert_way_tags(self, way):
+        if self.properties_cached_writer is None:
+            self.properties_cached_writer = self._create_cached_writer(
+                            (u'INSERT INTO {0}way_properties ' + 
+                           ' (way_id, tags) '
+                           ' VALUES {{0}};').format(self.table_prefix))
+        attributes = way.get_attributes()
+        if len(attributes) == 0:
+            return
+        if self.properties_mode == PROPERTIES_JSONB:
+            tags = Json(attributes)
+        else:
+            tags = attributes
+        self.properties_cached_writer.insert_row((way.get_id(), tags))
             
     def flush_caches(self):
         if self.ways_cached_writer is not None:
@@ -305,8 +684,12 @@ class DbWriter(object):
             self.nodes_cached_writer.flush()
         if self.properties_cached_writer is not None:
             self.properties_cached_writer.flush()
+        self._flush_property_dictionary()
         if self.restrictions_cached_writer is not None:
             self.restrictions_cached_writer.flush()
+        if self.turn_costs_cached_writer is not None:
+            self.turn_costs_cached_writer.flush()
+        self._commit()
                              
     def set_node_dictionary(self, nodes):
         self.nodes = nodes
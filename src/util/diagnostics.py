@@ -0,0 +1,81 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import logging
+
+from itertools import islice
+
+'''
+Aggregated load diagnostics: per-category counters and a bounded sample of the
+offending element ids, logged once at the end of a load instead of one log
+line per element. Per-element messages are only formatted in verbose mode.
+'''
+
+DEFAULT_SAMPLE_SIZE = 10
+
+
+class Diagnostics(object):
+    def __init__(self, sample_size=DEFAULT_SAMPLE_SIZE, verbose=False):
+        self.sample_size = sample_size
+        self.verbose = verbose
+        self.counts = {}
+        self.samples = {}
+
+    def record(self, category, element_id, *details):
+        count = self.counts.get(category, 0) + 1
+        self.counts[category] = count
+        if count <= self.sample_size:
+            self.samples.setdefault(category, []).append(element_id)
+        if self.verbose:
+            logging.warn("%s %s %s", category, element_id,
+                         ' '.join(str(detail) for detail in details))
+
+    def record_many(self, category, element_ids):
+        '''
+        Counts every id of a collection; only the sample is kept
+        '''
+        element_ids = list(element_ids)
+        if len(element_ids) == 0:
+            return
+        count = self.counts.get(category, 0)
+        self.counts[category] = count + len(element_ids)
+        sample = self.samples.setdefault(category, [])
+        sample.extend(islice(element_ids, max(0, self.sample_size - len(sample))))
+        if self.verbose:
+            logging.warn("%s %s", category, element_ids)
+
+    def merge(self, other):
+        '''
+        Adds the counts and samples collected by another instance, e.g. in a
+        worker process
+        '''
+        for category, count in other.counts.iteritems():
+            self.counts[category] = self.counts.get(category, 0) + count
+            sample = self.samples.setdefault(category, [])
+            sample.extend(other.samples.get(category, [])[:max(0, self.sample_size - len(sample))])
+
+    def get_count(self, category):
+        return self.counts.get(category, 0)
+
+    def as_dict(self):
+        return dict((category, {'count': count,
+                                'sample': self.samples.get(category, [])})
+                    for category, count in self.counts.iteritems())
+
+    def log_summary(self):
+        for category in sorted(self.counts.keys()):
+            logging.warn("%s: %s (e.g. %s)" % (category, self.counts[category],
+                                               ', '.join(str(x) for x in self.samples.get(category, []))))
@@ -16,7 +16,7 @@
 '''
 import pyproj
 
-from math import atan2, pi
+from math import atan2, cos, pi, radians
 from psycopg2._psycopg import AsIs
 
 PROJ_WGS_84 = pyproj.Proj(init='EPSG:4326')
@@ -26,6 +26,8 @@ COORDINATE_PRECISION = 1000000.0
 LON = 1
 LAT = 0
 
+CURVE_ORDER = 16
+
 class TextGeometry(object):
     def __init__(self, wkt_string, epsg=4326):
         self.string_rep = wkt_string
@@ -57,3 +59,49 @@ def get_angle_between_points(point1, point2, point3):
     while angle < 0:
         angle += 360.
     return angle
+
+def turn_angle(point_in, via, point_out):
+    '''
+    Turn angle in degrees when arriving at via from point_in and leaving
+    towards point_out, all (lon, lat): 0 is straight on, positive turns right,
+    negative left, +-180 a u-turn. Uses a local equirectangular approximation,
+    accurate enough for the short vectors around a junction.
+    '''
+    scale = cos(radians(via[1]))
+    in_x, in_y = (via[0] - point_in[0]) * scale, via[1] - point_in[1]
+    out_x, out_y = (point_out[0] - via[0]) * scale, point_out[1] - via[1]
+    cross = in_x * out_y - in_y * out_x
+    dot = in_x * out_x + in_y * out_y
+    return -atan2(cross, dot) * 180. / pi
+
+def _quantize(longitude, latitude, order):
+    side = (1 << order) - 1
+    x = int((longitude + 180.) / 360. * side)
+    y = int((latitude + 90.) / 180. * side)
+    return min(max(x, 0), side), min(max(y, 0), side)
+
+def zorder_key(longitude, latitude, order=CURVE_ORDER):
+    x, y = _quantize(longitude, latitude, order)
+    key = 0
+    for bit in range(order):
+        key |= ((x >> bit) & 1) << (2 * bit)
+        key |= ((y >> bit) & 1) << (2 * bit + 1)
+    return key
+
+def hilbert_key(longitude, latitude, order=CURVE_ORDER):
+    x, y = _quantize(longitude, latitude, order)
+    n = 1 << order
+    key = 0
+    s = n >> 1
+    while s > 0:
+        rx = 1 if (x & s) > 0 else 0
+        ry = 1 if (y & s) > 0 else 0
+        key += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant so the curve stays continuous
+        if ry == 0:
+            if rx == 1:
+                x = n - 1 - x
+                y = n - 1 - y
+            x, y = y, x
+        s >>= 1
+    return key
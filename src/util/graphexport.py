@@ -0,0 +1,115 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import struct
+import sys
+
+from array import array
+
+'''
+Compact CSR (compressed sparse row) export of the loaded routing graph, meant
+to be memory mapped by drivetime/engine.py. Little endian layout:
+
+    header   8s magic, I vertex count, I arc count, I restriction count,
+             12 bytes padding (32 bytes in total)
+    float64  arc costs, vertex longitudes, vertex latitudes, restriction costs
+    int32    arc offsets (vertex count + 1), arc targets, arc edge gids,
+             vertex ids, restriction from edge gids, restriction to edge gids
+
+Arcs are directed: every way yields source->target with f_cost and
+target->source with r_cost, unless the cost is negative (oneway).
+'''
+
+GRAPH_MAGIC = 'PGRCSR01'
+HEADER_FORMAT = '<8sIII12x'
+
+VERTICES_SQL = 'SELECT id, ST_X(the_geom), ST_Y(the_geom) FROM {0}ways_vertices_pgr ORDER BY id;'
+EDGES_SQL = ('SELECT gid, source, target, f_cost, r_cost FROM {0}ways ' + 
+             'WHERE source IS NOT NULL AND target IS NOT NULL;')
+RESTRICTIONS_SQL = 'SELECT from_way, to_way, cost FROM {0}restrictions;'
+# cost of a restriction forbidding the turn, as written by the loader and
+# read by drivetime/engine.py; restrictions without a cost get it
+FORBIDDEN_COST = 99999.
+
+
+def _write_array(f, values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(f)
+
+
+def export_csr_graph(connection, path, table_prefix=''):
+    cursor = connection.cursor()
+    
+    vertex_ids, lons, lats = array('i'), array('d'), array('d')
+    vertex_index = {}
+    cursor.execute(VERTICES_SQL.format(table_prefix))
+    for vertex_id, lon, lat in cursor:
+        vertex_index[vertex_id] = len(vertex_ids)
+        vertex_ids.append(vertex_id)
+        lons.append(lon)
+        lats.append(lat)
+    vertex_count = len(vertex_ids)
+    
+    sources, targets, costs, edge_ids = array('i'), array('i'), array('d'), array('i')
+    cursor.execute(EDGES_SQL.format(table_prefix))
+    for gid, source, target, f_cost, r_cost in cursor:
+        source, target = vertex_index[source], vertex_index[target]
+        for start, end, cost in ((source, target, f_cost), (target, source, r_cost)):
+            if cost is not None and cost >= 0:
+                sources.append(start)
+                targets.append(end)
+                costs.append(cost)
+                edge_ids.append(gid)
+    arc_count = len(sources)
+    
+    # counting sort of the arcs by source vertex
+    offsets = array('i', [0] * (vertex_count + 1))
+    for source in sources:
+        offsets[source + 1] += 1
+    for idx in range(vertex_count):
+        offsets[idx + 1] += offsets[idx]
+    position = array('i', offsets[:-1])
+    sorted_targets = array('i', [0] * arc_count)
+    sorted_costs = array('d', [0.] * arc_count)
+    sorted_edge_ids = array('i', [0] * arc_count)
+    for idx in range(arc_count):
+        slot = position[sources[idx]]
+        position[sources[idx]] += 1
+        sorted_targets[slot] = targets[idx]
+        sorted_costs[slot] = costs[idx]
+        sorted_edge_ids[slot] = edge_ids[idx]
+    del sources, targets, costs, edge_ids, position
+    
+    from_edges, to_edges, restriction_costs = array('i'), array('i'), array('d')
+    cursor.execute(RESTRICTIONS_SQL.format(table_prefix))
+    for from_way, to_way, cost in cursor:
+        if from_way is None or to_way is None:
+            continue
+        from_edges.append(from_way)
+        to_edges.append(to_way)
+        restriction_costs.append(FORBIDDEN_COST if cost is None else float(cost))
+    cursor.close()
+    
+    with open(path, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, GRAPH_MAGIC, vertex_count, arc_count,
+                            len(from_edges)))
+        for values in (sorted_costs, lons, lats, restriction_costs,
+                       offsets, sorted_targets, sorted_edge_ids, vertex_ids,
+                       from_edges, to_edges):
+            _write_array(f, values)
+    return vertex_count, arc_count, len(from_edges)
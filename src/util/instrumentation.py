@@ -0,0 +1,188 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import cProfile
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+'''
+Per-phase instrumentation of a load: wall time, CPU time (including worker
+processes that were waited for, e.g. the imposm parser pool), resident
+memory and element / row throughput. The operating system only keeps the
+peak resident size of the whole process, so a phase records that
+cumulative peak and how much the phase raised it. With a profile directory every phase
+also runs under cProfile and its stats are dumped there, one file per phase.
+'''
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+
+def _peak_rss_kb():
+    '''
+    Peak resident set size in kB of this process or of its largest waited-for
+    child, None where the resource module is not available
+    '''
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform == 'darwin':
+        # bytes on OS X, kilobytes on Linux
+        peak //= 1024
+    return peak
+
+
+def _rate(count, duration):
+    if count is None or duration <= 0:
+        return None
+    return count / duration
+
+
+class Phase(object):
+    def __init__(self, report, name, row_counter=None):
+        self.report = report
+        self.name = name
+        self.row_counter = row_counter
+        self.elements = None
+        self.rows = None
+        self.start_rows = row_counter() if row_counter is not None else None
+        self.start_cpu = _cpu_time()
+        self.start_peak_rss_kb = _peak_rss_kb()
+        self.start = time.time()
+        self.wall_time = None
+        self.cpu_time = None
+        self.cumulative_peak_rss_kb = None
+        self.peak_rss_growth_kb = None
+        self.profile_path = None
+        self.profiler = report.start_profiler()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.report.end(self)
+        return False
+
+    def stop(self):
+        if self.profiler is not None:
+            self.report.stop_profiler(self)
+        self.wall_time = time.time() - self.start
+        self.cpu_time = _cpu_time() - self.start_cpu
+        self.cumulative_peak_rss_kb = _peak_rss_kb()
+        if self.cumulative_peak_rss_kb is not None:
+            # zero when the phase stayed below the peak of an earlier one
+            self.peak_rss_growth_kb = self.cumulative_peak_rss_kb - self.start_peak_rss_kb
+        if self.rows is None and self.row_counter is not None:
+            self.rows = self.row_counter() - self.start_rows
+
+    def as_dict(self):
+        return {'name': self.name,
+                'wall_time': self.wall_time,
+                'cpu_time': self.cpu_time,
+                'cumulative_peak_rss_kb': self.cumulative_peak_rss_kb,
+                'peak_rss_growth_kb': self.peak_rss_growth_kb,
+                'elements': self.elements,
+                'rows': self.rows,
+                'elements_per_sec': _rate(self.elements, self.wall_time),
+                'rows_per_sec': _rate(self.rows, self.wall_time),
+                'profile': self.profile_path}
+
+
+class PhaseReport(object):
+    '''
+    Collects the phases of a run, either through begin / end or as context
+    managers: with report.phase('node parse') as phase: ...
+    '''
+    def __init__(self, metadata=None, profile_dir=None):
+        self.metadata = metadata if metadata is not None else {}
+        self.profile_dir = profile_dir
+        self.profiling = False
+        self.counters = {}
+        self.phases = []
+        self.start = time.time()
+        self.start_cpu = _cpu_time()
+
+    def start_profiler(self):
+        # cProfile cannot nest; an inner phase is part of the outer profile
+        if self.profile_dir is None or self.profiling:
+            return None
+        if not os.path.isdir(self.profile_dir):
+            os.makedirs(self.profile_dir)
+        self.profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop_profiler(self, phase):
+        phase.profiler.disable()
+        self.profiling = False
+        path = os.path.join(self.profile_dir, '%02d_%s.prof'
+                            % (len(self.phases) + 1,
+                               re.sub('[^a-z0-9]+', '_', phase.name.lower())))
+        phase.profiler.dump_stats(path)
+        phase.profiler = None
+        phase.profile_path = path
+
+    def begin(self, name, row_counter=None):
+        return Phase(self, name, row_counter)
+
+    phase = begin
+
+    def end(self, phase, elements=None, rows=None):
+        if elements is not None:
+            phase.elements = elements
+        if rows is not None:
+            phase.rows = rows
+        phase.stop()
+        self.phases.append(phase)
+        message = "%s took %.2fs (%.2fs cpu)" % (phase.name, phase.wall_time,
+                                                 phase.cpu_time)
+        if phase.elements is not None:
+            message += ", %s elements" % (phase.elements,)
+        if phase.rows is not None:
+            message += ", %s rows" % (phase.rows,)
+        if phase.cumulative_peak_rss_kb is not None:
+            message += ", peak rss so far %.1f MB (+%.1f MB)" % (
+                phase.cumulative_peak_rss_kb / 1024., phase.peak_rss_growth_kb / 1024.)
+        logging.info(message)
+        return phase
+
+    def as_dict(self):
+        wall_time = time.time() - self.start
+        return {'started': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                         time.localtime(self.start)),
+                'metadata': self.metadata,
+                'wall_time': wall_time,
+                'cpu_time': _cpu_time() - self.start_cpu,
+                'peak_rss_kb': _peak_rss_kb(),
+                'counters': self.counters,
+                'phases': [phase.as_dict() for phase in self.phases]}
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2, sort_keys=True)
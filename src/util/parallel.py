@@ -0,0 +1,85 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import multiprocessing
+import traceback
+
+from Queue import Empty
+
+'''
+Runs independent jobs, one OS process each, and collects their results in the
+parent. Processes are not daemonic because the jobs may start processes of
+their own (imposm parses with a worker pool). Arguments are inherited through
+fork, so only the results are pickled.
+'''
+
+# seconds between liveness checks of the workers while waiting for results
+POLL_INTERVAL = 5
+
+
+def imap_in_processes(function, jobs):
+    '''
+    Yields function(*job) for job in jobs in their order, each as soon as it
+    and the ones before it are done, so a result can be consumed and freed
+    before the next ones arrive
+    '''
+    queue = multiprocessing.Queue()
+
+    def work(idx, job):
+        try:
+            queue.put((idx, function(*job), None))
+        except BaseException:
+            queue.put((idx, None, traceback.format_exc()))
+
+    processes = [multiprocessing.Process(target=work, args=(idx, job))
+                 for idx, job in enumerate(jobs)]
+    for process in processes:
+        process.start()
+
+    ready = {}
+    next_idx = 0
+    errors = []
+    pending = len(jobs)
+    # results are read before joining, a worker cannot exit with a full pipe
+    while pending > 0:
+        try:
+            idx, result, error = queue.get(timeout=POLL_INTERVAL)
+        except Empty:
+            if not any(process.is_alive() for process in processes) and queue.empty():
+                errors.append("%s worker processes exited without a result" % (pending,))
+                break
+            continue
+        pending -= 1
+        if error is not None:
+            errors.append("job %s failed:\n%s" % (idx, error))
+        if errors:
+            continue
+        ready[idx] = result
+        del result
+        while ready.has_key(next_idx):
+            yield ready.pop(next_idx)
+            next_idx += 1
+    for process in processes:
+        process.join()
+    if errors:
+        raise Exception('\n'.join(errors))
+
+
+def map_in_processes(function, jobs):
+    '''
+    Returns [function(*job) for job in jobs], computed in parallel
+    '''
+    return list(imap_in_processes(function, jobs))
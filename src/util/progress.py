@@ -0,0 +1,132 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import json
+import logging
+import os
+import time
+
+'''
+Progress of a parse phase: bytes consumed from the input file against its
+size (when the parser reads through a file object we can ask) plus elements
+processed per type. Rates and an ETA are logged at a fixed interval and the
+same numbers are written to an optional JSON status file for monitoring.
+'''
+
+# elements between two looks at the clock
+CHECK_EVERY = 1000
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return '%02d:%02d:%02d' % (seconds // 3600, (seconds // 60) % 60, seconds % 60)
+
+
+def _format_bytes(count):
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return '%.1f %s' % (count, unit)
+        count /= 1024.
+
+
+class ProgressReporter(object):
+    def __init__(self, phase, source=None, total_bytes=None, interval=30.,
+                 status_path=None, check_every=CHECK_EVERY):
+        '''
+        source is the file object the parser reads from; without it only
+        element counts and rates are reported
+        '''
+        self.phase = phase
+        self.source = source
+        if total_bytes is None and source is not None:
+            total_bytes = os.fstat(source.fileno()).st_size
+        self.total_bytes = total_bytes
+        self.interval = interval
+        self.status_path = status_path
+        self.check_every = check_every
+        self.counts = {}
+        self.start = time.time()
+        self.next_report = self.start + interval
+        self.countdown = check_every
+
+    def update(self, element_type, count=1):
+        self.counts[element_type] = self.counts.get(element_type, 0) + count
+        self.countdown -= 1
+        if self.countdown <= 0:
+            self.countdown = self.check_every
+            now = time.time()
+            if now >= self.next_report:
+                self.next_report = now + self.interval
+                self.report(now)
+
+    def get_bytes_read(self):
+        if self.source is None or self.source.closed:
+            return None
+        return self.source.tell()
+
+    def get_status(self, now=None, done=False):
+        if now is None:
+            now = time.time()
+        elapsed = now - self.start
+        bytes_read = self.total_bytes if done else self.get_bytes_read()
+        status = {'phase': self.phase,
+                  'done': done,
+                  'updated': now,
+                  'elapsed': elapsed,
+                  'counts': dict(self.counts),
+                  'rates': dict((element_type, count / elapsed if elapsed > 0 else None)
+                                for element_type, count in self.counts.iteritems()),
+                  'bytes_read': bytes_read,
+                  'total_bytes': self.total_bytes,
+                  'fraction': None,
+                  'bytes_per_sec': None,
+                  'eta_seconds': None}
+        if bytes_read is not None and self.total_bytes:
+            status['fraction'] = float(bytes_read) / self.total_bytes
+            if elapsed > 0 and bytes_read > 0:
+                status['bytes_per_sec'] = bytes_read / elapsed
+                status['eta_seconds'] = (self.total_bytes - bytes_read) / status['bytes_per_sec']
+        return status
+
+    def report(self, now=None):
+        status = self.get_status(now)
+        message = "%s: " % (self.phase,)
+        if status['fraction'] is not None:
+            message += "%.1f%% (%s of %s), " % (100 * status['fraction'],
+                                                _format_bytes(status['bytes_read']),
+                                                _format_bytes(self.total_bytes))
+        message += ', '.join("%s %s (%.0f/s)" % (status['counts'][element_type],
+                                                 element_type,
+                                                 status['rates'][element_type] or 0)
+                             for element_type in sorted(status['counts'].keys()))
+        if status['eta_seconds'] is not None:
+            message += ", ETA %s" % (_format_duration(status['eta_seconds']),)
+        logging.info(message)
+        self.write_status(status)
+
+    def write_status(self, status):
+        if self.status_path is None:
+            return
+        temp_path = self.status_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(status, f)
+        # readers never see a half written file
+        if os.name == 'nt' and os.path.exists(self.status_path):
+            os.remove(self.status_path)
+        os.rename(temp_path, self.status_path)
+
+    def finish(self):
+        self.write_status(self.get_status(done=True))
@@ -0,0 +1,61 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+
+
+class StringTable(object):
+    def __init__(self):
+        self._ids = {}
+        self._strings = []
+        
+    def intern(self, value):
+        '''
+        Returns the canonical instance of value, registering it if needed
+        '''
+        _id = self._ids.get(value)
+        if _id is None:
+            self._strings.append(value)
+            _id = len(self._strings)
+            self._ids[value] = _id
+        return self._strings[_id - 1]
+    
+    def get_id(self, value):
+        _id = self._ids.get(value)
+        if _id is None:
+            self.intern(value)
+            _id = len(self._strings)
+        return _id
+    
+    def get_entries(self, start=0):
+        return [(idx + 1, self._strings[idx]) 
+                for idx in range(start, len(self._strings))]
+    
+    def __len__(self):
+        return len(self._strings)
+    
+class PropertyDictionary(object):
+    def __init__(self):
+        self.keys = StringTable()
+        self.values = StringTable()
+        
+    def intern_attributes(self, attributes):
+        interned = {}
+        for key, value in attributes.iteritems():
+            interned[self.keys.intern(key)] = self.values.intern(value)
+        return interned
+    
+    def encode(self, key, value):
+        return self.keys.get_id(key), self.values.get_id(value)
@@ -0,0 +1,96 @@
+'''
+    Copyright (C) 2016  daniel.urda
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+'''
+from util.config import ONEWAY_FORWARD, ONEWAY_BACKWARD
+from util.geom import turn_angle
+
+'''
+Turn penalties between every pair of segments meeting at a routing node,
+computed once at load time from the profile's turn_function, u_turn_penalty
+and traffic_signal_penalty, so queries do not need the junction geometry.
+'''
+
+# penalties below this many seconds are not worth a row
+MIN_TURN_COST = 0.01
+
+
+def _arrives(segment, node_id):
+    '''
+    Whether the segment can be travelled towards node_id
+    '''
+    way = segment.parent
+    if segment.get_tail() == node_id and way.f_speed > 0 and way.oneway != ONEWAY_BACKWARD:
+        return True
+    if segment.get_head() == node_id and way.b_speed > 0 and way.oneway != ONEWAY_FORWARD:
+        return True
+    return False
+
+
+def _leaves(segment, node_id):
+    way = segment.parent
+    if segment.get_head() == node_id and way.f_speed > 0 and way.oneway != ONEWAY_BACKWARD:
+        return True
+    if segment.get_tail() == node_id and way.b_speed > 0 and way.oneway != ONEWAY_FORWARD:
+        return True
+    return False
+
+
+def _neighbour(segment, node_id):
+    '''
+    Id of the segment node next to node_id, giving the direction of the segment
+    at the junction
+    '''
+    if segment.get_head() == node_id:
+        return segment.get_node_id_near_end(0)
+    return segment.get_node_id_near_end(-1)
+
+
+def compute_turn_costs(nodes, coordinates, profile_module, traffic_signals=()):
+    '''
+    Yields (from segment db id, to segment db id, via node id, angle, cost)
+    for every allowed turn whose penalty is not negligible
+    '''
+    turn_function = getattr(profile_module, 'turn_function', None)
+    u_turn_penalty = getattr(profile_module, 'u_turn_penalty', 0)
+    traffic_signal_penalty = getattr(profile_module, 'traffic_signal_penalty', 0)
+    for node_id, node in nodes.iteritems():
+        via = coordinates.get(node_id)
+        if via is None:
+            continue
+        segments = node.get_edges()
+        incoming = [s for s in segments if _arrives(s, node_id)]
+        outgoing = [s for s in segments if _leaves(s, node_id)]
+        signal_cost = traffic_signal_penalty if node_id in traffic_signals else 0
+        for from_segment in incoming:
+            point_in = coordinates.get(_neighbour(from_segment, node_id))
+            if point_in is None:
+                continue
+            for to_segment in outgoing:
+                point_out = coordinates.get(_neighbour(to_segment, node_id))
+                if point_out is None:
+                    continue
+                if from_segment is to_segment:
+                    angle = 180.
+                    cost = u_turn_penalty
+                else:
+                    angle = turn_angle(point_in, via, point_out)
+                    cost = 0
+                if turn_function is not None:
+                    cost += turn_function(angle)
+                cost += signal_cost
+                if cost >= MIN_TURN_COST:
+                    yield (from_segment.get_db_id(), to_segment.get_db_id(),
+                           node_id, angle, cost)